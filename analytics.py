@@ -0,0 +1,446 @@
+"""Corpus analytics over every archived transcript with pandas and Parquet.
+
+The segments of each archived transcript (see transcript_archive) are
+materialized as one Parquet file per video, partitioned by language:
+
+    analytics/segments/language=en/<video_id>.parquet
+
+with the columns video_id, segment, start, duration, text, words and
+generated. A refresh only rewrites the files of videos whose archive was
+added or changed since the previous one, and removes those of deleted
+videos. The reports below are vectorized pandas operations over the whole
+corpus, and the directory can be read directly with
+`pd.read_parquet("analytics/segments")`.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from transcript_archive import ArchiveStore
+
+DEFAULT_ANALYTICS_DIR = os.environ.get(
+    "ANALYTICS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "analytics")
+)
+
+MANIFEST_NAME = "manifest.json"
+# Partition of transcripts archived without a language code
+UNKNOWN_LANGUAGE = "unknown"
+
+# Pauses between captions shorter than this are not counted as silence
+MIN_SILENCE_SECONDS = 2.0
+# Width of the time buckets of keyword_timeline
+KEYWORD_BUCKET_MINUTES = 1
+# Words shorter than this are left out of top_terms
+MIN_TERM_LENGTH = 4
+
+TERM_PATTERN = r"\w+"
+# Transcript text is kept in Arrow strings, so string methods run in pyarrow
+TEXT_DTYPE = "string[pyarrow]"
+ASCII_WORD = re.compile(r"[A-Za-z0-9_]")
+
+
+def _empty_segments():
+    return pd.DataFrame({
+        "video_id": pd.Series(dtype="category"),
+        "segment": pd.Series(dtype="int32"),
+        "start": pd.Series(dtype="float64"),
+        "duration": pd.Series(dtype="float64"),
+        "text": pd.Series(dtype=TEXT_DTYPE),
+        "words": pd.Series(dtype="int32"),
+        "generated": pd.Series(dtype=bool),
+        "language": pd.Series(dtype="category"),
+    })
+
+
+def segment_frame(video_id, archive):
+    """One archived transcript as a segment DataFrame, without the language column.
+
+    Start and duration are seconds, and NaN for transcripts archived
+    without timestamps.
+    """
+    texts = archive.texts(0, len(archive))
+    frame = pd.DataFrame({
+        "video_id": video_id,
+        "segment": np.arange(len(texts), dtype=np.int32),
+        "start": np.asarray(archive.starts, dtype=np.uint32) / 1000 if archive.timed else np.nan,
+        "duration": np.asarray(archive.durations, dtype=np.uint32) / 1000 if archive.timed else np.nan,
+        "text": pd.Series(texts, dtype=TEXT_DTYPE),
+    })
+    frame["words"] = frame["text"].str.split().str.len().fillna(0).astype(np.int32)
+    frame["generated"] = archive.is_generated
+    return frame
+
+
+class Corpus:
+    """Segment-level Parquet copy of the transcript archive, refreshed incrementally.
+
+    `segments` holds the whole corpus in memory after refresh(); `version`
+    changes whenever its contents do, so callers can cache reports by it.
+    """
+
+    def __init__(self, root=DEFAULT_ANALYTICS_DIR, store=None):
+        if pyarrow is None:
+            raise RuntimeError("Corpus analytics writes Parquet files; install the pyarrow package")
+        self.root = root
+        self.store = store if store is not None else ArchiveStore()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "segments"), exist_ok=True)
+        self._manifest = self._read_manifest()
+        self.segments = None
+        self.version = 0
+        self.last_refresh = None
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST_NAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        path = os.path.join(self.root, MANIFEST_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _partition_path(self, entry):
+        return os.path.join(self.root, entry["path"])
+
+    def _load(self):
+        """Read every materialized video back into one frame, in a single dataset read."""
+        if not self._manifest:
+            return _empty_segments()
+        segments = pd.read_parquet(os.path.join(self.root, "segments"))
+        # Only files the manifest points at, not leftovers of an interrupted refresh
+        languages = {video_id: entry["language"] for video_id, entry in self._manifest.items()}
+        expected = segments["video_id"].astype(str).map(languages)
+        return self._combine([segments[segments["language"].astype(str) == expected]])
+
+    @staticmethod
+    def _combine(frames):
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return _empty_segments()
+        segments = pd.concat(frames, ignore_index=True)
+        return segments.astype({"video_id": "category", "language": "category", "text": TEXT_DTYPE})
+
+    def _materialize(self, video_id, signature):
+        with self.store.open(video_id) as archive:
+            frame = segment_frame(video_id, archive)
+            language = archive.language_code or UNKNOWN_LANGUAGE
+            generated = archive.is_generated
+        relative = os.path.join("segments", f"language={language}", f"{video_id}.parquet")
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Dot files are skipped by Parquet dataset readers
+        tmp_path = os.path.join(os.path.dirname(path), f".{video_id}.parquet.tmp")
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+        previous = self._manifest.get(video_id)
+        if previous is not None and previous["path"] != relative:
+            self._remove_file(previous)
+        self._manifest[video_id] = {
+            "signature": signature,
+            "path": relative,
+            "language": language,
+            "generated": generated,
+            "segments": len(frame),
+        }
+        return frame.assign(language=language)
+
+    def _remove_file(self, entry):
+        try:
+            os.remove(self._partition_path(entry))
+        except FileNotFoundError:
+            pass
+
+    def refresh(self):
+        """Bring the Parquet files and `segments` up to date with the archive.
+
+        Only new and changed archives are read and written. Returns the
+        counts of added, updated, removed and unchanged videos.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            if self.segments is None:
+                self.segments = self._load()
+                self.version += 1
+
+            current = {}
+            for video_id in self.store.video_ids():
+                try:
+                    stat = os.stat(self.store.path(video_id))
+                except FileNotFoundError:
+                    continue
+                current[video_id] = [stat.st_mtime_ns, stat.st_size]
+
+            removed = [video_id for video_id in self._manifest if video_id not in current]
+            changed = [
+                video_id for video_id, signature in current.items()
+                if video_id not in self._manifest
+                or self._manifest[video_id]["signature"] != signature
+                or not os.path.exists(self._partition_path(self._manifest[video_id]))
+            ]
+            changes = {
+                "added": sum(video_id not in self._manifest for video_id in changed),
+                "updated": sum(video_id in self._manifest for video_id in changed),
+                "removed": len(removed),
+                "unchanged": len(current) - len(changed),
+            }
+
+            for video_id in removed:
+                self._remove_file(self._manifest.pop(video_id))
+            frames, materialized = [], []
+            for video_id in changed:
+                try:
+                    frames.append(self._materialize(video_id, current[video_id]))
+                    materialized.append(video_id)
+                except (OSError, ValueError):
+                    # Deleted or rewritten while being read; picked up by the next refresh
+                    changes["updated" if video_id in self._manifest else "added"] -= 1
+
+            if removed or materialized:
+                self._write_manifest()
+                stale = self.segments["video_id"].isin(removed + materialized)
+                self.segments = self._combine([self.segments[~stale]] + frames)
+                self.version += 1
+
+            changes["seconds"] = time.perf_counter() - started
+            changes["refreshed_at"] = time.time()
+            self.last_refresh = changes
+            return changes
+
+    def stats(self):
+        segments = self.segments if self.segments is not None else _empty_segments()
+        return {
+            "videos": int(segments["video_id"].nunique()),
+            "segments": len(segments),
+            "words": int(segments["words"].sum()),
+            "hours": float(video_summary(segments)["minutes"].sum() / 60),
+            "languages": int(segments["language"].nunique()),
+        }
+
+
+def _timed(segments):
+    """Timed segments in video order, with the start of the next segment of the same video."""
+    timed = segments[segments["start"].notna()].sort_values(["video_id", "start"], kind="stable")
+    next_start = timed.groupby("video_id", observed=True)["start"].shift(-1)
+    return timed.assign(end=timed["start"] + timed["duration"], next_start=next_start)
+
+
+def video_summary(segments):
+    """One row per video: language, generated flag, segments, words and length in minutes.
+
+    The length is NaN for transcripts without timestamps.
+    """
+    summary = segments.assign(end=segments["start"] + segments["duration"]).groupby(
+        "video_id", observed=True).agg(
+        language=("language", "first"),
+        generated=("generated", "first"),
+        segments=("segment", "size"),
+        words=("words", "sum"),
+        minutes=("end", "max"),
+    )
+    summary["minutes"] /= 60
+    return summary
+
+
+def words_per_minute(segments):
+    """Speaking rate of every timed video.
+
+    `wpm` divides the words by the time captions are on screen (each
+    caption counted until the next one starts, so overlapping captions are
+    not counted twice); `wpm_overall` divides them by the video's length.
+    """
+    timed = _timed(segments)
+    timed = timed.assign(spoken=np.fmin(timed["duration"], timed["next_start"] - timed["start"]))
+    report = timed.groupby("video_id", observed=True).agg(
+        language=("language", "first"),
+        generated=("generated", "first"),
+        words=("words", "sum"),
+        spoken_minutes=("spoken", "sum"),
+        minutes=("end", "max"),
+    )
+    report[["spoken_minutes", "minutes"]] /= 60
+    report["wpm"] = report["words"] / report["spoken_minutes"].replace(0, np.nan)
+    report["wpm_overall"] = report["words"] / report["minutes"].replace(0, np.nan)
+    return report.sort_values("wpm", ascending=False)
+
+
+def silence_gaps(segments, min_gap=MIN_SILENCE_SECONDS):
+    """Pauses of at least `min_gap` seconds between consecutive captions, longest first.
+
+    Each row has the video, the time the pause starts (`at`) and its length
+    in `seconds`.
+    """
+    timed = _timed(segments)
+    gaps = timed.assign(seconds=timed["next_start"] - timed["end"])
+    gaps = gaps[gaps["seconds"] >= min_gap]
+    return (gaps[["video_id", "end", "seconds"]].rename(columns={"end": "at"})
+            .sort_values("seconds", ascending=False, kind="stable").reset_index(drop=True))
+
+
+def silence_by_video(segments, min_gap=MIN_SILENCE_SECONDS):
+    """Per timed video: number of pauses of at least `min_gap`, their total and longest length, and share of the video."""
+    gaps = silence_gaps(segments, min_gap).groupby("video_id", observed=True)["seconds"].agg(
+        ["count", "sum", "max"]).rename(columns={"count": "gaps", "sum": "silent_seconds", "max": "longest"})
+    minutes = video_summary(segments)["minutes"].dropna()
+    report = gaps.reindex(minutes.index).fillna({"gaps": 0, "silent_seconds": 0.0})
+    report["gaps"] = report["gaps"].astype(int)
+    report["silent_share"] = report["silent_seconds"] / (minutes * 60).replace(0, np.nan)
+    return report.sort_values("silent_share", ascending=False)
+
+
+def _keyword_pattern(keyword):
+    """Whole-word pattern for a keyword.
+
+    Edges that are ASCII word characters use \\b, which pyarrow matches
+    natively; other edges need lookarounds, which fall back to Python's re.
+    """
+    keyword = keyword.lower()
+    left = r"\b" if ASCII_WORD.match(keyword[:1]) else r"(?<!\w)"
+    right = r"\b" if ASCII_WORD.match(keyword[-1:]) else r"(?!\w)"
+    return left + re.escape(keyword) + right
+
+
+def keyword_timeline(segments, keywords, bucket_minutes=KEYWORD_BUCKET_MINUTES, per_thousand_words=False):
+    """Occurrences of each keyword (or phrase) by position in the video, over all timed videos.
+
+    Indexed by the bucket's start in minutes, with one column per keyword.
+    With `per_thousand_words` counts are divided by the words spoken in the
+    bucket, so buckets late in the video, which fewer videos reach, compare
+    fairly with early ones.
+    """
+    timed = segments[segments["start"].notna()]
+    lowered = timed["text"].str.lower()
+    counts = pd.DataFrame({keyword: lowered.str.count(_keyword_pattern(keyword)) for keyword in keywords},
+                          index=timed.index)
+    bucket = (timed["start"] // (bucket_minutes * 60) * bucket_minutes).rename("minute")
+    timeline = counts.groupby(bucket).sum()
+    if per_thousand_words:
+        words = timed["words"].groupby(bucket).sum()
+        timeline = timeline.div(words.replace(0, np.nan), axis=0) * 1000
+    return timeline
+
+
+def top_terms(segments, limit=20, min_length=MIN_TERM_LENGTH):
+    """Most frequent words of at least `min_length` characters in the corpus, with their counts."""
+    terms = segments["text"].str.lower().str.findall(TERM_PATTERN).explode()
+    terms = terms[terms.str.len() >= min_length]
+    return terms.value_counts().head(limit).rename_axis("term").rename("count")
+
+
+def language_coverage(segments):
+    """Per language: videos with manual and generated captions, share of the corpus, hours and words."""
+    videos = video_summary(segments)
+    coverage = videos.groupby("language", observed=True).agg(
+        videos=("segments", "size"),
+        generated=("generated", "sum"),
+        hours=("minutes", "sum"),
+        words=("words", "sum"),
+    )
+    coverage["generated"] = coverage["generated"].astype(int)
+    coverage.insert(1, "manual", coverage["videos"] - coverage["generated"])
+    coverage.insert(3, "share", coverage["videos"] / max(len(videos), 1))
+    coverage["hours"] /= 60
+    return coverage.sort_values("videos", ascending=False)
+
+
+_corpus = None
+
+
+def get_corpus():
+    """Return the shared Corpus, or None if pyarrow or the transcript archive is unavailable."""
+    global _corpus
+    if _corpus is None:
+        from youtube import get_archive_store
+        store = get_archive_store()
+        if store is None or pyarrow is None:
+            return None
+        try:
+            _corpus = Corpus(store=store)
+        except OSError:
+            return None
+    return _corpus
+
+
+REPORTS = ("videos", "wpm", "silence", "gaps", "keywords", "terms", "languages")
+
+
+def build_report(segments, name, keywords=(), min_gap=MIN_SILENCE_SECONDS, bucket_minutes=KEYWORD_BUCKET_MINUTES,
+                 per_thousand_words=False, limit=20):
+    """Compute one of REPORTS by name."""
+    if name == "videos":
+        return video_summary(segments)
+    if name == "wpm":
+        return words_per_minute(segments)
+    if name == "silence":
+        return silence_by_video(segments, min_gap)
+    if name == "gaps":
+        return silence_gaps(segments, min_gap).head(limit)
+    if name == "keywords":
+        return keyword_timeline(segments, keywords, bucket_minutes, per_thousand_words)
+    if name == "terms":
+        return top_terms(segments, limit).to_frame()
+    if name == "languages":
+        return language_coverage(segments)
+    raise ValueError(f"Unknown report {name!r}; choose from {', '.join(REPORTS)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate reports over every archived transcript.")
+    parser.add_argument("--dir", default=DEFAULT_ANALYTICS_DIR, help="Parquet directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("refresh", help="Materialize new and changed archived transcripts as Parquet")
+
+    report = commands.add_parser("report", help="Refresh, then print a report")
+    report.add_argument("name", choices=REPORTS)
+    report.add_argument("-k", "--keywords", default="", help="Comma-separated keywords for the keywords report")
+    report.add_argument("--min-gap", type=float, default=MIN_SILENCE_SECONDS, help="Shortest pause in seconds")
+    report.add_argument("--bucket", type=float, default=KEYWORD_BUCKET_MINUTES, help="Keyword bucket in minutes")
+    report.add_argument("--per-thousand-words", action="store_true", help="Normalize keyword counts")
+    report.add_argument("-n", "--limit", type=int, default=20, help="Rows of the gaps and terms reports")
+    report.add_argument("--csv", help="Write the report to this CSV file instead of printing it")
+    args = parser.parse_args(argv)
+
+    keywords = [keyword.strip() for keyword in getattr(args, "keywords", "").split(",") if keyword.strip()]
+    if args.command == "report" and args.name == "keywords" and not keywords:
+        parser.error("the keywords report needs --keywords")
+    if pyarrow is None:
+        parser.error("install the pyarrow package to use corpus analytics")
+    corpus = Corpus(args.dir)
+    changes = corpus.refresh()
+    print(f"{changes['added']} added, {changes['updated']} updated, {changes['removed']} removed, "
+          f"{changes['unchanged']} unchanged in {changes['seconds']:.2f}s", file=sys.stderr)
+    if args.command == "refresh":
+        stats = corpus.stats()
+        print(f"{stats['videos']} videos, {stats['segments']} segments, {stats['hours']:.1f} hours, "
+              f"{stats['languages']} languages")
+        return
+
+    result = build_report(corpus.segments, args.name, keywords, args.min_gap, args.bucket,
+                          args.per_thousand_words, args.limit)
+    if args.csv:
+        result.to_csv(args.csv)
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 160):
+            print(result.to_string())
+
+
+if __name__ == "__main__":
+    main()
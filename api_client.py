@@ -0,0 +1,56 @@
+import requests
+
+from youtube import extract_video_id, TranscriptResolution
+from ollama_client import ChatStream, OllamaError
+
+
+class TranscriptService:
+    """Client for api_server, letting the UI run extraction and LLM calls remotely."""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def resolve(self, youtube_url):
+        """Return a TranscriptResolution, or an "Error: ..." string like get_best_transcript_resolution."""
+        video_id = extract_video_id(youtube_url)
+        if not video_id:
+            return "Error: Could not extract video ID from the URL."
+        try:
+            response = self.session.get(f"{self.base_url}/transcripts/{video_id}", timeout=self.timeout)
+        except requests.RequestException as e:
+            return f"Error: Transcript service unavailable. {str(e)}"
+        if response.status_code != 200:
+            if not response.content:
+                return f"Error: {response.status_code}"
+            try:
+                detail = response.json().get("detail", response.text)
+            except (ValueError, AttributeError):
+                # An HTML or text error page from a proxy or the server itself
+                detail = response.text[:500]
+            return f"Error: {detail}"
+        body = response.json()
+        return TranscriptResolution(
+            body["video_id"], body["segments"], body["language_code"], body["is_generated"],
+            remote_calls=body["remote_calls"], from_cache=body["from_cache"]
+        )
+
+    def _chat_request(self, video_id, question, history, mode, stream, session):
+        return {"video_id": video_id, "question": question, "history": list(history or []),
+                "mode": mode, "stream": stream, "session": session}
+
+    def chat(self, video_id, question, history=None, mode="answer", session=None):
+        """Return the answer text; raises OllamaError on failure (status 503 when the model is busy)."""
+        response = self.session.post(f"{self.base_url}/chat", json=self._chat_request(
+            video_id, question, history, mode, False, session), timeout=self.timeout)
+        if response.status_code != 200:
+            raise OllamaError(f"Status code: {response.status_code}, Response: {response.text[:500]}",
+                              response.status_code)
+        return response.json().get("message", {}).get("content", "")
+
+    def stream(self, video_id, question, history=None, session=None):
+        """Start a streamed answer; the service relays Ollama's NDJSON format."""
+        return ChatStream(f"{self.base_url}/chat",
+                          self._chat_request(video_id, question, history, "answer", True, session),
+                          timeout=self.timeout, session=self.session)
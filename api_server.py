@@ -0,0 +1,381 @@
+"""Headless HTTP API for transcript extraction and Q&A.
+
+Run with:
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+
+Endpoints:
+    GET  /transcripts/{video_id}    transcript with segments (or ?format=srt|vtt|jsonl|txt)
+    POST /transcripts:batch         several transcripts at once
+    POST /chat                      answer a question about a video (optionally streamed)
+    GET  /search?q=...              full-text search over all saved transcripts
+    GET  /metrics                   Prometheus metrics of this worker process
+    GET  /healthz
+"""
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from youtube import extract_video_id, is_valid_video_id, resolve_transcript, get_search_index, NoUsableTranscript
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+from ollama_client import OllamaClient, OllamaError
+from scheduler import LLMBusy, BACKGROUND
+from retrieval import TranscriptIndex, format_context
+from prompt_budget import PromptBudget
+from response_cache import transcript_digest
+from summarize import Summarizer, estimate_tokens
+from transcript_format import FORMATS as TRANSCRIPT_FORMATS, SegmentArray
+from search_index import hit_url
+from metrics import REGISTRY, API_PENDING, API_REJECTED
+
+# Backpressure limits, per worker process
+MAX_CONCURRENT_FETCHES = int(os.environ.get("API_MAX_CONCURRENT_FETCHES", 8))
+MAX_CONCURRENT_CHATS = int(os.environ.get("API_MAX_CONCURRENT_CHATS", 4))
+MAX_PENDING = int(os.environ.get("API_MAX_PENDING", 64))
+MAX_BATCH_SIZE = int(os.environ.get("API_MAX_BATCH_SIZE", 100))
+# Videos of one batch fetched at once; below MAX_PENDING, so a large batch queues instead of being rejected
+BATCH_CONCURRENCY = max(1, min(2 * MAX_CONCURRENT_FETCHES, MAX_PENDING // 2))
+MAX_SEARCH_RESULTS = 100
+RETRIEVAL_TOP_K = int(os.environ.get("API_RETRIEVAL_TOP_K", 5))
+CHAT_HISTORY_LIMIT = 4
+SUMMARY_DIRECT_LIMIT = 6000
+INDEX_CACHE_SIZE = 64
+STABLE_PREFIX = os.environ.get("CHAT_STABLE_PREFIX", "1") != "0"
+
+
+class Overloaded(Exception):
+    """Raised when too many requests are already waiting."""
+
+
+class Coalescer:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    Calls run in `executor` with at most `concurrency` at once. When more than
+    `max_pending` distinct calls are queued or running, new ones are rejected
+    with Overloaded instead of piling up. Work that cannot be shared, such as
+    a streamed answer, takes a slot with `acquire` and gives it back with
+    `release`. `name` labels its queue metrics.
+    """
+
+    def __init__(self, executor, concurrency, max_pending, name="default"):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.name = name
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._in_flight = {}
+        self._held = 0
+
+    @property
+    def pending(self):
+        return len(self._in_flight) + self._held
+
+    def _check_pending(self):
+        if self.pending >= self.max_pending:
+            API_REJECTED.inc(queue=self.name)
+            raise Overloaded()
+
+    async def run(self, key, func, *args):
+        future = self._in_flight.get(key)
+        if future is None:
+            self._check_pending()
+            future = asyncio.ensure_future(self._call(func, *args))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._done(key))
+            API_PENDING.set(self.pending, queue=self.name)
+        # Shield so one caller disconnecting does not cancel the shared call
+        return await asyncio.shield(future)
+
+    def _done(self, key):
+        self._in_flight.pop(key, None)
+        API_PENDING.set(self.pending, queue=self.name)
+
+    async def acquire(self):
+        """Wait for a slot held until `release`; raises Overloaded like `run`."""
+        self._check_pending()
+        self._held += 1
+        API_PENDING.set(self.pending, queue=self.name)
+        try:
+            await self._semaphore.acquire()
+        except BaseException:
+            self._held -= 1
+            API_PENDING.set(self.pending, queue=self.name)
+            raise
+
+    def release(self):
+        self._semaphore.release()
+        self._held -= 1
+        API_PENDING.set(self.pending, queue=self.name)
+
+    async def _call(self, func, *args):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+
+
+class TranscriptRequest(BaseModel):
+    video_ids: List[str] = []
+    urls: List[str] = []
+
+
+class Message(BaseModel):
+    role: Literal["user", "assistant"]
+    content: str
+
+
+class ChatRequest(BaseModel):
+    video_id: str
+    question: str
+    history: List[Message] = []
+    mode: str = "answer"  # "answer" (retrieval) or "summary" (whole transcript)
+    stream: bool = False
+    session: Optional[str] = None  # Requests with the same session share one fair-queueing flow; None: own flow
+
+
+app = FastAPI(title="YouTube Transcript AI Assistant API")
+_state = {}
+
+
+def _get(name):
+    """Lazily create per-process shared state (must run inside the event loop)."""
+    if name not in _state:
+        if name == "fetches":
+            executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_FETCHES)
+            _state[name] = Coalescer(executor, MAX_CONCURRENT_FETCHES, MAX_PENDING, name)
+        elif name == "chats":
+            executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CHATS)
+            _state[name] = Coalescer(executor, MAX_CONCURRENT_CHATS, MAX_PENDING, name)
+        elif name == "ollama":
+            _state[name] = OllamaClient.from_env()
+        elif name == "budget":
+            _state[name] = PromptBudget.from_config(_get("ollama").config, max_history=CHAT_HISTORY_LIMIT)
+        elif name == "indexes":
+            _state[name] = OrderedDict()
+    return _state[name]
+
+
+def _overloaded():
+    return HTTPException(status_code=503, detail="Server busy, retry later", headers={"Retry-After": "2"})
+
+
+def _model_busy(error):
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+def _transcript_body(resolution):
+    return {
+        "video_id": resolution.video_id,
+        "language_code": resolution.language_code,
+        "is_generated": resolution.is_generated,
+        "remote_calls": resolution.remote_calls,
+        "from_cache": resolution.from_cache,
+        "text": resolution.text,
+        "segments": resolution.segments,
+    }
+
+
+async def fetch_resolution(video_id):
+    """Resolve a transcript, sharing one in-flight fetch among concurrent callers."""
+    if not is_valid_video_id(video_id):
+        raise HTTPException(status_code=400, detail="Invalid video ID")
+    try:
+        return await _get("fetches").run(("transcript", video_id), resolve_transcript, video_id)
+    except Overloaded:
+        raise _overloaded()
+    except (NoUsableTranscript, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable) as e:
+        raise HTTPException(status_code=404, detail=f"No transcript available: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Transcript fetch failed: {e}")
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "pending_fetches": _get("fetches").pending, "pending_chats": _get("chats").pending}
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/transcripts/{video_id}")
+async def get_transcript(video_id: str, format: Optional[str] = Query(None)):
+    resolution = await fetch_resolution(video_id)
+    if format is None:
+        return _transcript_body(resolution)
+    if format not in TRANSCRIPT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}")
+    body = SegmentArray.from_segments(resolution.segments).render(format)
+    return PlainTextResponse(body, media_type=TRANSCRIPT_FORMATS[format][1])
+
+
+@app.post("/transcripts:batch")
+async def batch_transcripts(request: TranscriptRequest):
+    video_ids = list(request.video_ids) + [extract_video_id(url) or url for url in request.urls]
+    if len(video_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} videos per batch")
+
+    async def one(video_id):
+        try:
+            return {"status": "ok", **_transcript_body(await fetch_resolution(video_id))}
+        except HTTPException as e:
+            return {"video_id": video_id, "status": "error", "code": e.status_code, "error": e.detail}
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def limited(video_id):
+        async with semaphore:
+            return await one(video_id)
+
+    return {"results": await asyncio.gather(*(limited(v) for v in video_ids))}
+
+
+@app.get("/search")
+async def search(q: str, limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS), video_id: Optional[str] = None):
+    index = get_search_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Search index unavailable")
+    hits = await run_in_threadpool(index.search, q, limit, video_id)
+    return {"query": q, "results": [dict(hit, url=hit_url(hit)) for hit in hits]}
+
+
+def _transcript_index(resolution):
+    indexes = _get("indexes")
+    # Keyed by content too, so a transcript changed by refresh.py gets a new index
+    key = (resolution.video_id, transcript_digest(resolution.text))
+    index = indexes.get(key)
+    if index is None:
+        index = indexes[key] = TranscriptIndex(resolution.segments)
+        while len(indexes) > INDEX_CACHE_SIZE:
+            indexes.popitem(last=False)
+    indexes.move_to_end(key)
+    return index
+
+
+def _chat_payload(request, resolution):
+    budget = _get("budget")
+    history = [{"role": message.role, "content": message.content} for message in request.history]
+    if request.mode == "summary" or (STABLE_PREFIX and budget.fits_prefix(resolution.text)):
+        # Whole transcript as a fixed prefix: follow-ups reuse Ollama's KV cache
+        plan = budget.build(request.question, resolution.text, history, layout="prefix")
+    else:
+        context = format_context(_transcript_index(resolution).search(request.question, RETRIEVAL_TOP_K))
+        plan = budget.build(request.question, context, history)
+    return {"messages": plan.messages}
+
+
+def _summarize(question, resolution, flow):
+    client = _get("ollama")
+    summarizer = Summarizer(partial(client.complete, flow=flow, priority=BACKGROUND), model=client.model)
+    result = summarizer.summarize(resolution.text, question, segments=resolution.segments)
+    return {"message": {"role": "assistant", "content": result.summary}, "done": True,
+            "summary_timings": result.timings}
+
+
+def _ndjson_lines(stream):
+    # Re-emit Ollama's NDJSON chunks so clients can use the same stream parser
+    for token in stream:
+        yield json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+    yield json.dumps(dict(stream.stats, message={"role": "assistant", "content": ""}, done=True)) + "\n"
+
+
+class _ChatStreamResponse(StreamingResponse):
+    """Stream the answer, holding the chat slot until the response ends.
+
+    The slot is given back and the Ollama stream closed however the response
+    ends, also when its body is never iterated (the client disconnected
+    before it started).
+    """
+
+    def __init__(self, stream, chats):
+        self._stream = stream
+        self._chats = chats
+        self._released = False
+        super().__init__(self._lines(), media_type="application/x-ndjson")
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._stream.close()
+            self._chats.release()
+
+    async def _lines(self):
+        try:
+            async for line in iterate_in_threadpool(_ndjson_lines(self._stream)):
+                yield line
+        finally:
+            self._release()
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    resolution = await fetch_resolution(request.video_id)
+    client = _get("ollama")
+    chats = _get("chats")
+    # Callers without a session are independent clients, not one flow sharing a queue limit
+    flow = request.session or uuid.uuid4().hex
+
+    if request.mode == "summary" and estimate_tokens(resolution.text) > SUMMARY_DIRECT_LIMIT:
+        key = ("summary", client.model, request.video_id, request.question)
+        try:
+            return await chats.run(key, _summarize, request.question, resolution, flow)
+        except Overloaded:
+            raise _overloaded()
+        except LLMBusy as e:
+            raise _model_busy(e)
+        except OllamaError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    payload = _chat_payload(request, resolution)
+    if request.stream:
+        # Streams count against API_MAX_CONCURRENT_CHATS like other chats, for as long as they are open
+        try:
+            await chats.acquire()
+        except Overloaded:
+            raise _overloaded()
+        try:
+            # On the chats executor, whose threads the slot accounts for, not the shared threadpool
+            loop = asyncio.get_running_loop()
+            stream = await loop.run_in_executor(chats.executor, client.stream, payload, request.video_id, flow)
+        except BaseException as e:
+            chats.release()
+            if isinstance(e, LLMBusy):
+                raise _model_busy(e)
+            if isinstance(e, OllamaError):
+                raise HTTPException(status_code=502, detail=str(e))
+            raise
+        return _ChatStreamResponse(stream, chats)
+
+    # Identical questions in flight share one generation
+    key = ("chat", client.model, hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest())
+    try:
+        return await chats.run(key, client.chat, payload, request.video_id, flow)
+    except Overloaded:
+        raise _overloaded()
+    except LLMBusy as e:
+        raise _model_busy(e)
+    except OllamaError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api_server:app", host=os.environ.get("API_HOST", "127.0.0.1"),
+                port=int(os.environ.get("API_PORT", 8000)), workers=int(os.environ.get("API_WORKERS", 1)))
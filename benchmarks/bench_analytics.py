@@ -0,0 +1,114 @@
+"""Corpus analytics: Parquet materialization, incremental refresh and vectorized reports.
+
+Archives a synthetic corpus, then times the first refresh (every video
+written as Parquet), a refresh with nothing new, a refresh after one more
+video arrives and loading the corpus in a new process. The speaking rate,
+silence and keyword reports are then timed against the per-video Python
+loop they replace:
+
+    python benchmarks/bench_analytics.py --videos 200 --hours 1
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from transcript_archive import ArchiveStore
+from fake_youtube import fake_video_ids, synthetic_segments
+
+LANGUAGES = ("en", "en", "en", "de", "es", "fr")
+KEYWORDS = ("python", "model", "data")
+
+
+def corpus_segments(count, seed, segment_seconds):
+    """Synthetic segments with an occasional pause between captions."""
+    rng = random.Random(seed)
+    segments = synthetic_segments(count, seed=seed, segment_seconds=segment_seconds)
+    for segment in segments:
+        if rng.random() < 0.05:
+            segment["duration"] = round(segment["duration"] * rng.random(), 2)
+    return segments
+
+
+def python_reports(store, video_ids, min_gap):
+    """The same reports as a loop over every archive's segments."""
+    rates, silence, timeline = {}, {}, defaultdict(Counter)
+    patterns = {keyword: re.compile(r"(?<!\w)" + re.escape(keyword) + r"(?!\w)") for keyword in KEYWORDS}
+    for video_id in video_ids:
+        with store.open(video_id) as archive:
+            segments = archive.segments()
+        words = spoken = silent = 0
+        for i, segment in enumerate(segments):
+            words += len(segment["text"].split())
+            following = segments[i + 1]["start"] if i + 1 < len(segments) else None
+            length = segment["duration"] if following is None else min(segment["duration"], following - segment["start"])
+            spoken += length
+            if following is not None and following - segment["start"] - segment["duration"] >= min_gap:
+                silent += following - segment["start"] - segment["duration"]
+            lowered = segment["text"].lower()
+            for keyword, pattern in patterns.items():
+                timeline[int(segment["start"] // 60)][keyword] += len(pattern.findall(lowered))
+        rates[video_id] = words / (spoken / 60)
+        silence[video_id] = silent
+    return rates, silence, timeline
+
+
+def vectorized_reports(segments, min_gap):
+    return (analytics.words_per_minute(segments), analytics.silence_by_video(segments, min_gap),
+            analytics.keyword_timeline(segments, KEYWORDS))
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--hours", type=float, default=1.0, help="Length of each video")
+    parser.add_argument("--segment-seconds", type=float, default=3.0)
+    parser.add_argument("--min-gap", type=float, default=1.0)
+    args = parser.parse_args()
+
+    count = int(args.hours * 3600 / args.segment_seconds)
+    video_ids = fake_video_ids(args.videos + 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ArchiveStore(os.path.join(tmp, "archive"))
+        for n, video_id in enumerate(video_ids[:-1]):
+            store.put(video_id, corpus_segments(count, n, args.segment_seconds), LANGUAGES[n % len(LANGUAGES)], n % 2 == 0)
+        root = os.path.join(tmp, "analytics")
+        corpus = analytics.Corpus(root, store)
+
+        print(f"{args.videos} videos of {count} segments ({args.hours:g} h)\n")
+        print(f"{'step':<40} {'ms':>9}")
+        _, elapsed = timed(corpus.refresh)
+        print(f"{'first refresh (all videos)':<40} {elapsed:>9.1f}")
+        _, elapsed = timed(corpus.refresh)
+        print(f"{'refresh, nothing new':<40} {elapsed:>9.1f}")
+        store.put(video_ids[-1], corpus_segments(count, args.videos, args.segment_seconds), "en")
+        _, elapsed = timed(corpus.refresh)
+        print(f"{'refresh, one new video':<40} {elapsed:>9.1f}")
+        _, elapsed = timed(analytics.Corpus(root, store).refresh)
+        print(f"{'load materialized corpus':<40} {elapsed:>9.1f}")
+
+        (rates, silence, _), loop_ms = timed(python_reports, store, video_ids, args.min_gap)
+        (wpm, silent, _), vector_ms = timed(vectorized_reports, corpus.segments, args.min_gap)
+        print(f"{'reports, Python loop over archives':<40} {loop_ms:>9.1f}")
+        print(f"{'reports, vectorized':<40} {vector_ms:>9.1f}")
+
+        wpm_gap = max(abs(wpm.loc[video_id, "wpm"] - rate) for video_id, rate in rates.items())
+        silence_gap = max(abs(silent.loc[video_id, "silent_seconds"] - seconds) for video_id, seconds in silence.items())
+        print(f"\nlargest difference: {wpm_gap:.2g} wpm, {silence_gap:.2g} s of silence")
+
+
+if __name__ == "__main__":
+    main()
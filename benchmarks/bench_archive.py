@@ -0,0 +1,105 @@
+"""Size and read latency of the transcript archive against the current storage formats.
+
+Writes a synthetic corpus as plain `*_transcript.txt` files (what
+save_transcript_to_file writes, without timestamps), as JSONL segments (the
+smallest timestamped format available so far) and as `.yta` archives, then
+compares disk usage, full reads and reading a 3 minute window:
+
+    python benchmarks/bench_archive.py --videos 50 --hours 1
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_archive import ArchiveStore, TranscriptArchive, parse_time, zstandard
+from transcript_format import SegmentArray, to_plain_text
+from fake_youtube import fake_video_ids, synthetic_segments
+
+
+def directory_size(path, suffix):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith(suffix))
+
+
+def timed(func, video_ids):
+    """Median milliseconds of func(video_id) over all videos."""
+    times = []
+    for video_id in video_ids:
+        started = time.perf_counter()
+        func(video_id)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--hours", type=float, default=1.0, help="Length of each video")
+    parser.add_argument("--segment-seconds", type=float, default=2.0)
+    parser.add_argument("--window", default="12:00-15:00", help="Time range read from every video (m:ss-m:ss)")
+    args = parser.parse_args()
+
+    start, end = (parse_time(t) for t in args.window.split("-"))
+    count = int(args.hours * 3600 / args.segment_seconds)
+    video_ids = fake_video_ids(args.videos)
+    print(f"{args.videos} videos of {count} segments ({args.hours:g} h), "
+          f"codec: {'zstd' if zstandard is not None else 'zlib (zstandard not installed)'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        text_dir, jsonl_dir = os.path.join(tmp, "txt"), os.path.join(tmp, "jsonl")
+        os.makedirs(text_dir)
+        os.makedirs(jsonl_dir)
+        store = ArchiveStore(os.path.join(tmp, "archive"))
+
+        write_times = []
+        for n, video_id in enumerate(video_ids):
+            segments = synthetic_segments(count, seed=n, segment_seconds=args.segment_seconds)
+            with open(os.path.join(text_dir, f"{video_id}_transcript.txt"), "w", encoding="utf-8") as f:
+                f.write(to_plain_text(segments))
+            with open(os.path.join(jsonl_dir, f"{video_id}.jsonl"), "w", encoding="utf-8") as f:
+                SegmentArray.from_segments(segments).write_jsonl(f)
+            started = time.perf_counter()
+            store.put(video_id, segments, "en", True)
+            write_times.append((time.perf_counter() - started) * 1000)
+
+        def read_text(video_id):
+            with open(os.path.join(text_dir, f"{video_id}_transcript.txt"), encoding="utf-8") as f:
+                return f.read()
+
+        def read_jsonl_window(video_id):
+            with open(os.path.join(jsonl_dir, f"{video_id}.jsonl"), encoding="utf-8") as f:
+                segments = [json.loads(line) for line in f]
+            return [s for s in segments if start <= s["start"] < end]
+
+        def read_archive(video_id):
+            with TranscriptArchive(store.path(video_id)) as archive:
+                return archive.text()
+
+        def read_archive_window(video_id):
+            with TranscriptArchive(store.path(video_id)) as archive:
+                return archive.segments(start, end)
+
+        sizes = [
+            (".txt (no timestamps)", directory_size(text_dir, ".txt")),
+            (".jsonl segments", directory_size(jsonl_dir, ".jsonl")),
+            (".yta archive", store.stats()["bytes"]),
+        ]
+        print(f"\n{'storage':<22} {'total (MB)':>11} {'per video (KB)':>15}")
+        for name, size in sizes:
+            print(f"{name:<22} {size / 1e6:>11.2f} {size / len(video_ids) / 1e3:>15.1f}")
+
+        print(f"\n{'read (median per video)':<34} {'ms':>8}")
+        print(f"{'write .yta':<34} {statistics.median(write_times):>8.2f}")
+        print(f"{'full text from .txt':<34} {timed(read_text, video_ids):>8.2f}")
+        print(f"{'full text from .yta':<34} {timed(read_archive, video_ids):>8.2f}")
+        print(f"{args.window + ' from .jsonl':<34} {timed(read_jsonl_window, video_ids):>8.2f}")
+        print(f"{args.window + ' from .yta':<34} {timed(read_archive_window, video_ids):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Measure bulk extraction throughput (videos/second) at several concurrency levels.
+
+Runs entirely offline against FakeYouTubeTranscriptApi:
+
+    python benchmarks/bench_bulk.py --videos 200 --latency 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube
+from bulk import extract_many
+from fake_youtube import FakeYouTubeTranscriptApi, fake_video_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake remote call")
+    parser.add_argument("--transient-rate", type=float, default=0.02)
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    args = parser.parse_args()
+
+    urls = [f"https://youtu.be/{video_id}" for video_id in fake_video_ids(args.videos)]
+    print(f"{'workers':>8} {'seconds':>9} {'videos/s':>9} {'ok':>5} {'failed':>6}")
+
+    for workers in (int(w) for w in args.concurrency.split(",")):
+        youtube.YouTubeTranscriptApi = FakeYouTubeTranscriptApi(
+            latency=args.latency, transient_rate=args.transient_rate
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = extract_many(
+                urls, os.path.join(tmp, "out.jsonl"),
+                workers=workers, rate=0, backoff=0.01, resume=False, use_cache=False, index=False,
+            )
+        print(f"{workers:>8} {summary['elapsed']:>9.2f} {args.videos / summary['elapsed']:>9.1f} "
+              f"{summary['ok']:>5} {summary['failed']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Per-invocation latency of cli.py, cold in a new process against the warm daemon.
+
+Every command is a separate `python cli.py ...` process, as in a shell
+script. The cold path runs it in that process (`--no-daemon`); the daemon
+path sends it to a `cli.py daemon` started once. Both use the fake YouTube
+backend and a local Ollama stub, with caches in a temporary directory:
+
+    python benchmarks/bench_cli.py --runs 10
+"""
+import argparse
+import atexit
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_ollama import FakeOllamaServer
+from fake_youtube import fake_video_ids
+
+# Runs cli.main with the fake YouTube backend installed (the daemon and the cold path)
+BOOTSTRAP = """
+import sys
+sys.path[:0] = [{root!r}, {bench!r}]
+import youtube
+from fake_youtube import FakeYouTubeTranscriptApi
+youtube.YouTubeTranscriptApi = FakeYouTubeTranscriptApi(segments={segments}, latency={latency})
+import cli
+sys.exit(cli.main(sys.argv[1:]))
+"""
+
+
+def timed_runs(commands, env):
+    """Median and max milliseconds of running each command once."""
+    times = []
+    for command in commands:
+        started = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), max(times)
+
+
+def wait_for_socket(path, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(path)
+            return
+        except OSError:
+            time.sleep(0.05)
+        finally:
+            client.close()
+    raise SystemExit("The daemon did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Invocations per measurement")
+    parser.add_argument("--segments", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per simulated YouTube call")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, tmp, ignore_errors=True)
+    socket_path = os.path.join(tmp, "cli.sock")
+    ollama = FakeOllamaServer(base_latency=0.01, reply_tokens=20, eval_rate=2000).start()
+    env = dict(os.environ, OLLAMA_URLS=ollama.url, YTA_SOCKET=socket_path,
+               TRANSCRIPT_CACHE_PATH=os.path.join(tmp, "transcripts.sqlite3"),
+               RESPONSE_CACHE_PATH=os.path.join(tmp, "responses.sqlite3"),
+               SEARCH_INDEX_PATH=os.path.join(tmp, "search.sqlite3"),
+               TRANSCRIPT_ARCHIVE_DIR=os.path.join(tmp, "archive"),
+               SINGLEFLIGHT_LOCK_DIR="")
+    python = sys.executable
+    cli = os.path.join(ROOT, "cli.py")
+    bootstrap = [python, "-c", BOOTSTRAP.format(root=ROOT, bench=BENCH_DIR, segments=args.segments,
+                                                latency=args.latency)]
+    cold_ids = fake_video_ids(2 * args.runs)[:args.runs]
+    warm_ids = fake_video_ids(2 * args.runs)[args.runs:]
+
+    rows = [
+        ("python -c pass", timed_runs([[python, "-c", "pass"]] * args.runs, env)),
+        ("import youtube", timed_runs([[python, "-c", f"import sys; sys.path.insert(0, {ROOT!r}); import youtube"]]
+                                      * args.runs, env)),
+        ("cli.py --help", timed_runs([[python, cli, "--help"]] * args.runs, env)),
+    ]
+
+    def scenarios(command, ids):
+        extract_new = [command + ["extract", video_id] for video_id in ids]
+        extract_cached = [command + ["extract", ids[0]]] * args.runs
+        ask = [command + ["ask", ids[0], f"Question {n} about the video?"] for n in range(args.runs)]
+        return [("extract, new video", extract_new), ("extract, cached", extract_cached),
+                ("ask, new question", ask)]
+
+    cold = [(name, timed_runs(commands, env)) for name, commands in scenarios(bootstrap + ["--no-daemon"], cold_ids)]
+
+    daemon = subprocess.Popen(bootstrap + ["daemon"], env=env, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_socket(socket_path)
+        warm = [(name, timed_runs(commands, env)) for name, commands in scenarios([python, cli], warm_ids)]
+    finally:
+        subprocess.run([python, cli, "daemon", "--stop"], env=env, stderr=subprocess.DEVNULL)
+        daemon.wait(timeout=10)
+        ollama.stop()
+
+    print(f"{args.runs} runs each, {args.segments} segments per video, {args.latency * 1000:.0f} ms per YouTube call\n")
+    print(f"{'':<22} {'median ms':>10} {'max ms':>8}")
+    for name, (median, worst) in rows:
+        print(f"{name:<22} {median:>10.0f} {worst:>8.0f}")
+    print(f"\n{'per invocation':<22} {'cold ms':>10} {'daemon ms':>10} {'speedup':>8}")
+    for (name, (cold_median, _)), (_, (warm_median, _)) in zip(cold, warm):
+        print(f"{name:<22} {cold_median:>10.0f} {warm_median:>10.0f} {cold_median / warm_median:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Time and peak memory of transcript formatting on a synthetic 10-hour transcript.
+
+Compares plain text built from the segment dicts (format_transcript) and
+with a join against the array-backed SegmentArray renderers:
+
+    python benchmarks/bench_format.py --hours 10
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_format import SegmentArray, to_plain_text
+from fake_youtube import synthetic_segments
+
+
+def join_format(transcript_list):
+    """Plain text with a single join, which holds a list of every piece at once."""
+    return "".join([segment["text"] + " " for segment in transcript_list])
+
+
+def write_srt(array):
+    with open(os.devnull, "w", encoding="utf-8") as f:
+        array.write_srt(f)
+
+
+def measure(func):
+    """Return (result, seconds, peak bytes); timed without tracemalloc overhead."""
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    del result
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=10)
+    parser.add_argument("--segment-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    count = int(args.hours * 3600 / args.segment_seconds)
+    segments = synthetic_segments(count, segment_seconds=args.segment_seconds)
+    print(f"{count} segments ({args.hours:g} hours)")
+
+    array, build_time, build_peak = measure(lambda: SegmentArray.from_segments(segments))
+    _, _, dicts_peak = measure(lambda: synthetic_segments(count, segment_seconds=args.segment_seconds))
+
+    cases = [
+        ("to_plain_text (concat)", lambda: to_plain_text(segments)),
+        ("join text", lambda: join_format(segments)),
+        ("SegmentArray text", lambda: array.render("txt")),
+        ("SegmentArray srt", lambda: array.render("srt")),
+        ("SegmentArray vtt", lambda: array.render("vtt")),
+        ("SegmentArray jsonl", lambda: array.render("jsonl")),
+        ("SegmentArray srt -> file", lambda: write_srt(array)),
+    ]
+
+    print(f"{'case':<26} {'time (ms)':>10} {'peak (MB)':>10}")
+    print(f"{'build SegmentArray':<26} {build_time * 1000:>10.1f} {build_peak / 1e6:>10.2f}")
+    for name, func in cases:
+        _, elapsed, peak = measure(func)
+        print(f"{name:<26} {elapsed * 1000:>10.1f} {peak / 1e6:>10.2f}")
+    print(f"segment dicts held in memory: {dicts_peak / 1e6:.2f} MB, SegmentArray: {build_peak / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Knowledge store query latency and recall against corpus size, exact and IVF.
+
+Writes stores of synthetic, clustered chunk embeddings (topics with noise,
+like transcripts of a course) of each size, then times `search` with the
+exact scan over the memory-mapped matrix and with the IVF index, and the
+recall of the IVF results against the exact ones. Finally it embeds a small
+archived corpus through the Ollama stub, one chunk per request and in
+batches:
+
+    python benchmarks/bench_knowledge.py --sizes 10000,50000,200000 --dimension 384
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+import numpy as np
+
+import knowledge_store
+from fake_ollama import FakeOllamaServer
+from fake_youtube import fake_video_ids, synthetic_segments
+from ollama_client import OllamaClient, OllamaConfig
+from transcript_archive import ArchiveStore
+
+CHUNKS_PER_VIDEO = 60
+
+
+def clustered_vectors(rows, dimension, topics, rng):
+    centers = rng.standard_normal((topics, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, rows)] + rng.standard_normal((rows, dimension)).astype(np.float32)
+    return knowledge_store._normalize(vectors)
+
+
+def write_store(root, vectors):
+    """Lay out a store's files directly, as refresh() would for `vectors`."""
+    os.makedirs(root, exist_ok=True)
+    vectors.tofile(os.path.join(root, knowledge_store.VECTORS_NAME))
+    videos = {}
+    with open(os.path.join(root, knowledge_store.CHUNKS_NAME), "w", encoding="utf-8") as f:
+        for row in range(len(vectors)):
+            video_id = f"vid{row // CHUNKS_PER_VIDEO:08d}"
+            videos.setdefault(video_id, {"signature": [0, 0], "first": row, "count": 0})["count"] += 1
+            start = (row % CHUNKS_PER_VIDEO) * 60.0
+            f.write(json.dumps({"video_id": video_id, "start": start, "end": start + 60, "text": ""}) + "\n")
+    manifest = {"model": "bench", "dimension": vectors.shape[1], "rows": len(vectors),
+                "chunks_bytes": os.path.getsize(os.path.join(root, knowledge_store.CHUNKS_NAME)),
+                "videos": videos, "ivf": False}
+    with open(os.path.join(root, knowledge_store.MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def timed_queries(store, queries, k, **options):
+    times, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = store.search(query, k, **options)
+        times.append((time.perf_counter() - started) * 1000)
+        results.append({(hit["video_id"], hit["start"]) for hit in hits})
+    return statistics.median(times), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,50000,200000", help="Comma-separated corpus sizes in chunks")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=8)
+    parser.add_argument("--probes", type=int, default=knowledge_store.IVF_PROBES)
+    parser.add_argument("--videos", type=int, default=20, help="Archived videos embedded through the Ollama stub")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{args.dimension} dimensions, top {args.k}, {args.queries} queries, IVF probing {args.probes} lists\n")
+    print(f"{'chunks':>8} {'MB':>7} {'exact ms':>9} {'IVF build s':>12} {'IVF ms':>7} {'recall':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(size) for size in args.sizes.split(",")):
+            root = os.path.join(tmp, f"store{size}")
+            vectors = clustered_vectors(size, args.dimension, max(8, size // 2000), rng)
+            write_store(root, vectors)
+            queries = {f"q{n}": vector for n, vector in
+                       enumerate(vectors[rng.integers(0, size, args.queries)]
+                                 + 0.5 * rng.standard_normal((args.queries, args.dimension)).astype(np.float32))}
+            del vectors
+            store = knowledge_store.KnowledgeStore(root, ArchiveStore(os.path.join(tmp, "empty")),
+                                                   embed=lambda texts: [queries[text] for text in texts],
+                                                   model="bench")
+            exact_ms, exact = timed_queries(store, queries, args.k, exact=True)
+            started = time.perf_counter()
+            store.build_ivf()
+            build_seconds = time.perf_counter() - started
+            ivf_ms, approximate = timed_queries(store, queries, args.k, probes=args.probes)
+            recall = statistics.mean(len(a & e) / len(e) for a, e in zip(approximate, exact))
+            print(f"{size:>8} {store.matrix.nbytes / 1e6:>7.0f} {exact_ms:>9.2f} {build_seconds:>12.1f} "
+                  f"{ivf_ms:>7.2f} {recall:>7.2f}")
+
+        archive = ArchiveStore(os.path.join(tmp, "archive"))
+        for n, video_id in enumerate(fake_video_ids(args.videos)):
+            archive.put(video_id, synthetic_segments(600, seed=n), "en")
+        print(f"\nembedding {args.videos} archived videos through the Ollama stub")
+        print(f"{'batch':>8} {'requests':>9} {'seconds':>8}")
+        for batch_size in (1, knowledge_store.EMBED_BATCH_SIZE):
+            with FakeOllamaServer(base_latency=0.01) as server:
+                client = OllamaClient(OllamaConfig([server.url]))
+                store = knowledge_store.KnowledgeStore(
+                    os.path.join(tmp, f"embedded{batch_size}"), archive, model="stub", batch_size=batch_size,
+                    embed=knowledge_store.make_embedder("stub", client))
+                changes = store.refresh()
+                print(f"{batch_size:>8} {server.requests:>9} {changes['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare follow-up latency with the transcript after the question vs. in a stable prompt prefix.
+
+Runs offline against a local stub Ollama server that, like Ollama, skips
+re-evaluating the prompt prefix it has already seen:
+
+    python benchmarks/bench_prefix.py --minutes 20 --turns 5
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_client import OllamaClient, OllamaConfig
+from prompt_budget import PromptBudget
+from youtube import format_transcript
+from fake_ollama import FakeOllamaServer
+from fake_youtube import synthetic_segments
+
+QUESTIONS = [
+    "What does the video say about the python cache?",
+    "How is the model trained on local data?",
+    "Explain the part about token streaming.",
+    "What example is given for the network function?",
+    "Summarize the answer about summaries.",
+]
+
+
+def converse(client, budget, transcript, layout, turns):
+    """Ask `turns` questions in one conversation; returns per-turn (prompt tokens evaluated, prompt s, TTFT s)."""
+    history, rows = [], []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        plan = budget.build(question, transcript, history, layout=layout)
+        with client.stream({"messages": plan.messages}) as stream:
+            answer = "".join(stream)
+        rows.append((stream.stats["prompt_eval_count"], stream.stats["prompt_eval_duration"] / 1e9,
+                     stream.time_to_first_token))
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, default=20, help="Length of the synthetic video")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--prompt-eval-rate", type=float, default=2000.0, help="Fake prompt tokens per second")
+    parser.add_argument("--num-ctx", type=int, default=16384)
+    args = parser.parse_args()
+
+    transcript = format_transcript(synthetic_segments(args.minutes * 15))
+
+    with FakeOllamaServer(prompt_eval_rate=args.prompt_eval_rate, reply_tokens=60, eval_rate=2000) as server:
+        config = OllamaConfig(base_urls=[server.url], model="fake", num_ctx=args.num_ctx)
+        client = OllamaClient(config)
+        budget = PromptBudget.from_config(config)
+        if not budget.fits_prefix(transcript):
+            print(f"Transcript does not fit a {args.num_ctx} token prefix; raise --num-ctx or lower --minutes")
+        print(f"{'layout':>9} {'turn':>5} {'evaluated':>10} {'prompt (s)':>11} {'TTFT (s)':>9}")
+        for layout in ("question", "prefix"):
+            for turn, (tokens, prompt_time, ttft) in enumerate(converse(client, budget, transcript, layout,
+                                                                        args.turns), 1):
+                print(f"{layout:>9} {turn:>5} {tokens:>10} {prompt_time:>11.3f} {ttft:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Nightly re-crawl of a video set, refetching everything against an incremental refresh.
+
+A fake YouTube backend serves `--videos` videos. After a first crawl,
+`--changed` of them get a manual English track (replacing the
+auto-generated one the policy picked) and as many get an extra language
+that is not picked. The re-crawl then fetches every video again
+(`--force`, like running bulk.py again without its checkpoint), or lists
+them and fetches only those whose chosen track changed:
+
+    python benchmarks/bench_refresh.py --videos 500 --changed 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+# Removed when the interpreter exits
+_tmp = tempfile.TemporaryDirectory()
+TMP = _tmp.name
+os.environ.update(TRANSCRIPT_CACHE_PATH=os.path.join(TMP, "transcripts.sqlite3"),
+                  SEARCH_INDEX_PATH=os.path.join(TMP, "search.sqlite3"),
+                  TRANSCRIPT_ARCHIVE_DIR=os.path.join(TMP, "archive"),
+                  SINGLEFLIGHT_LOCK_DIR="")
+
+import refresh
+import youtube
+from fake_youtube import FakeYouTubeTranscriptApi, fake_video_ids
+
+
+def crawl(video_ids, args, force):
+    """Crawl once from the same initial state; returns (summary, remote calls)."""
+    backend = FakeYouTubeTranscriptApi(segments=args.segments, latency=args.latency)
+    youtube.YouTubeTranscriptApi = backend
+    state = refresh.RefreshState(os.path.join(TMP, f"state-{force}.sqlite3"))
+    refresh.refresh_many(video_ids, state, workers=args.workers, rate=0)
+    youtube.get_transcript_cache().clear()
+
+    count = int(len(video_ids) * args.changed)
+    for video_id in video_ids[:count]:
+        backend.video_tracks[video_id] = (("en", True), ("en", False))
+    for video_id in video_ids[count:2 * count]:
+        backend.video_tracks[video_id] = (("en", True), ("de", True))
+    backend.remote_calls = 0
+    summary = refresh.refresh_many(video_ids, state, workers=args.workers, rate=0, force=force)
+    return summary, backend.remote_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--changed", type=float, default=0.02, help="Fraction of videos that got a manual track")
+    parser.add_argument("--segments", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per simulated YouTube call")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    video_ids = fake_video_ids(args.videos)
+    print(f"{args.videos} videos, {args.changed:.0%} with a new manual track, {args.workers} workers, "
+          f"{args.latency * 1000:.0f} ms per YouTube call\n")
+    print(f"{'re-crawl':<14} {'requests':>9} {'fetched':>8} {'skipped':>8} {'changed':>8} {'seconds':>8}")
+    for name, force in (("refetch all", True), ("incremental", False)):
+        summary, calls = crawl(video_ids, args, force)
+        print(f"{name:<14} {calls:>9} {summary['fetched']:>8} {summary['skipped']:>8} {summary['changed']:>8} "
+              f"{summary['elapsed']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
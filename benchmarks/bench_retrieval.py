@@ -0,0 +1,83 @@
+"""Compare prompt size and chat latency: full-transcript prompt vs. retrieved chunks.
+
+Runs offline against a synthetic transcript and a local stub Ollama server:
+
+    python benchmarks/bench_retrieval.py --minutes 60
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from retrieval import TranscriptIndex, build_question_prompt, format_context, ollama_embedder
+from youtube import format_transcript
+from fake_ollama import FakeOllamaServer, estimate_tokens
+from fake_youtube import synthetic_segments
+
+SYSTEM_PROMPT = "You are an assistant that answers questions about YouTube video transcripts."
+
+QUESTIONS = [
+    "What does the video say about the python cache?",
+    "How is the model trained on local data?",
+    "Explain the part about token streaming.",
+    "What example is given for the network function?",
+]
+
+
+def ask(url, user_message):
+    payload = {
+        "model": "fake",
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_message},
+        ],
+        "stream": False,
+    }
+    started = time.perf_counter()
+    response = requests.post(url + "/api/chat", json=payload, timeout=600)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=int, default=60, help="Length of the synthetic video")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--embeddings", action="store_true", help="Also fuse stub embeddings into retrieval")
+    args = parser.parse_args()
+
+    segments = synthetic_segments(args.minutes * 15)
+    transcript = format_transcript(segments)
+
+    with FakeOllamaServer() as server:
+        embed = ollama_embedder(server.url + "/api/embed", "fake") if args.embeddings else None
+        started = time.perf_counter()
+        index = TranscriptIndex(segments, embed=embed)
+        build_time = time.perf_counter() - started
+
+        results = {"full": [], "retrieval": []}
+        sizes = {"full": [], "retrieval": []}
+        for question in QUESTIONS:
+            full_prompt = build_question_prompt(question, transcript)
+            sizes["full"].append(estimate_tokens(full_prompt))
+            results["full"].append(ask(server.url, full_prompt))
+
+            started = time.perf_counter()
+            context = format_context(index.search(question, args.top_k))
+            retrieval_prompt = build_question_prompt(question, context)
+            search_time = time.perf_counter() - started
+            sizes["retrieval"].append(estimate_tokens(retrieval_prompt))
+            results["retrieval"].append(search_time + ask(server.url, retrieval_prompt))
+
+    print(f"{args.minutes} min transcript, {len(index.chunks)} chunks, index built in {build_time * 1000:.1f} ms")
+    print(f"{'mode':>10} {'prompt tokens':>14} {'latency (s)':>12}")
+    for mode in ("full", "retrieval"):
+        print(f"{mode:>10} {statistics.mean(sizes[mode]):>14.0f} {statistics.mean(results[mode]):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
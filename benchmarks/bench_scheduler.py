@@ -0,0 +1,94 @@
+"""Chat latency of interactive users while another user floods the model with background work.
+
+A local Ollama stub generates `--parallel` answers at once, like
+OLLAMA_NUM_PARALLEL, and queues the rest. One flow submits `--flood`
+background summaries at once while `--users` sessions each ask
+`--questions` chat questions one after another. Without admission control
+every request goes straight to Ollama's queue; with the LLMScheduler
+chats jump the background work and sessions take turns:
+
+    python benchmarks/bench_scheduler.py --users 4 --flood 24
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.dirname(BENCH_DIR), BENCH_DIR]
+
+from fake_ollama import FakeOllamaServer
+from ollama_client import OllamaClient, OllamaConfig
+from scheduler import LLMScheduler, LLMBusy, BACKGROUND
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(server, scheduler, args):
+    """Per-question chat latencies, the flood's total time and its shed requests."""
+    client = OllamaClient(OllamaConfig([server.url], pool_maxsize=64), scheduler=scheduler)
+    latencies, shed = [], []
+    lock = threading.Lock()
+
+    def background(n):
+        try:
+            client.complete(f"Summarize part {n} of the transcript.", flow="flood", priority=BACKGROUND)
+        except LLMBusy:
+            with lock:
+                shed.append(n)
+
+    def user(n):
+        for question in range(args.questions):
+            started = time.perf_counter()
+            client.complete(f"User {n} asks question {question}?", flow=f"user{n}")
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    flood = [threading.Thread(target=background, args=(n,)) for n in range(args.flood)]
+    for thread in flood:
+        thread.start()
+    time.sleep(0.05)
+    users = [threading.Thread(target=user, args=(n,)) for n in range(args.users)]
+    for thread in users:
+        thread.start()
+    for thread in users + flood:
+        thread.join()
+    return latencies, time.perf_counter() - started, shed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parallel", type=int, default=4, help="Answers the stub generates at once")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=3, help="Questions per user, asked one after another")
+    parser.add_argument("--flood", type=int, default=24, help="Background requests submitted at once")
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(base_latency=0.05, reply_tokens=args.reply_tokens, eval_rate=200,
+                              cache_slots=0, num_parallel=args.parallel).start()
+    try:
+        rows = [
+            ("no admission control", run(server, LLMScheduler(slots=10 ** 6, background_slots=10 ** 6), args)),
+            ("LLMScheduler", run(server, LLMScheduler(slots=args.parallel, max_queue=args.flood + args.users,
+                                                      max_queue_per_flow=args.flood), args)),
+        ]
+    finally:
+        server.stop()
+
+    print(f"{args.parallel} slots, {args.flood} background requests, "
+          f"{args.users} users x {args.questions} chat questions\n")
+    print(f"{'':<22} {'chat p50 s':>11} {'chat p95 s':>11} {'chat max s':>11} {'all done s':>11} {'shed':>5}")
+    for name, (latencies, total, shed) in rows:
+        print(f"{name:<22} {statistics.median(latencies):>11.2f} {percentile(latencies, 0.95):>11.2f} "
+              f"{max(latencies):>11.2f} {total:>11.2f} {len(shed):>5}")
+
+
+if __name__ == "__main__":
+    main()
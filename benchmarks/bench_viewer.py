@@ -0,0 +1,108 @@
+"""Streamlit rerun latency and rendered size with a long transcript loaded.
+
+Runs the app headless with streamlit's AppTest against the fake YouTube
+backend, extracts a synthetic transcript and measures full reruns, which
+every widget interaction (including each chat message) triggers: the time
+spent executing the script and the bytes of messages sent to the browser.
+AppTest recompiles the script on every run, so its wall-clock time is shown
+separately. To compare with an earlier version of the app:
+
+    git show HEAD~1:streamlit_app.py > /tmp/app_before.py
+    python benchmarks/bench_viewer.py --hours 10 --app /tmp/app_before.py
+    python benchmarks/bench_viewer.py --hours 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Removed when the interpreter exits
+_tmp = tempfile.TemporaryDirectory()
+TMP = _tmp.name
+for name, filename in (("TRANSCRIPT_CACHE_PATH", "transcripts.sqlite3"), ("RESPONSE_CACHE_PATH", "responses.sqlite3"),
+                       ("SEARCH_INDEX_PATH", "search.sqlite3"), ("JOBS_PATH", "jobs.sqlite3"),
+                       ("TRANSCRIPT_ARCHIVE_DIR", "archive")):
+    os.environ[name] = os.path.join(TMP, filename)
+# Extract within the script run so the transcript is loaded after one run
+os.environ["BACKGROUND_JOBS"] = "0"
+
+from streamlit.runtime.scriptrunner import script_runner
+from streamlit.testing.v1 import AppTest, local_script_runner
+
+import youtube
+from fake_youtube import FakeYouTubeTranscriptApi
+
+
+class RunProbe:
+    """Record script execution time and outgoing message bytes of each run (hooks streamlit internals)."""
+
+    def __init__(self):
+        self.exec_seconds = []
+        self.message_bytes = []
+        exec_func = script_runner.exec_func_with_error_handling
+        parse = local_script_runner.parse_tree_from_messages
+
+        def timed_exec(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return exec_func(*args, **kwargs)
+            finally:
+                self.exec_seconds.append(time.perf_counter() - started)
+
+        def measured_parse(messages):
+            self.message_bytes.append(sum(message.ByteSize() for message in messages))
+            return parse(messages)
+
+        script_runner.exec_func_with_error_handling = timed_exec
+        local_script_runner.parse_tree_from_messages = measured_parse
+
+
+def rendered_chars(at):
+    """Characters of transcript-bearing elements in the rendered page."""
+    elements = list(at.text_area) + list(at.text) + list(at.markdown) + list(at.code)
+    return sum(len(element.value or "") for element in elements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=float, default=10)
+    parser.add_argument("--segment-seconds", type=float, default=2.0)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--app", default=os.path.join(ROOT, "streamlit_app.py"))
+    args = parser.parse_args()
+
+    segments = int(args.hours * 3600 / args.segment_seconds)
+    youtube.YouTubeTranscriptApi = FakeYouTubeTranscriptApi(segments=segments, latency=0)
+
+    probe = RunProbe()
+    at = AppTest.from_file(args.app, default_timeout=300).run()
+    at.text_input(key="url_input").input("https://youtu.be/vid00000001")
+    [button for button in at.button if "Extract" in button.label][0].click()
+    started = time.perf_counter()
+    at.run()
+    extract_time = time.perf_counter() - started
+    if at.exception:
+        raise SystemExit(at.exception)
+
+    times = []
+    del probe.exec_seconds[:], probe.message_bytes[:]
+    for _ in range(args.reruns):
+        started = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - started) * 1000)
+
+    print(f"{os.path.basename(args.app)}: {segments} segments ({args.hours:g} hours)")
+    print(f"extraction run:             {extract_time * 1000:>9.0f} ms")
+    print(f"rerun, script (median):     {statistics.median(probe.exec_seconds) * 1000:>9.1f} ms")
+    print(f"rerun, AppTest (median):    {statistics.median(times):>9.1f} ms")
+    print(f"sent to browser per rerun:  {statistics.median(probe.message_bytes) / 1e6:>9.2f} MB")
+    print(f"rendered text:              {rendered_chars(at) / 1e6:>9.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Local HTTP stand-in for the Ollama API used by the benchmarks."""
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class FakeOllamaServer:
+    """Serves /api/chat and /api/embed on localhost with simulated latency.
+
+    Latency grows with prompt size like a real model: `base_latency` plus
+    prompt tokens / `prompt_eval_rate` plus `reply_tokens` / `eval_rate`.
+    Like Ollama, the longest prefix shared with one of the last `cache_slots`
+    prompts is not evaluated again (0 disables this prompt cache). With
+    `num_parallel`, at most that many chats are generated at once and the
+    rest wait in line, like OLLAMA_NUM_PARALLEL.
+    """
+
+    def __init__(self, base_latency=0.05, prompt_eval_rate=4000.0, eval_rate=400.0,
+                 reply_tokens=120, embedding_dim=256, cache_slots=4, num_parallel=None):
+        self.base_latency = base_latency
+        self.prompt_eval_rate = prompt_eval_rate
+        self.eval_rate = eval_rate
+        self.reply_tokens = reply_tokens
+        self.embedding_dim = embedding_dim
+        self.cache_slots = cache_slots
+        self.requests = 0
+        self.cancelled = 0
+        self._slots = []
+        self._slots_lock = threading.Lock()
+        self._parallel = threading.Semaphore(num_parallel) if num_parallel else None
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        handler = type("Handler", (_Handler,), {"backend": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def chat(self, payload):
+        """Return the complete (non-streaming) response body."""
+        chunks = list(self.chat_stream(payload))
+        final = chunks[-1]
+        final["message"] = {"role": "assistant", "content": "".join(c["message"]["content"] for c in chunks)}
+        return final
+
+    def _uncached_tokens(self, prompt):
+        """Tokens of `prompt` after the longest prefix shared with a cached prompt."""
+        if not self.cache_slots:
+            return estimate_tokens(prompt)
+        with self._slots_lock:
+            shared, best = 0, None
+            for i, cached in enumerate(self._slots):
+                length = len(os.path.commonprefix([prompt, cached]))
+                if length > shared:
+                    shared, best = length, i
+            # The slot that served the prefix now holds this prompt; otherwise evict the oldest
+            if best is not None:
+                del self._slots[best]
+            self._slots.append(prompt)
+            del self._slots[:-self.cache_slots]
+        return max(1, estimate_tokens(prompt[shared:]))
+
+    def chat_stream(self, payload):
+        """Yield NDJSON response chunks, sleeping like a model would."""
+        if self._parallel is None:
+            yield from self._generate(payload)
+            return
+        with self._parallel:
+            yield from self._generate(payload)
+
+    def _generate(self, payload):
+        prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in payload.get("messages", []))
+        prompt_tokens = self._uncached_tokens(prompt)
+        prompt_eval = prompt_tokens / self.prompt_eval_rate
+        time.sleep(self.base_latency + prompt_eval)
+
+        started = time.perf_counter()
+        for _ in range(self.reply_tokens):
+            time.sleep(1.0 / self.eval_rate)
+            yield {"model": payload.get("model", "fake"), "message": {"role": "assistant", "content": "word "}, "done": False}
+        eval_time = time.perf_counter() - started
+
+        yield {
+            "model": payload.get("model", "fake"),
+            "message": {"role": "assistant", "content": ""},
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval * 1e9),
+            "eval_count": self.reply_tokens,
+            "eval_duration": int(eval_time * 1e9),
+            "total_duration": int((self.base_latency + prompt_eval + eval_time) * 1e9),
+        }
+
+    def embed(self, payload):
+        texts = payload.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        return {"model": payload.get("model", "fake"), "embeddings": [self._vector(t) for t in texts]}
+
+    def _vector(self, text):
+        # Hashed bag of words: similar texts get similar vectors
+        vector = [0.0] * self.embedding_dim
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.embedding_dim] += 1.0
+        return vector
+
+
+class _Handler(BaseHTTPRequestHandler):
+    backend = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/api/version":
+            self.send_error(404)
+            return
+        data = b'{"version": "fake"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.backend.requests += 1
+
+        if self.path == "/api/chat" and payload.get("stream", True):
+            self._stream(self.backend.chat_stream(payload))
+            return
+        if self.path == "/api/chat":
+            body = self.backend.chat(payload)
+        elif self.path == "/api/embed":
+            body = self.backend.embed(payload)
+        else:
+            self.send_error(404)
+            return
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                self.wfile.write(json.dumps(chunk).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            self.backend.cancelled += 1
@@ -0,0 +1,125 @@
+"""Local stand-in for YouTubeTranscriptApi used by the benchmarks."""
+import random
+import threading
+import time
+import zlib
+from youtube_transcript_api import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+
+WORDS = ("python", "transcript", "video", "model", "data", "learn", "example", "function",
+         "question", "answer", "local", "network", "stream", "cache", "token", "summary")
+
+
+def synthetic_segments(count, seed=0, segment_seconds=4.0):
+    """Build `count` transcript segments of a few words each."""
+    rng = random.Random(seed)
+    return [
+        {
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))),
+            "start": round(i * segment_seconds, 2),
+            "duration": segment_seconds,
+        }
+        for i in range(count)
+    ]
+
+
+class FakeTranscript:
+    def __init__(self, backend, video_id, language_code, is_generated):
+        self._backend = backend
+        self.video_id = video_id
+        self.language_code = language_code
+        self.language = language_code
+        self.is_generated = is_generated
+        self.is_translatable = True
+
+    def fetch(self):
+        self._backend._remote_call()
+        # Each track of a video, and each revision of it, has its own text
+        revision = self._backend.revisions.get(self.video_id, 0)
+        # crc32 rather than hash(), so the text is the same in every process
+        seed = zlib.crc32(f"{self.video_id}/{self.language_code}/{self.is_generated}/{revision}".encode()) & 0xFFFF
+        return synthetic_segments(self._backend.segments, seed=seed)
+
+
+class FakeTranscriptList:
+    def __init__(self, video_id, transcripts):
+        self.video_id = video_id
+        self._transcripts = transcripts
+
+    def __iter__(self):
+        return iter(self._transcripts)
+
+    def __str__(self):
+        return ", ".join(t.language_code for t in self._transcripts)
+
+    def _find(self, language_codes, generated_flags):
+        for code in language_codes:
+            for is_generated in generated_flags:
+                for transcript in self._transcripts:
+                    if transcript.language_code == code and transcript.is_generated == is_generated:
+                        return transcript
+        raise NoTranscriptFound(self.video_id, language_codes, self)
+
+    def find_transcript(self, language_codes):
+        return self._find(language_codes, (False, True))
+
+    def find_manually_created_transcript(self, language_codes):
+        return self._find(language_codes, (False,))
+
+    def find_generated_transcript(self, language_codes):
+        return self._find(language_codes, (True,))
+
+
+class FakeYouTubeTranscriptApi:
+    """Serves synthetic transcripts with configurable latency and failures.
+
+    `tracks` lists the (language_code, is_generated) tracks every video has;
+    `video_tracks` overrides them for some videos. Bumping a video's entry in
+    `revisions` changes the text of all its tracks, like edited captions.
+    `disabled_rate` of videos have transcripts disabled and `unavailable_rate`
+    are unavailable (both permanent errors); `transient_rate` of remote calls
+    raise ConnectionError.
+    """
+
+    def __init__(self, segments=600, tracks=(("en", True),), latency=0.05,
+                 disabled_rate=0.0, transient_rate=0.0, seed=0, unavailable_rate=0.0, video_tracks=None):
+        self.segments = segments
+        self.tracks = tracks
+        self.video_tracks = dict(video_tracks or {})
+        self.revisions = {}
+        self.latency = latency
+        self.disabled_rate = disabled_rate
+        self.unavailable_rate = unavailable_rate
+        self.transient_rate = transient_rate
+        self.remote_calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _remote_call(self):
+        with self._lock:
+            self.remote_calls += 1
+            failed = self._rng.random() < self.transient_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise ConnectionError("simulated transient failure")
+
+    def list_transcripts(self, video_id):
+        self._remote_call()
+        # Stable per video so retries see the same outcome
+        outcome = random.Random(video_id).random()
+        if outcome < self.disabled_rate:
+            raise TranscriptsDisabled(video_id)
+        if outcome < self.disabled_rate + self.unavailable_rate:
+            raise VideoUnavailable(video_id)
+        tracks = self.video_tracks.get(video_id, self.tracks)
+        return FakeTranscriptList(video_id, [
+            FakeTranscript(self, video_id, code, is_generated) for code, is_generated in tracks
+        ])
+
+    def get_transcript(self, video_id, languages=("en",)):
+        return self.list_transcripts(video_id).find_transcript(languages).fetch()
+
+
+def fake_video_ids(count):
+    """Return `count` distinct, well-formed 11 character video IDs."""
+    return [f"vid{i:08d}" for i in range(count)]
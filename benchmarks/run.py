@@ -0,0 +1,291 @@
+"""Reproducible benchmark suite: extraction, bulk extraction, chat and summarization.
+
+Everything runs offline against FakeYouTubeTranscriptApi and FakeOllamaServer
+(or a real Ollama with --ollama-url) and the results are written as JSON so
+releases can be compared:
+
+    python benchmarks/run.py -o results.json
+    python benchmarks/run.py --quick --compare results.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube
+from bulk import extract_many
+from ollama_client import OllamaClient, OllamaConfig
+from prompt_budget import PromptBudget, ConversationMemory
+from response_cache import ResponseCache
+from retrieval import TranscriptIndex, format_context
+from summarize import Summarizer
+from transcript_cache import TranscriptCache
+from fake_ollama import FakeOllamaServer
+from fake_youtube import FakeYouTubeTranscriptApi, fake_video_ids
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Default and --quick sizes for every scenario
+PARAMS = {
+    "extract": {"segments": 3000, "latency": 0.05, "repeats": 5},
+    "bulk": {"videos": 200, "workers": 8, "latency": 0.02, "transient_rate": 0.02, "disabled_rate": 0.05},
+    "chat": {"segments": 600, "turns": 5, "top_k": 5, "history": 4, "reply_tokens": 120, "prompt_eval_rate": 4000.0, "eval_rate": 400.0},
+    "summarize": {"segments": 9000, "workers": 4, "reply_tokens": 80, "prompt_eval_rate": 20000.0,
+                  "eval_rate": 2000.0},
+}
+QUICK_PARAMS = {
+    "extract": {"segments": 600, "repeats": 3},
+    "bulk": {"videos": 50},
+    "chat": {"turns": 3, "reply_tokens": 40},
+    "summarize": {"segments": 3000},
+}
+
+# Lower is better for these result keys; everything else is informational
+TIMING_KEYS = ("seconds", "p50", "p95", "mean", "ttft", "total", "map", "reduce")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def describe(values):
+    return {"mean": statistics.mean(values), "p50": percentile(values, 0.5), "p95": percentile(values, 0.95)}
+
+
+class Backends:
+    """Install the fake YouTube backend and point the LLM at a fake (or real) Ollama."""
+
+    def __init__(self, tmp, ollama_url=None, model="fake"):
+        self.tmp = tmp
+        self.ollama_url = ollama_url
+        self.model = model
+        self._original_api = youtube.YouTubeTranscriptApi
+        self._server = None
+
+    def youtube(self, **kwargs):
+        """Use a fresh fake backend and empty caches; returns the fake."""
+        youtube.YouTubeTranscriptApi = FakeYouTubeTranscriptApi(**kwargs)
+        youtube._listing_cache.clear()
+        path = os.path.join(self.tmp, f"transcripts-{time.monotonic_ns()}.sqlite3")
+        youtube._transcript_cache = TranscriptCache(path)
+        return youtube.YouTubeTranscriptApi
+
+    def ollama(self, **kwargs):
+        """Return an OllamaClient for a fresh fake server, or the real one given on the command line."""
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+        if self.ollama_url:
+            url = self.ollama_url
+        else:
+            self._server = FakeOllamaServer(**kwargs).start()
+            url = self._server.url
+        return OllamaClient(OllamaConfig(base_urls=[url], model=self.model))
+
+    def close(self):
+        youtube.YouTubeTranscriptApi = self._original_api
+        youtube._transcript_cache = None
+        if self._server is not None:
+            self._server.stop()
+
+
+def bench_extract(backends, p):
+    """Single video: cold fetch, listing cached, and served from the transcript cache."""
+    fake = backends.youtube(segments=p["segments"], latency=p["latency"])
+    result = {}
+    for case in ("cold", "warm"):
+        times, calls = [], []
+        for i in range(p["repeats"]):
+            video_id = fake_video_ids(p["repeats"])[i]
+            before = fake.remote_calls
+            started = time.perf_counter()
+            youtube.resolve_transcript(video_id)
+            times.append(time.perf_counter() - started)
+            calls.append(fake.remote_calls - before)
+        result[case] = dict(describe(times), remote_calls=statistics.mean(calls))
+    return result
+
+
+def bench_bulk(backends, p):
+    """Bulk extraction throughput with transient and permanent failures."""
+    fake = backends.youtube(latency=p["latency"], transient_rate=p["transient_rate"],
+                            disabled_rate=p["disabled_rate"])
+    urls = [f"https://youtu.be/{video_id}" for video_id in fake_video_ids(p["videos"])]
+    output = os.path.join(backends.tmp, "bulk.jsonl")
+    summary = extract_many(urls, output, workers=p["workers"], rate=0, backoff=0.01, resume=False,
+                           use_cache=False, index=False)
+    return {
+        "seconds": summary["elapsed"],
+        "videos_per_second": p["videos"] / summary["elapsed"],
+        "ok": summary["ok"],
+        "failed": summary["failed"],
+        "remote_calls": fake.remote_calls,
+    }
+
+
+def bench_chat(backends, p):
+    """A multi-turn streamed conversation about one transcript, prompted as the app and the API do.
+
+    A transcript that fits the stable prefix is sent whole; a longer one as
+    the excerpts retrieved for each question.
+    """
+    backends.youtube(segments=p["segments"], latency=0)
+    client = backends.ollama(reply_tokens=p["reply_tokens"], prompt_eval_rate=p["prompt_eval_rate"],
+                             eval_rate=p["eval_rate"])
+    resolution = youtube.resolve_transcript(fake_video_ids(1)[0])
+    budget = PromptBudget.from_config(client.config, max_history=p["history"])
+    memory = ConversationMemory()
+    index = None if budget.fits_prefix(resolution.text) else TranscriptIndex(resolution.segments)
+
+    history, ttft, total, prompt_tokens = [], [], [], []
+    for turn in range(p["turns"]):
+        question = f"Question {turn}: what does the video say about the python cache?"
+        if index is None:
+            plan = budget.build(question, resolution.text, history, memory=memory, layout="prefix")
+        else:
+            context = format_context(index.search(question, p["top_k"]))
+            plan = budget.build(question, context, history, memory=memory)
+        with client.stream({"messages": plan.messages}, affinity=resolution.video_id) as stream:
+            answer = "".join(stream)
+        ttft.append(stream.time_to_first_token)
+        total.append(stream.total_time)
+        prompt_tokens.append(stream.stats.get("prompt_eval_count", 0))
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    return {
+        "layout": "prefix" if index is None else "retrieval",
+        "ttft": describe(ttft),
+        "total": describe(total),
+        "first_turn_ttft": ttft[0],
+        "follow_up_ttft": statistics.mean(ttft[1:]) if len(ttft) > 1 else None,
+        "prompt_tokens_evaluated": prompt_tokens,
+    }
+
+
+def bench_summarize(backends, p):
+    """Map-reduce summary of a long transcript, then again with the chunk summaries cached."""
+    backends.youtube(segments=p["segments"], latency=0)
+    client = backends.ollama(reply_tokens=p["reply_tokens"], prompt_eval_rate=p["prompt_eval_rate"],
+                             eval_rate=p["eval_rate"])
+    resolution = youtube.resolve_transcript(fake_video_ids(1)[0])
+    cache = ResponseCache(os.path.join(backends.tmp, "responses.sqlite3"))
+    summarizer = Summarizer(client.complete, workers=p["workers"], cache=cache, model=client.model)
+
+    result = {}
+    for case in ("cold", "cached"):
+        summary = summarizer.summarize(resolution.text, "Summarize the video.", segments=resolution.segments)
+        result[case] = dict(summary.timings, chunks=summary.chunks, cached_chunks=summary.cached_chunks,
+                            reduce_rounds=summary.reduce_rounds)
+    return result
+
+
+SCENARIOS = {
+    "extract": bench_extract,
+    "bulk": bench_bulk,
+    "chat": bench_chat,
+    "summarize": bench_summarize,
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def flatten(data, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, numbers only."""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Print timing changes against a baseline; returns the names of regressions beyond `tolerance`."""
+    current = flatten(results["scenarios"])
+    previous = flatten(baseline.get("scenarios", {}))
+    regressions = []
+    print(f"\n{'metric':<40} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(current.keys() & previous.keys()):
+        if not name.rsplit(".", 1)[-1].endswith(TIMING_KEYS) or not previous[name]:
+            continue
+        change = current[name] / previous[name] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {previous[name]:>10.4f} {current[name]:>10.4f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS),
+                        help="Comma separated scenarios to run (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes, for a fast smoke run")
+    parser.add_argument("--compare", help="Baseline results JSON to compare timings against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Relative slowdown counted as a regression (default: %(default)s)")
+    parser.add_argument("--ollama-url", help="Benchmark chat/summarize against a real Ollama instead of the stub")
+    parser.add_argument("--model", default="fake", help="Model name used with --ollama-url")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    params = {name: dict(PARAMS[name], **(QUICK_PARAMS[name] if args.quick else {})) for name in names}
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "ollama": args.ollama_url or "stub",
+        "params": params,
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = Backends(tmp, args.ollama_url, args.model)
+        try:
+            for name in names:
+                started = time.perf_counter()
+                results["scenarios"][name] = SCENARIOS[name](backends, params[name])
+                print(f"{name:<10} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        finally:
+            backends.close()
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} timing(s) regressed by more than {args.tolerance:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from youtube_transcript_api import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
+from youtube import (DEFAULT_POLICY, extract_video_id, list_transcripts, format_transcript, get_transcript_cache,
+                     index_transcript, NoUsableTranscript)
+from metrics import start_textfile_exporter
+
+# Errors that will not go away by retrying
+PERMANENT_ERRORS = (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable, NoUsableTranscript)
+
+# All transcript requests go to the same host
+TRANSCRIPT_HOST = "www.youtube.com"
+
+
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` acquisitions per second."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host):
+        if not self.rate:
+            return
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.rate, self.burst)
+        limiter.acquire()
+
+
+def read_urls(stream):
+    """Yield non-empty, non-comment lines from a file object."""
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def load_checkpoint(output_path):
+    """Return the video IDs (or bad URLs) already recorded in an existing JSONL output."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A partially written last line from an interrupted run
+                continue
+            # Transient failures are retried on the next run
+            if record.get("status") == "ok" or record.get("permanent"):
+                # Unparseable URLs are recorded by URL instead of video ID
+                done.add(record.get("video_id") or record.get("url"))
+    return done
+
+
+def remote_call(limiter, max_retries, backoff, call, *args):
+    """Run one YouTube request through the rate limiter, retrying transient failures.
+
+    Returns (result, attempts). Permanent errors are raised right away,
+    transient ones once `max_retries` retries have failed too.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        limiter.acquire(TRANSCRIPT_HOST)
+        try:
+            return call(*args), attempt
+        except PERMANENT_ERRORS:
+            raise
+        except Exception:
+            if attempt > max_retries:
+                raise
+            # Exponential backoff with jitter so workers do not retry in lockstep
+            delay = backoff * (2 ** (attempt - 1))
+            time.sleep(delay + random.uniform(0, delay))
+
+
+def fetch_with_retry(video_id, limiter, max_retries=3, backoff=1.0, use_cache=True, policy=None):
+    """Fetch one transcript, retrying transient failures with exponential backoff.
+
+    The track listing and the transcript fetch are separate requests; each
+    takes its own token from `limiter` and is retried on its own. Returns a
+    result record suitable for writing as a JSONL line, plus the raw
+    `segments` of successful fetches (not meant to be written out).
+    """
+    policy = policy or DEFAULT_POLICY
+    started = time.perf_counter()
+    cache = get_transcript_cache() if use_cache else None
+    record = {"video_id": video_id}
+
+    if cache is not None:
+        # Same rule as resolve_transcript: only a cached track the policy prefers
+        entry = cache.get_preferred(video_id, lambda tracks: policy.select(tracks, fallback=False))
+        if entry is not None:
+            record.update(
+                status="ok",
+                language_code=entry["language_code"],
+                is_generated=entry["is_generated"],
+                transcript=format_transcript(entry["segments"]),
+                segments=entry["segments"],
+                attempts=0,
+                cached=True,
+                elapsed=time.perf_counter() - started,
+            )
+            return record
+
+    attempts = 0
+    try:
+        (transcript_list, _), calls = remote_call(limiter, max_retries, backoff, list_transcripts, video_id, False)
+        attempts += calls
+        track = policy.select(transcript_list)
+        if track is None:
+            raise NoUsableTranscript(video_id)
+        language_code, is_generated = track.language_code, bool(track.is_generated)
+
+        entry = cache.get(video_id, language_code, is_generated) if cache is not None else None
+        if entry is not None:
+            segments, cached = entry["segments"], True
+        else:
+            segments, calls = remote_call(limiter, max_retries, backoff, track.fetch)
+            attempts += calls
+            cached = False
+            if cache is not None:
+                cache.put(video_id, language_code, is_generated, segments)
+    except Exception as e:
+        record.update(status="error", permanent=isinstance(e, PERMANENT_ERRORS), error=f"{type(e).__name__}: {e}")
+    else:
+        record.update(
+            status="ok",
+            language_code=language_code,
+            is_generated=is_generated,
+            transcript=format_transcript(segments),
+            segments=segments,
+            cached=cached,
+        )
+
+    record["attempts"] = attempts
+    record["elapsed"] = time.perf_counter() - started
+    return record
+
+
+def iter_extract(urls, workers=8, rate=5.0, max_retries=3, backoff=1.0, skip=None, use_cache=True):
+    """Fetch transcripts concurrently and yield result records as they complete.
+
+    `urls` may be any iterable (including a lazily read stream); at most
+    `workers * 2` videos are in flight at once. Video IDs and URLs in `skip`
+    are ignored.
+    """
+    skip = set(skip or ())
+    limiter = HostRateLimiter(rate)
+    seen = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for url in urls:
+            video_id = extract_video_id(url)
+            if not video_id:
+                if url in skip:
+                    continue
+                yield {"video_id": None, "url": url, "status": "error", "permanent": True,
+                       "error": "Could not extract video ID from the URL."}
+                continue
+            if video_id in skip or video_id in seen:
+                continue
+            seen.add(video_id)
+
+            pending.add(executor.submit(fetch_with_retry, video_id, limiter, max_retries, backoff, use_cache))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def _end_last_line(output_path):
+    """Terminate a partially written last line, so the next record starts on a line of its own."""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def extract_many(urls, output_path, workers=8, rate=5.0, max_retries=3, backoff=1.0, resume=True,
+                 use_cache=True, progress=None, index=True):
+    """Extract transcripts for many URLs and append the results to a JSONL file.
+
+    Each record is written and flushed as soon as it completes, so the output
+    doubles as the checkpoint: with `resume=True` videos already recorded as
+    fetched (or permanently failed) are skipped. With `index=True` fetched
+    transcripts are also added to the full-text search index. Returns a
+    summary dict.
+    """
+    skip = load_checkpoint(output_path) if resume else set()
+    summary = {"ok": 0, "failed": 0, "skipped": len(skip)}
+    started = time.perf_counter()
+
+    mode = "a" if resume else "w"
+    if resume:
+        _end_last_line(output_path)
+    with open(output_path, mode, encoding="utf-8") as out:
+        for record in iter_extract(urls, workers, rate, max_retries, backoff, skip, use_cache):
+            segments = record.pop("segments", None)
+            if index and segments:
+                index_transcript(record["video_id"], record["transcript"], segments, record["language_code"])
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if record["status"] == "ok":
+                summary["ok"] += 1
+            else:
+                summary["failed"] += 1
+            if progress is not None:
+                progress(record, summary)
+
+    summary["elapsed"] = time.perf_counter() - started
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract transcripts for many YouTube videos.")
+    parser.add_argument("input", help="File with one YouTube URL per line, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl", help="JSONL output file (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Concurrent fetches (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Max requests per second to YouTube, 0 to disable (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries for transient failures (default: %(default)s)")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local transcript cache")
+    parser.add_argument("--no-index", action="store_true", help="Do not add fetched transcripts to the search index")
+    args = parser.parse_args(argv)
+
+    def report(record, summary):
+        status = "ok" if record["status"] == "ok" else f"error ({record.get('error')})"
+        print(f"[{summary['ok'] + summary['failed']}] {record['video_id']}: {status}", file=sys.stderr)
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    exporter = start_textfile_exporter()
+    try:
+        summary = extract_many(
+            read_urls(stream),
+            args.output,
+            workers=args.workers,
+            rate=args.rate,
+            max_retries=args.retries,
+            resume=not args.no_resume,
+            use_cache=not args.no_cache,
+            progress=report,
+            index=not args.no_index,
+        )
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if exporter is not None:
+            exporter.stop()
+
+    print(f"Done: {summary['ok']} fetched, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped in {summary['elapsed']:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,449 @@
+"""Non-interactive command line for scripts, with an optional warm daemon.
+
+    python cli.py extract URL [--format srt] [--save]
+    python cli.py batch urls.txt [-o transcripts.jsonl]
+    python cli.py ask URL "What is the main argument?"
+    python cli.py refresh [urls.txt]
+    python cli.py daemon [--status | --stop]
+
+Only the standard library is imported up front; each command imports the
+modules it needs when it runs. When a daemon (`python cli.py daemon`) is
+listening on the socket, commands are sent to it instead and run against
+its already imported modules, warm listing/transcript/answer caches and
+pooled Ollama connections. Without a daemon they run in this process.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def _default_socket():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp"
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return os.path.join(runtime_dir, f"yta-{uid}.sock")
+
+
+DEFAULT_SOCKET = os.environ.get("YTA_SOCKET") or _default_socket()
+
+# Most recent videos whose retrieval index is kept for `ask` (in the daemon)
+INDEX_CACHE_SIZE = 32
+RETRIEVAL_TOP_K = 5
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_budget = None
+
+
+def _as_url(value):
+    """Accept a bare video ID wherever a URL is expected."""
+    from youtube import is_valid_video_id
+    return f"https://youtu.be/{value}" if is_valid_video_id(value) else value
+
+
+def cmd_extract(args, out, err):
+    """Print (or write) the best transcript of one video."""
+    from youtube import get_best_transcript_resolution, save_transcript_to_file
+
+    resolution = get_best_transcript_resolution(_as_url(args.url), use_cache=not args.no_cache)
+    if isinstance(resolution, str):
+        err.write(resolution + "\n")
+        return 1
+    if args.format == "txt":
+        body = resolution.text.strip() + "\n"
+    else:
+        from transcript_format import SegmentArray
+        body = SegmentArray.from_segments(resolution.segments).render(args.format)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(body)
+    else:
+        out.write(body)
+    if args.save:
+        path = save_transcript_to_file(resolution.text, resolution.video_id, resolution.segments,
+                                       resolution.language_code, resolution.is_generated)
+        err.write(f"Saved to {path}\n")
+    return 0
+
+
+def cmd_batch(args, out, err):
+    """Extract many videos; JSONL records go to --output (resumable) or stdout."""
+    from bulk import extract_many, iter_extract, read_urls
+    from youtube import index_transcript
+
+    urls = (_as_url(url) for url in read_urls(args.lines))
+
+    def report(record, summary):
+        status = "ok" if record["status"] == "ok" else f"error ({record.get('error')})"
+        err.write(f"[{summary['ok'] + summary['failed']}] {record['video_id']}: {status}\n")
+
+    if args.output:
+        summary = extract_many(urls, args.output, workers=args.workers, rate=args.rate, max_retries=args.retries,
+                               resume=not args.no_resume, use_cache=not args.no_cache, progress=report,
+                               index=not args.no_index)
+        err.write(f"Done: {summary['ok']} fetched, {summary['failed']} failed, "
+                  f"{summary['skipped']} skipped in {summary['elapsed']:.1f}s\n")
+        return 0
+
+    summary = {"ok": 0, "failed": 0}
+    for record in iter_extract(urls, args.workers, args.rate, args.retries, use_cache=not args.no_cache):
+        segments = record.pop("segments", None)
+        if not args.no_index and segments:
+            index_transcript(record["video_id"], record["transcript"], segments, record["language_code"])
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        summary["ok" if record["status"] == "ok" else "failed"] += 1
+        report(record, summary)
+    return 0
+
+
+def cmd_refresh(args, out, err):
+    """Refetch only the transcripts that changed since the last refresh of these (or all known) videos."""
+    from refresh import DEFAULT_TTL_SECONDS, RefreshState, describe, refresh_many
+    from youtube import extract_video_id
+
+    state = RefreshState()
+    if args.lines is None:
+        video_ids = state.video_ids()
+    else:
+        from bulk import read_urls
+        video_ids = [video_id for video_id in (extract_video_id(_as_url(url)) for url in read_urls(args.lines))
+                     if video_id]
+
+    def report(record, summary):
+        if record["status"] != "ok":
+            status = f"error ({record.get('error')})"
+        else:
+            outcome = "changed" if record["changed"] else "fetched" if record["fetched"] else "skipped"
+            status = f"{outcome} ({record['reason']})"
+        err.write(f"[{summary['listed'] + summary['failed']}] {record['video_id']}: {status}\n")
+
+    ttl = DEFAULT_TTL_SECONDS if args.ttl is None else args.ttl
+    summary = refresh_many(video_ids, state, workers=args.workers, rate=args.rate, ttl=ttl, force=args.force,
+                           max_retries=args.retries, progress=report)
+    err.write(f"Done: {describe(summary)}\n")
+    return 0
+
+
+def _transcript_index(resolution):
+    from retrieval import TranscriptIndex
+    from response_cache import transcript_digest
+
+    # Keyed by content too, so a transcript changed by `refresh` gets a new index
+    key = (resolution.video_id, transcript_digest(resolution.text))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = TranscriptIndex(resolution.segments)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _ask_payload(question, resolution, client):
+    """Whole transcript as a stable prefix when it fits, retrieved excerpts otherwise.
+
+    Returns the payload and the transcript context it contains.
+    """
+    global _budget
+    from prompt_budget import PromptBudget
+    from retrieval import format_context
+
+    if _budget is None:
+        _budget = PromptBudget.from_config(client.config)
+    if _budget.fits_prefix(resolution.text):
+        context = resolution.text
+        plan = _budget.build(question, context, layout="prefix")
+    else:
+        context = format_context(_transcript_index(resolution).search(question, RETRIEVAL_TOP_K))
+        plan = _budget.build(question, context)
+    return {"messages": plan.messages}, context
+
+
+def cmd_ask(args, out, err):
+    """Answer a question about a video, streaming the answer as it is generated."""
+    from youtube import get_best_transcript_resolution
+    from jobs import get_ollama_client, get_response_cache, run_analyze
+    from ollama_client import OllamaError
+    from response_cache import transcript_digest
+    from scheduler import LLMBusy
+
+    resolution = get_best_transcript_resolution(_as_url(args.url))
+    if isinstance(resolution, str):
+        err.write(resolution + "\n")
+        return 1
+    try:
+        if args.whole:
+            # Map-reduce over the whole transcript, as Quick Analysis does
+            def report(progress, message=None):
+                if message:
+                    err.write(message + "\n")
+
+            out.write(run_analyze({"video_id": resolution.video_id, "prompt": args.question}, report)["response"] + "\n")
+            return 0
+
+        client = get_ollama_client()
+        cache = get_response_cache()
+        payload, context = _ask_payload(args.question, resolution, client)
+        # Keyed by what the model reads: an answer from retrieved excerpts is not reused for --whole
+        context_hash = transcript_digest(context)
+        cached = cache.get(client.model, context_hash, args.question, []) if cache is not None else None
+        if cached is not None:
+            out.write(cached + "\n")
+            return 0
+        stream = client.stream(payload, affinity=resolution.video_id, flow="cli")
+        for token in stream:
+            out.write(token)
+            out.flush()
+        out.write("\n")
+    except LLMBusy as e:
+        err.write(f"Error: {e}\n")
+        return 1
+    except OllamaError as e:
+        err.write(f"Error communicating with Ollama: {e}\n")
+        return 1
+    if cache is not None and stream.content:
+        cache.put(client.model, context_hash, args.question, stream.content, [])
+    return 0
+
+
+COMMANDS = {
+    "extract": cmd_extract,
+    "batch": cmd_batch,
+    "ask": cmd_ask,
+    "refresh": cmd_refresh,
+}
+
+
+class _FrameWriter:
+    """File-like object that forwards text to the client as {"stdout"|"stderr": text} lines."""
+
+    def __init__(self, wfile, name, lock):
+        self._wfile = wfile
+        self._name = name
+        self._lock = lock
+
+    def write(self, text):
+        if text:
+            with self._lock:
+                self._wfile.write((json.dumps({self._name: text}) + "\n").encode("utf-8"))
+                self._wfile.flush()
+
+    def flush(self):
+        pass
+
+
+def _warm_up():
+    """Import the command modules and open the shared caches and client before the first request."""
+    import bulk  # noqa: F401
+    import transcript_format  # noqa: F401
+    from jobs import get_ollama_client, get_response_cache
+    from youtube import get_transcript_cache
+
+    get_transcript_cache()
+    get_response_cache()
+    get_ollama_client()
+
+
+def serve(socket_path=DEFAULT_SOCKET):
+    """Run the daemon in the foreground until it is stopped."""
+    import signal
+    import socketserver
+
+    if _listening(socket_path):
+        raise SystemExit(f"A daemon is already listening on {socket_path}")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # Left behind by a daemon that did not shut down cleanly
+
+    _warm_up()
+    started = time.time()
+    served = {"requests": 0}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            line = self.rfile.readline()
+            if not line:
+                return  # A connection check, see _listening
+            request = json.loads(line)
+            lock = threading.Lock()
+            out, err = _FrameWriter(self.wfile, "stdout", lock), _FrameWriter(self.wfile, "stderr", lock)
+            command = request.get("command")
+            if command == "status":
+                from youtube import get_transcript_cache
+                cache = get_transcript_cache()
+                out.write(json.dumps({
+                    "pid": os.getpid(),
+                    "socket": socket_path,
+                    "uptime": round(time.time() - started, 1),
+                    "requests": served["requests"],
+                    "transcript_cache": cache.stats() if cache is not None else None,
+                }) + "\n")
+                code = 0
+            elif command == "stop":
+                err.write("Daemon stopping\n")
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                code = 0
+            elif command in COMMANDS:
+                served["requests"] += 1
+                try:
+                    code = COMMANDS[command](argparse.Namespace(**request["args"]), out, err)
+                except (BrokenPipeError, ConnectionResetError):
+                    return  # The client went away
+                except Exception as e:
+                    err.write(f"Error: {e}\n")
+                    code = 1
+            else:
+                err.write(f"Error: unknown command {command!r}\n")
+                code = 2
+            with lock:
+                self.wfile.write((json.dumps({"exit": code}) + "\n").encode("utf-8"))
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    # Only this user may connect
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(socket_path, Handler)
+    finally:
+        os.umask(old_umask)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"Daemon {os.getpid()} listening on {socket_path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def _connect(socket_path):
+    """A connection to the daemon, or None if none is listening (or Unix sockets are unsupported)."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+    return client
+
+
+def _listening(socket_path):
+    client = _connect(socket_path)
+    if client is None:
+        return False
+    client.close()
+    return True
+
+
+def send(socket_path, command, args, out, err):
+    """Run a command on the daemon, relaying its output; returns the exit code, or None if no daemon listens."""
+    client = _connect(socket_path)
+    if client is None:
+        return None
+    with client:
+        client.sendall((json.dumps({"command": command, "args": args}) + "\n").encode("utf-8"))
+        for line in client.makefile("rb"):
+            message = json.loads(line)
+            if "stdout" in message:
+                out.write(message["stdout"])
+                out.flush()
+            elif "stderr" in message:
+                err.write(message["stderr"])
+            elif "exit" in message:
+                return message["exit"]
+    err.write("Error: The daemon closed the connection.\n")
+    return 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Extract YouTube transcripts and ask questions about them.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Daemon socket (default: %(default)s)")
+    parser.add_argument("--no-daemon", action="store_true", help="Run in this process even if a daemon is listening")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="Print the transcript of a video")
+    extract.add_argument("url", help="YouTube URL or video ID")
+    extract.add_argument("-f", "--format", choices=("txt", "srt", "vtt", "jsonl"), default="txt")
+    extract.add_argument("-o", "--output", help="Write to this file instead of stdout")
+    extract.add_argument("--save", action="store_true", help="Also save, archive and index it like the app does")
+    extract.add_argument("--no-cache", action="store_true", help="Bypass the local transcript cache")
+
+    batch = commands.add_parser("batch", help="Extract many videos as JSONL records")
+    batch.add_argument("input", nargs="?", default="-", help="File with one URL or video ID per line, or '-' for stdin")
+    batch.add_argument("-o", "--output", help="JSONL file to append to and resume from (default: stdout)")
+    batch.add_argument("-w", "--workers", type=int, default=8)
+    batch.add_argument("--rate", type=float, default=5.0, help="Max requests per second to YouTube, 0 to disable")
+    batch.add_argument("--retries", type=int, default=3)
+    batch.add_argument("--no-resume", action="store_true", help="Overwrite --output instead of resuming")
+    batch.add_argument("--no-cache", action="store_true", help="Bypass the local transcript cache")
+    batch.add_argument("--no-index", action="store_true", help="Do not add transcripts to the search index")
+
+    ask = commands.add_parser("ask", help="Answer a question about a video")
+    ask.add_argument("url", help="YouTube URL or video ID")
+    ask.add_argument("question")
+    ask.add_argument("--whole", action="store_true", help="Read the whole transcript (map-reduce for long videos)")
+
+    refresh = commands.add_parser("refresh", help="Refetch only the transcripts that changed since the last refresh")
+    refresh.add_argument("input", nargs="?", help="File with one URL or video ID per line, or '-' for stdin "
+                                                  "(default: every video refreshed before)")
+    refresh.add_argument("-w", "--workers", type=int, default=8)
+    refresh.add_argument("--rate", type=float, default=5.0, help="Max requests per second to YouTube, 0 to disable")
+    refresh.add_argument("--retries", type=int, default=3)
+    refresh.add_argument("--ttl", type=float, help="Seconds after which unchanged videos are fetched again (default: REFRESH_TTL)")
+    refresh.add_argument("--force", action="store_true", help="Fetch every video again")
+
+    daemon = commands.add_parser("daemon", help="Run the warm-cache daemon in the foreground")
+    action = daemon.add_mutually_exclusive_group()
+    action.add_argument("--status", action="store_true", help="Show the running daemon's status")
+    action.add_argument("--stop", action="store_true", help="Stop the running daemon")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "daemon":
+        if not args.status and not args.stop:
+            serve(args.socket)
+            return 0
+        code = send(args.socket, "status" if args.status else "stop", {}, sys.stdout, sys.stderr)
+        if code is None:
+            print(f"No daemon is listening on {args.socket}", file=sys.stderr)
+            return 1
+        return code
+
+    # Inputs and outputs are resolved here, so a daemon with another working directory sees the same files
+    if args.command in ("batch", "refresh"):
+        args.lines = None
+        if args.input == "-":
+            args.lines = sys.stdin.readlines()
+        elif args.input is not None:
+            with open(args.input, encoding="utf-8") as stream:
+                args.lines = stream.readlines()
+        del args.input
+    if getattr(args, "output", None):
+        args.output = os.path.abspath(args.output)
+
+    if not args.no_daemon:
+        command_args = {k: v for k, v in vars(args).items() if k not in ("command", "socket", "no_daemon")}
+        code = send(args.socket, args.command, command_args, sys.stdout, sys.stderr)
+        if code is not None:
+            return code
+    return COMMANDS[args.command](args, sys.stdout, sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
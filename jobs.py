@@ -0,0 +1,376 @@
+"""Persistent background jobs for transcript extraction and analysis.
+
+Jobs are rows in a SQLite database. The app submits a job and polls its
+status, progress and result, while worker threads in the app process or
+separate worker processes (`python jobs.py worker`) run it. Because the
+state lives in the database, a job keeps running across Streamlit reruns
+and browser disconnects, and its result stays available until it is purged.
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from functools import partial
+
+from metrics import JOB_RUNS, JOB_SECONDS, error_class
+from ollama_client import OllamaClient
+from prompt_budget import PromptBudget
+from response_cache import ResponseCache, transcript_digest
+from scheduler import BACKGROUND
+from summarize import Summarizer, estimate_tokens
+from youtube import get_best_transcript_resolution, resolve_transcript
+
+DEFAULT_JOBS_PATH = os.environ.get(
+    "JOBS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.sqlite3")
+)
+# Finished jobs are deleted after this many seconds
+RETENTION_SECONDS = int(os.environ.get("JOBS_RETENTION", 24 * 3600))
+# Running jobs whose worker has not reported for this long are queued again
+STALE_SECONDS = int(os.environ.get("JOBS_STALE_AFTER", 120))
+POLL_SECONDS = 0.5
+
+# Same thresholds as the Streamlit app
+SUMMARY_DIRECT_LIMIT = 6000
+SUMMARY_CHUNK_TOKENS = 3000
+SUMMARY_WORKERS = 4
+STABLE_PREFIX = os.environ.get("CHAT_STABLE_PREFIX", "1") != "0"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue:
+    """SQLite-backed job queue shared by the app and any number of worker processes.
+
+    Submitting work identical to a job that is still queued or running
+    returns that job instead of adding another one.
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    result TEXT,
+                    error TEXT,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (key, status)")
+
+    def submit(self, kind, params):
+        """Queue a job and return its ID, or the ID of an identical unfinished job."""
+        key = hashlib.sha256(json.dumps([kind, params], sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (key, QUEUED, RUNNING)
+            ).fetchone()
+            if row is not None:
+                return row[0]
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, key, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, json.dumps(params), QUEUED, time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict (params and result decoded), or None."""
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            try:
+                row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            finally:
+                self._conn.row_factory = None
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def claim(self, worker, kinds):
+        """Mark the oldest queued job of one of `kinds` as running by `worker` and return it, or None."""
+        marks = ", ".join("?" * len(kinds))
+        while True:
+            with self._lock, self._conn:
+                row = self._conn.execute(
+                    f"SELECT id FROM jobs WHERE status = ? AND kind IN ({marks}) ORDER BY created_at LIMIT 1",
+                    (QUEUED, *kinds)
+                ).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                # Another process may have claimed it in between: only one UPDATE matches
+                claimed = self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, started_at = ?, heartbeat_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, worker, now, now, row[0], QUEUED)
+                ).rowcount
+            if claimed:
+                return self.get(row[0])
+
+    def progress(self, job_id, fraction, message=None):
+        """Record progress (0-1) of a running job; also serves as its heartbeat."""
+        with self._lock, self._conn:
+            if message is None:
+                self._conn.execute("UPDATE jobs SET progress = ?, heartbeat_at = ? WHERE id = ?",
+                                   (fraction, time.time(), job_id))
+            else:
+                self._conn.execute("UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                                   (fraction, message, time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id, result):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = 1, message = '', result = ?, finished_at = ? WHERE id = ?",
+                (DONE, json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                               (FAILED, error, time.time(), job_id))
+
+    def requeue_stale(self, older_than=STALE_SECONDS):
+        """Queue running jobs again whose worker stopped reporting (e.g. it crashed); returns how many."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, time.time() - older_than)
+            ).rowcount
+
+    def purge(self, older_than=RETENTION_SECONDS):
+        """Delete jobs that finished more than `older_than` seconds ago; returns how many."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - older_than)
+            ).rowcount
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+
+class JobError(Exception):
+    """Raised by a handler to fail a job with a message meant for the user."""
+
+
+_ollama_client = None
+_response_cache = None
+
+
+def get_ollama_client():
+    global _ollama_client
+    if _ollama_client is None:
+        _ollama_client = OllamaClient.from_env()
+    return _ollama_client
+
+
+def get_response_cache():
+    """Return the shared answer cache, or None if it cannot be opened."""
+    global _response_cache
+    if _response_cache is None:
+        try:
+            _response_cache = ResponseCache()
+        except sqlite3.Error:
+            return None
+    return _response_cache
+
+
+def run_extract(params, report):
+    """Resolve the best transcript for `url`; the result is what the app keeps in session state."""
+    report(0.1, "Fetching transcript")
+    resolution = get_best_transcript_resolution(params["url"])
+    if isinstance(resolution, str):
+        raise JobError(resolution)
+    return {
+        "video_id": resolution.video_id,
+        "transcript": resolution.text,
+        "source": resolution.describe(),
+        "segments": resolution.segments,
+        "language_code": resolution.language_code,
+        "is_generated": resolution.is_generated,
+    }
+
+
+def run_analyze(params, report):
+    """Answer `prompt` about the whole transcript of `video_id`, through the answer cache."""
+    report(0.05, "Loading transcript")
+    resolution = resolve_transcript(params["video_id"])
+    prompt = params["prompt"]
+    # Jobs share the model fairly per video, below interactive chat
+    flow = f"job:{resolution.video_id}"
+    client = get_ollama_client()
+    cache = get_response_cache()
+    transcript_hash = transcript_digest(resolution.text)
+    if cache is not None:
+        cached = cache.get(client.model, transcript_hash, prompt, [])
+        if cached is not None:
+            return {"response": cached, "cached": True}
+
+    if estimate_tokens(resolution.text) > SUMMARY_DIRECT_LIMIT:
+        report(0.1, "Summarizing the transcript in chunks")
+        summarizer = Summarizer(partial(client.complete, flow=flow, priority=BACKGROUND),
+                                chunk_tokens=SUMMARY_CHUNK_TOKENS, reduce_tokens=SUMMARY_CHUNK_TOKENS,
+                                workers=SUMMARY_WORKERS, cache=cache, model=client.model)
+        result = summarizer.summarize(resolution.text, prompt, segments=resolution.segments,
+                                      progress=lambda done: report(0.1 + 0.8 * done))
+        response, summary_stats = result.summary, result.describe()
+    else:
+        report(0.1, "Asking the model")
+        budget = PromptBudget.from_config(client.config)
+        layout = "prefix" if STABLE_PREFIX and budget.fits_prefix(resolution.text) else "question"
+        plan = budget.build(prompt, resolution.text, layout=layout)
+        result = client.chat({"messages": plan.messages}, affinity=resolution.video_id, flow=flow, priority=BACKGROUND,
+                             on_wait=lambda position: report(0.1, f"Waiting for the model ({position} ahead)"))
+        response, summary_stats = result.get("message", {}).get("content", ""), None
+
+    if cache is not None and response:
+        cache.put(client.model, transcript_hash, prompt, response, [])
+    return {"response": response, "cached": False, "summary_stats": summary_stats}
+
+
+HANDLERS = {
+    "extract": run_extract,
+    "analyze": run_analyze,
+}
+
+
+class Worker:
+    """Thread that claims and runs jobs from a JobQueue until stopped.
+
+    `handlers` maps job kinds to functions taking (params, report) and
+    returning a JSON-serializable result; `report(fraction, message=None)`
+    records progress. Exceptions fail the job with an "Error: ..." message.
+    """
+
+    def __init__(self, queue, handlers=None, poll_interval=POLL_SECONDS, name=None):
+        self.queue = queue
+        self.handlers = handlers or HANDLERS
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-worker-{self.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        last_maintenance = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_maintenance > STALE_SECONDS / 4:
+                    self.queue.requeue_stale()
+                    self.queue.purge()
+                    last_maintenance = time.monotonic()
+                job = self.queue.claim(self.name, list(self.handlers))
+            except sqlite3.Error:
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+            else:
+                self.run_job(job)
+
+    def run_job(self, job):
+        """Run one claimed job and record its outcome."""
+        JOB_SECONDS.observe(job["started_at"] - job["created_at"], kind=job["kind"], stage="wait")
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job["id"], done), daemon=True)
+        beat.start()
+        report = lambda fraction, message=None: self.queue.progress(job["id"], fraction, message)
+        try:
+            with JOB_SECONDS.time(kind=job["kind"], stage="run"):
+                result = self.handlers[job["kind"]](job["params"], report)
+        except JobError as e:
+            self.queue.fail(job["id"], str(e))
+            JOB_RUNS.inc(kind=job["kind"], status=FAILED, error="JobError")
+        except Exception as e:
+            self.queue.fail(job["id"], f"Error: {str(e)}")
+            JOB_RUNS.inc(kind=job["kind"], status=FAILED, error=error_class(e))
+        else:
+            self.queue.finish(job["id"], result)
+            JOB_RUNS.inc(kind=job["kind"], status=DONE, error="")
+        finally:
+            done.set()
+
+    def _heartbeat(self, job_id, done):
+        # Handlers may block for minutes in one call (e.g. an LLM request)
+        while not done.wait(STALE_SECONDS / 4):
+            try:
+                self.queue.heartbeat(job_id)
+            except sqlite3.Error:
+                pass
+
+
+def start_workers(queue, count, handlers=None):
+    """Start `count` worker threads on `queue`; returns them."""
+    return [Worker(queue, handlers).start() for _ in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run or inspect background jobs.")
+    parser.add_argument("--db", default=DEFAULT_JOBS_PATH, help="Jobs database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    worker = commands.add_parser("worker", help="Run jobs until interrupted")
+    worker.add_argument("-c", "--concurrency", type=int, default=2, help="Worker threads (default: %(default)s)")
+
+    commands.add_parser("stats", help="Show job counts by status")
+    purge = commands.add_parser("purge", help="Delete finished jobs")
+    purge.add_argument("--older-than", type=int, default=RETENTION_SECONDS, help="Seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue(args.db)
+    if args.command == "worker":
+        workers = start_workers(queue, args.concurrency)
+        print(f"{len(workers)} worker(s) running on {args.db}; Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            for w in workers:
+                w.stop(timeout=5)
+    elif args.command == "purge":
+        print(f"Deleted {queue.purge(args.older_than)} job(s)")
+    else:
+        print(", ".join(f"{status}: {count}" for status, count in queue.stats().items()))
+
+
+if __name__ == "__main__":
+    main()
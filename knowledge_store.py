@@ -0,0 +1,589 @@
+"""Questions across every archived transcript, answered from a local vector store.
+
+Each archived transcript (see transcript_archive) is split into the same
+timestamped chunks as per-video retrieval, and every chunk is embedded once,
+in batches. The vectors are rows of one memory-mapped float32 matrix, with a
+JSON Lines sidecar describing each row:
+
+    knowledge/vectors.f32      rows x dimension, L2-normalized
+    knowledge/chunks.jsonl     {"video_id", "start", "end", "text"} per row
+    knowledge/manifest.json    embedding model, dimension and the rows of each video
+
+A refresh embeds only new and changed transcripts. A query is one
+matrix-vector product over the corpus; beyond `IVF_MIN_ROWS` rows an
+inverted-file index (k-means lists with int8 codes) narrows it to the lists
+closest to the query, which are rescored exactly. Answers cite the video
+IDs and timestamps of the excerpts they are based on.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from retrieval import chunk_segments, tokenize, format_timestamp
+from transcript_archive import ArchiveStore
+
+DEFAULT_KNOWLEDGE_DIR = os.environ.get(
+    "KNOWLEDGE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge")
+)
+# An Ollama embedding model, "local:<sentence-transformers model>" or "hash" (lexical, no model needed)
+DEFAULT_EMBED_MODEL = os.environ.get("KNOWLEDGE_EMBED_MODEL") or os.environ.get("OLLAMA_EMBED_MODEL") or "hash"
+EMBED_BATCH_SIZE = int(os.environ.get("KNOWLEDGE_EMBED_BATCH", 64))
+# Corpora with at least this many chunks are searched through the IVF index
+IVF_MIN_ROWS = int(os.environ.get("KNOWLEDGE_IVF_MIN_ROWS", 50000))
+# IVF lists scanned per query
+IVF_PROBES = int(os.environ.get("KNOWLEDGE_IVF_PROBES", 32))
+# Candidates from the int8 codes rescored with the float32 vectors, per result
+IVF_RESCORE_FACTOR = 8
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 40
+# Rows per block when scanning or copying the matrix
+BLOCK_ROWS = 65536
+HASH_DIMENSION = 1024
+TOP_K = 8
+
+MANIFEST_NAME = "manifest.json"
+VECTORS_NAME = "vectors.f32"
+CHUNKS_NAME = "chunks.jsonl"
+IVF_NAME = "ivf.npz"
+IVF_CODES_NAME = "ivf_codes.i8"
+
+# One consistent view of the files; a refresh builds a new one and swaps it in whole,
+# so searches running meanwhile never mix the old chunk list with the new matrix
+_Snapshot = namedtuple("_Snapshot", ["manifest", "matrix", "chunks", "ivf"])
+
+LIBRARY_SYSTEM_PROMPT = (
+    "You are an assistant that answers questions about a library of YouTube video transcripts. "
+    "Base your answers only on the numbered transcript excerpts provided in each query, "
+    "and cite the excerpts you use by their number, e.g. [2]."
+)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def hashing_embedder(dimension=HASH_DIMENSION):
+    """Embed texts as hashed bags of words: lexical matching only, but needs no model."""
+    def embed(texts):
+        vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for term in tokenize(text):
+                vectors[i, zlib.crc32(term.encode("utf-8")) % dimension] += 1.0
+        # Dampen repeated words
+        return np.sqrt(vectors)
+    return embed
+
+
+def local_embedder(name):
+    """Embed texts with a sentence-transformers model running in this process."""
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        raise RuntimeError("Local embedding models need the sentence-transformers package")
+    model = SentenceTransformer(name)
+    return lambda texts: model.encode(list(texts), convert_to_numpy=True)
+
+
+def make_embedder(model, client=None):
+    """The `embed(texts)` function for an embedding model name (see DEFAULT_EMBED_MODEL)."""
+    if model == "hash":
+        return hashing_embedder()
+    if model.startswith("local:"):
+        return local_embedder(model[len("local:"):])
+    if client is None:
+        from ollama_client import OllamaClient
+        client = OllamaClient.from_env()
+    return lambda texts: client.embed(texts, model)
+
+
+def _archive_chunks(archive):
+    """Retrieval chunks of an archived transcript; untimed ones have start and end None."""
+    segments = archive.segments()
+    if archive.timed:
+        return chunk_segments(segments)
+    chunks = chunk_segments([dict(segment, start=0.0, duration=0.0) for segment in segments])
+    return [dict(chunk, start=None, end=None) for chunk in chunks]
+
+
+class IVFIndex:
+    """Inverted-file index: rows grouped by their nearest k-means centroid, stored as int8 codes.
+
+    `order` lists the matrix rows list by list, `offsets[l]:offsets[l + 1]`
+    being list l, and `codes`/`scales` hold those rows quantized to int8 in
+    the same order. Built over the first `rows` rows of the matrix.
+    """
+
+    def __init__(self, centroids, order, offsets, scales, codes):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+        self.scales = scales
+        self.codes = codes
+        self.rows = len(order)
+
+    @classmethod
+    def build(cls, matrix, lists=None, seed=0):
+        """Cluster the rows of `matrix` with spherical k-means and quantize them."""
+        rows = len(matrix)
+        # Every list starts from a distinct row, so there cannot be more lists than rows
+        lists = min(lists or max(1, int(np.sqrt(rows))), rows)
+        rng = np.random.default_rng(seed)
+        sample = matrix[np.sort(rng.choice(rows, min(rows, lists * KMEANS_SAMPLE_PER_LIST), replace=False))]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=lists) == 0
+            # Lists that lost all their rows restart from random sample rows
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assignment = np.concatenate([np.argmax(matrix[first:first + BLOCK_ROWS] @ centroids.T, axis=1)
+                                     for first in range(0, rows, BLOCK_ROWS)])
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.searchsorted(assignment[order], np.arange(lists + 1)).astype(np.int64)
+        scales = np.empty(rows, dtype=np.float32)
+        codes = np.empty((rows, matrix.shape[1]), dtype=np.int8)
+        for first in range(0, rows, BLOCK_ROWS):
+            block = matrix[order[first:first + BLOCK_ROWS]]
+            block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127
+            scales[first:first + len(block)] = block_scales
+            codes[first:first + len(block)] = np.round(block / block_scales[:, None]).astype(np.int8)
+        return cls(centroids, order, offsets, scales, codes)
+
+    def save(self, root):
+        codes_path = os.path.join(root, IVF_CODES_NAME)
+        self.codes.tofile(f"{codes_path}.tmp")
+        os.replace(f"{codes_path}.tmp", codes_path)
+        path = os.path.join(root, IVF_NAME)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, centroids=self.centroids, order=self.order, offsets=self.offsets, scales=self.scales)
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, root, dimension):
+        """The saved index, or None if there is none or it is incomplete."""
+        try:
+            with np.load(os.path.join(root, IVF_NAME)) as saved:
+                centroids, order, offsets, scales = (saved["centroids"], saved["order"], saved["offsets"],
+                                                     saved["scales"])
+            codes = np.memmap(os.path.join(root, IVF_CODES_NAME), dtype=np.int8, mode="r",
+                              shape=(len(order), dimension)) if len(order) else np.empty((0, dimension), np.int8)
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(centroids, order, offsets, scales, codes)
+
+    def candidates(self, query, count, probes=IVF_PROBES):
+        """Matrix rows of the best `count` int8 scores in the `probes` lists closest to `query`."""
+        probes = min(probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), probes - 1)[:probes]
+        slices = [slice(self.offsets[l], self.offsets[l + 1]) for l in nearest if self.offsets[l + 1] > self.offsets[l]]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate([np.arange(s.start, s.stop) for s in slices])
+        scores = np.concatenate([(self.codes[s].astype(np.float32) @ query) * self.scales[s] for s in slices])
+        if len(scores) > count:
+            top = np.argpartition(-scores, count - 1)[:count]
+            positions = positions[top]
+        return self.order[positions]
+
+
+class KnowledgeStore:
+    """Chunk embeddings of every archived transcript, refreshed incrementally.
+
+    `embed` takes a list of strings and returns one vector per string; it is
+    called with up to `batch_size` chunks at a time. `model` names it in the
+    manifest, and changing it re-embeds everything. `version` changes
+    whenever the contents do.
+    """
+
+    def __init__(self, root=DEFAULT_KNOWLEDGE_DIR, store=None, embed=None, model=DEFAULT_EMBED_MODEL,
+                 batch_size=EMBED_BATCH_SIZE, ivf_min_rows=IVF_MIN_ROWS):
+        if np is None:
+            raise RuntimeError("The knowledge store needs the numpy package")
+        self.root = root
+        self.store = store if store is not None else ArchiveStore()
+        self.model = model
+        self.embed = embed if embed is not None else make_embedder(model)
+        self.batch_size = batch_size
+        self.ivf_min_rows = ivf_min_rows
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.version = 0
+        self.last_refresh = None
+        self._open()
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @property
+    def matrix(self):
+        return self._snapshot.matrix
+
+    @property
+    def chunks(self):
+        return self._snapshot.chunks
+
+    @property
+    def ivf(self):
+        return self._snapshot.ivf
+
+    @property
+    def _manifest(self):
+        return self._snapshot.manifest
+
+    def _open(self):
+        """Map the matrix and read the sidecar; start over if they do not match the manifest."""
+        try:
+            with open(self._path(MANIFEST_NAME), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        rows, dimension = manifest.get("rows", 0), manifest.get("dimension", 0)
+        try:
+            if rows and os.path.getsize(self._path(VECTORS_NAME)) < rows * dimension * 4:
+                raise ValueError("vectors file is shorter than the manifest")
+            matrix = (np.memmap(self._path(VECTORS_NAME), dtype=np.float32, mode="r", shape=(rows, dimension))
+                      if rows else np.empty((0, dimension), dtype=np.float32))
+            with open(self._path(CHUNKS_NAME), "rb") as f:
+                # Rows past the manifest are left over from an interrupted refresh
+                chunks = [json.loads(line) for line, _ in zip(f, range(rows))]
+            if len(chunks) != rows:
+                raise ValueError("chunk sidecar is shorter than the manifest")
+        except (OSError, ValueError):
+            manifest = {}
+            matrix = np.empty((0, 0), dtype=np.float32)
+            chunks = []
+        ivf = IVFIndex.load(self.root, dimension) if manifest.get("ivf") else None
+        self._snapshot = _Snapshot(manifest, matrix, chunks, ivf)
+        self.version += 1
+
+    def _write_manifest(self, manifest):
+        path = self._path(MANIFEST_NAME)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _embed(self, texts):
+        return _normalize(np.asarray(self.embed(list(texts)), dtype=np.float32))
+
+    def refresh(self, progress=None):
+        """Embed new and changed archived transcripts and drop deleted ones.
+
+        Unchanged videos keep their vectors: new ones are appended to the
+        matrix, which is only rewritten (by copying) when a video changed or
+        was removed. `progress(done, total)` is called after every batch.
+        Returns the counts of added, updated, removed and unchanged videos
+        and of embedded chunks.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            videos = self._manifest.get("videos", {}) if self._manifest.get("model") == self.model else {}
+            current = {}
+            for video_id in self.store.video_ids():
+                try:
+                    stat = os.stat(self.store.path(video_id))
+                except FileNotFoundError:
+                    continue
+                current[video_id] = [stat.st_mtime_ns, stat.st_size]
+            removed = [video_id for video_id in videos if video_id not in current]
+            changed = [video_id for video_id, signature in current.items()
+                       if video_id not in videos or videos[video_id]["signature"] != signature]
+            changes = {
+                "added": sum(video_id not in videos for video_id in changed),
+                "updated": sum(video_id in videos for video_id in changed),
+                "removed": len(removed),
+                "unchanged": len(current) - len(changed),
+                "chunks": 0,
+            }
+            rewrite = bool(removed) or changes["updated"] > 0 or len(videos) < len(self._manifest.get("videos", {}))
+            if changed or rewrite:
+                self._update(videos, current, changed, rewrite, changes, progress)
+            changes["seconds"] = time.perf_counter() - started
+            changes["refreshed_at"] = time.time()
+            self.last_refresh = changes
+            return changes
+
+    def _update(self, videos, current, changed, rewrite, changes, progress):
+        kept = {video_id: entry for video_id, entry in videos.items()
+                if video_id in current and video_id not in changed}
+        vectors_path, chunks_path = self._path(VECTORS_NAME), self._path(CHUNKS_NAME)
+        if rewrite:
+            vectors = open(f"{vectors_path}.tmp", "wb")
+            chunk_lines = open(f"{chunks_path}.tmp", "w", encoding="utf-8")
+            rows = 0
+            for video_id, entry in kept.items():
+                first = entry["first"]
+                for block in range(first, first + entry["count"], BLOCK_ROWS):
+                    vectors.write(np.ascontiguousarray(self.matrix[block:min(block + BLOCK_ROWS,
+                                                                           first + entry["count"])]).tobytes())
+                for chunk in self.chunks[first:first + entry["count"]]:
+                    chunk_lines.write(json.dumps(chunk) + "\n")
+                kept[video_id] = dict(entry, first=rows)
+                rows += entry["count"]
+        else:
+            rows = self._manifest.get("rows", 0)
+            # Drop rows an interrupted refresh appended past the manifest
+            for path, size in ((vectors_path, rows * self._manifest.get("dimension", 0) * 4),
+                               (chunks_path, self._manifest.get("chunks_bytes", 0))):
+                with open(path, "ab") as f:
+                    f.truncate(size)
+            vectors = open(vectors_path, "ab")
+            chunk_lines = open(chunks_path, "a", encoding="utf-8")
+
+        dimension = self._manifest.get("dimension", 0) if kept else 0
+        pending = []
+        embedded = [0, len(changed)]
+
+        def flush():
+            nonlocal dimension
+            batch = self._embed(chunk["text"] for chunk in pending)
+            if dimension and batch.shape[1] != dimension:
+                raise ValueError(f"The embedding model returned {batch.shape[1]} dimensions, expected {dimension}")
+            dimension = batch.shape[1]
+            vectors.write(batch.tobytes())
+            for chunk in pending:
+                chunk_lines.write(json.dumps(chunk) + "\n")
+            changes["chunks"] += len(pending)
+            del pending[:]
+
+        try:
+            for video_id in changed:
+                try:
+                    archive = self.store.open(video_id)
+                    if archive is None:
+                        raise FileNotFoundError(video_id)
+                    with archive:
+                        chunks = _archive_chunks(archive)
+                except (OSError, ValueError):
+                    # Deleted or rewritten while being read; picked up by the next refresh
+                    changes["updated" if video_id in videos else "added"] -= 1
+                    continue
+                kept[video_id] = {"signature": current[video_id], "first": rows, "count": len(chunks)}
+                rows += len(chunks)
+                for chunk in chunks:
+                    pending.append({"video_id": video_id, "start": chunk["start"], "end": chunk["end"],
+                                    "text": chunk["text"]})
+                    if len(pending) >= self.batch_size:
+                        flush()
+                embedded[0] += 1
+                if progress is not None:
+                    progress(*embedded)
+            if pending:
+                flush()
+        except BaseException:
+            vectors.close()
+            chunk_lines.close()
+            if rewrite:
+                os.remove(f"{vectors_path}.tmp")
+                os.remove(f"{chunks_path}.tmp")
+            raise
+        vectors.close()
+        chunk_lines.close()
+        if rewrite:
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+            os.replace(f"{chunks_path}.tmp", chunks_path)
+
+        ivf = bool(self._manifest.get("ivf")) and not rewrite
+        self._write_manifest({"model": self.model, "dimension": dimension, "rows": rows,
+                              "chunks_bytes": os.path.getsize(chunks_path), "videos": kept, "ivf": ivf})
+        self._open()
+        if rows >= self.ivf_min_rows and (self.ivf is None or self.ivf.rows < 0.9 * rows):
+            self._build_ivf()
+
+    def build_ivf(self, lists=None):
+        """(Re)build the IVF index over the whole matrix."""
+        with self._lock:
+            return self._build_ivf(lists)
+
+    def _build_ivf(self, lists=None):
+        snapshot = self._snapshot
+        if not len(snapshot.matrix):
+            return None
+        ivf = IVFIndex.build(snapshot.matrix, lists)
+        ivf.save(self.root)
+        manifest = dict(snapshot.manifest, ivf=True)
+        self._write_manifest(manifest)
+        self._snapshot = snapshot._replace(manifest=manifest, ivf=ivf)
+        self.version += 1
+        return ivf
+
+    def video_ids(self):
+        return sorted(self._manifest.get("videos", {}))
+
+    @staticmethod
+    def _rows(snapshot, video_ids):
+        videos = snapshot.manifest.get("videos", {})
+        ranges = [np.arange(videos[video_id]["first"], videos[video_id]["first"] + videos[video_id]["count"])
+                  for video_id in video_ids if video_id in videos]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def search(self, query, k=TOP_K, video_ids=None, exact=None, probes=IVF_PROBES):
+        """Return the `k` chunks most similar to `query`, best first, each with its `score`.
+
+        `video_ids` restricts the search to those videos, which is always
+        exact. Otherwise the IVF index is used when there is one, unless
+        `exact` is true. Runs against the contents as of the call, while a
+        refresh may be writing the next version.
+        """
+        snapshot = self._snapshot
+        matrix, ivf = snapshot.matrix, snapshot.ivf
+        if not len(snapshot.chunks):
+            return []
+        query_vector = self._embed([query])[0]
+        if query_vector.shape[0] != matrix.shape[1]:
+            raise ValueError("The embedding model changed since the last refresh; refresh the knowledge store")
+        if video_ids is not None:
+            rows = self._rows(snapshot, video_ids)
+        elif ivf is not None and not exact:
+            # Rows appended since the index was built are scanned exactly
+            rows = np.concatenate([ivf.candidates(query_vector, k * IVF_RESCORE_FACTOR, probes),
+                                   np.arange(ivf.rows, len(matrix))])
+        else:
+            rows = None
+
+        if rows is None:
+            scores = np.concatenate([matrix[first:first + BLOCK_ROWS] @ query_vector
+                                     for first in range(0, len(matrix), BLOCK_ROWS)])
+            rows = np.arange(len(scores))
+        else:
+            rows = np.sort(rows)
+            scores = matrix[rows] @ query_vector if len(rows) else np.empty(0, dtype=np.float32)
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(snapshot.chunks[rows[i]], score=float(scores[i])) for i in top]
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "videos": len(snapshot.manifest.get("videos", {})),
+            "chunks": len(snapshot.chunks),
+            "dimension": snapshot.manifest.get("dimension", 0),
+            "model": snapshot.manifest.get("model", self.model),
+            "megabytes": snapshot.matrix.nbytes / 1e6,
+            "ivf_lists": len(snapshot.ivf.centroids) if snapshot.ivf is not None else 0,
+        }
+
+
+def cite(hit):
+    """Video ID and time range of a hit, e.g. "dQw4w9WgXcQ 1:05-2:30"."""
+    if hit["start"] is None:
+        return hit["video_id"]
+    return f"{hit['video_id']} {format_timestamp(hit['start'])}-{format_timestamp(hit['end'])}"
+
+
+def format_sources(hits):
+    """Render hits as numbered, cited excerpts for the prompt."""
+    return "\n\n".join(f"[{n}] {cite(hit)}: {hit['text']}" for n, hit in enumerate(hits, 1))
+
+
+def build_library_payload(question, hits, config, history=None):
+    """The /api/chat payload answering `question` from the cited `hits`."""
+    from prompt_budget import PromptBudget
+
+    budget = PromptBudget.from_config(config, system=LIBRARY_SYSTEM_PROMPT)
+    return {"messages": budget.build(question, format_sources(hits), history).messages}
+
+
+def ask(knowledge, client, question, k=TOP_K, video_ids=None, exact=None, **chat_options):
+    """Answer `question` from the whole library; returns (answer text, the hits it cites by number).
+
+    `chat_options` (flow, priority, on_wait) are passed to OllamaClient.chat.
+    """
+    hits = knowledge.search(question, k, video_ids, exact)
+    if not hits:
+        return "No transcripts are indexed yet.", []
+    result = client.chat(build_library_payload(question, hits, client.config), **chat_options)
+    return result.get("message", {}).get("content", ""), hits
+
+
+_knowledge = None
+
+
+def get_knowledge_store(client=None):
+    """Return the shared KnowledgeStore, or None if numpy, the archive or the embedding model is unavailable."""
+    global _knowledge
+    if _knowledge is None:
+        from youtube import get_archive_store
+        store = get_archive_store()
+        if store is None or np is None:
+            return None
+        try:
+            _knowledge = KnowledgeStore(store=store, embed=make_embedder(DEFAULT_EMBED_MODEL, client))
+        except (OSError, RuntimeError):
+            return None
+    return _knowledge
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search and ask questions across every archived transcript.")
+    parser.add_argument("--dir", default=DEFAULT_KNOWLEDGE_DIR, help="Store directory (default: %(default)s)")
+    parser.add_argument("--model", default=DEFAULT_EMBED_MODEL, help="Embedding model (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("refresh", help="Embed new and changed archived transcripts")
+    ivf = commands.add_parser("ivf", help="Rebuild the IVF index")
+    ivf.add_argument("--lists", type=int, help="Number of k-means lists (default: sqrt of the chunks)")
+    for name, help in (("search", "Print the chunks most similar to a query"),
+                       ("ask", "Answer a question from the whole library, with citations")):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("query")
+        command.add_argument("-k", type=int, default=TOP_K, help="Chunks to retrieve")
+        command.add_argument("--video", action="append", help="Only search this video (repeatable)")
+        command.add_argument("--exact", action="store_true", help="Scan every vector even with an IVF index")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("install the numpy package to use the knowledge store")
+    if args.command == "ivf" and args.lists is not None and args.lists < 1:
+        parser.error("--lists must be at least 1")
+    knowledge = KnowledgeStore(args.dir, model=args.model)
+    changes = knowledge.refresh(progress=lambda done, total: print(f"\rEmbedded {done}/{total} videos", end="",
+                                                                    file=sys.stderr))
+    print(f"\r{changes['added']} added, {changes['updated']} updated, {changes['removed']} removed, "
+          f"{changes['unchanged']} unchanged, {changes['chunks']} chunks embedded in {changes['seconds']:.2f}s",
+          file=sys.stderr)
+    if args.command == "refresh":
+        stats = knowledge.stats()
+        print(f"{stats['videos']} videos, {stats['chunks']} chunks of {stats['dimension']} dimensions "
+              f"({stats['megabytes']:.1f} MB), {stats['ivf_lists']} IVF lists")
+    elif args.command == "ivf":
+        index = knowledge.build_ivf(args.lists)
+        print(f"{len(index.centroids) if index is not None else 0} lists over {len(knowledge.chunks)} chunks")
+    elif args.command == "search":
+        for hit in knowledge.search(args.query, args.k, args.video, args.exact):
+            print(f"{hit['score']:.3f}  {cite(hit)}  {hit['text'][:120]}")
+    else:
+        from ollama_client import OllamaClient, OllamaError
+        from scheduler import LLMBusy
+        from search_index import hit_url
+
+        try:
+            answer, hits = ask(knowledge, OllamaClient.from_env(), args.query, args.k, args.video, args.exact,
+                               flow="cli")
+        except (LLMBusy, OllamaError) as e:
+            parser.exit(1, f"Error: {e}\n")
+        print(answer)
+        if hits:
+            print()
+        for n, hit in enumerate(hits, 1):
+            print(f"[{n}] {cite(hit)}  {hit_url(hit)}")
+
+if __name__ == "__main__":
+    main()
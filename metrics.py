@@ -0,0 +1,365 @@
+"""In-process metrics with Prometheus text exposition.
+
+All metrics live in the module level REGISTRY and are declared at the bottom
+of this file so there is one place to see what is measured. Export them with
+`REGISTRY.render()` (served at /metrics by api_server) or write them
+periodically to a file for the node_exporter textfile collector by setting
+METRICS_TEXTFILE.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TEXTFILE_PATH = os.environ.get("METRICS_TEXTFILE", "")
+TEXTFILE_INTERVAL = float(os.environ.get("METRICS_TEXTFILE_INTERVAL", 15))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (100, 1000, 5000, 10000, 50000, 100000, 250000, 500000, 1000000)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """Base class: a named family of time series, one per label combination."""
+
+    kind = "untyped"
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = registry.lock
+        self._series = {}
+
+    def series(self):
+        """Return a copy of the current (label values -> state) mapping."""
+        with self._lock:
+            return {key: self._copy(state) for key, state in self._series.items()}
+
+    def _copy(self, state):
+        return state
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self.series().items())]
+
+
+class Gauge(Metric):
+    """Value that can go up and down (queue depth, connections in use)."""
+
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self.series().items())]
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets, plus their count and sum."""
+
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def _copy(self, state):
+        counts, total = state
+        return list(counts), total
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            state = self._series.get(key)
+            if state is None:
+                state = self._series[key] = [[0] * len(self.buckets), 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the `with` block, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = []
+        for key, (counts, total) in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        return lines
+
+    def summary(self, key):
+        """Count, mean and estimated p50/p95 for one series (label values tuple)."""
+        counts, total = self.series().get(key, ([0] * len(self.buckets), 0.0))
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean": total / count if count else None,
+            "p50": _quantile(0.5, self.buckets, counts),
+            "p95": _quantile(0.95, self.buckets, counts),
+        }
+
+
+def _quantile(q, buckets, counts):
+    """Estimate a quantile by linear interpolation within buckets, like histogram_quantile()."""
+    count = sum(counts)
+    if not count:
+        return None
+    rank = q * count
+    cumulative, lower = 0, 0.0
+    for bound, bucket_count in zip(buckets, counts):
+        if cumulative + bucket_count >= rank:
+            if bound == math.inf:
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / bucket_count
+        cumulative += bucket_count
+        lower = bound
+    return lower
+
+
+class Registry:
+    """Collection of metrics sharing one lock, rendered together."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(self, name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Gauge(self, name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, help, labelnames, buckets))
+
+    def render(self, openmetrics=False):
+        """Prometheus text exposition format (OpenMetrics when `openmetrics` is True)."""
+        lines = []
+        for metric in self.metrics:
+            name = metric.name
+            if openmetrics and metric.kind == "counter":
+                name = name[:-len("_total")] if name.endswith("_total") else name
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render())
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path, openmetrics=False):
+        """Atomically write the current metrics to `path`."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render(openmetrics))
+        os.replace(tmp_path, path)
+
+    def rows(self):
+        """Flat, human readable view of every series, for the diagnostics panel."""
+        rows = []
+        for metric in self.metrics:
+            series = metric.series()
+            for key in sorted(series):
+                labels = ", ".join(f"{n}={v}" for n, v in zip(metric.labelnames, key))
+                row = {"metric": metric.name, "labels": labels}
+                if metric.kind == "histogram":
+                    row.update(metric.summary(key))
+                else:
+                    row["count"] = series[key]
+                rows.append(row)
+        return rows
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+class TextfileExporter:
+    """Background thread rewriting a metrics file every `interval` seconds."""
+
+    def __init__(self, registry, path, interval=TEXTFILE_INTERVAL):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError:
+            pass
+
+    def stop(self):
+        """Stop the thread and write the final values."""
+        self._stopped.set()
+        self.write()
+
+
+def start_textfile_exporter(path=TEXTFILE_PATH, interval=TEXTFILE_INTERVAL):
+    """Start exporting REGISTRY to `path`; returns the exporter, or None when no path is configured."""
+    if not path:
+        return None
+    return TextfileExporter(REGISTRY, path, interval).start()
+
+
+def error_class(error):
+    """Low-cardinality label for an exception: its class name, plus the HTTP status if any."""
+    status = getattr(error, "status_code", None)
+    return f"{type(error).__name__}:{status}" if status else type(error).__name__
+
+
+REGISTRY = Registry()
+
+# Transcript extraction
+TRANSCRIPT_STAGE_SECONDS = REGISTRY.histogram(
+    "yta_transcript_stage_seconds", "Time spent in each transcript resolution stage.", ["stage"])
+TRANSCRIPT_RESOLUTIONS = REGISTRY.counter(
+    "yta_transcript_resolutions_total", "Resolved transcripts by the path taken and the track chosen.",
+    ["path", "match", "kind"])
+TRANSCRIPT_ERRORS = REGISTRY.counter(
+    "yta_transcript_errors_total", "Failed transcript resolutions by error class.", ["error"])
+TRANSCRIPT_SEGMENTS = REGISTRY.histogram(
+    "yta_transcript_segments", "Segments per resolved transcript.", buckets=SIZE_BUCKETS)
+TRANSCRIPT_CHARS = REGISTRY.histogram(
+    "yta_transcript_chars", "Characters per resolved transcript.", buckets=SIZE_BUCKETS)
+TRANSCRIPT_REFRESHES = REGISTRY.counter(
+    "yta_transcript_refreshes_total", "Videos checked by transcript refresh runs, by outcome and reason.",
+    ["outcome", "reason"])
+
+# Caches
+CACHE_REQUESTS = REGISTRY.counter(
+    "yta_cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+
+# LLM
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "yta_llm_request_seconds", "Duration of Ollama requests, until the last token for streams.", ["endpoint"])
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.histogram(
+    "yta_llm_time_to_first_token_seconds", "Time from sending a streamed request to its first token.")
+LLM_PROMPT_CHARS = REGISTRY.histogram(
+    "yta_llm_prompt_chars", "Characters sent per chat request.", buckets=SIZE_BUCKETS)
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "yta_llm_prompt_tokens", "Prompt tokens evaluated per request, as reported by Ollama.", buckets=TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = REGISTRY.histogram(
+    "yta_llm_completion_tokens", "Tokens generated per request, as reported by Ollama.", buckets=TOKEN_BUCKETS)
+LLM_PROMPT_EVAL_SECONDS = REGISTRY.histogram(
+    "yta_llm_prompt_eval_seconds", "Time Ollama spent evaluating the (uncached part of the) prompt.")
+LLM_EVAL_SECONDS = REGISTRY.histogram(
+    "yta_llm_eval_seconds", "Time Ollama spent generating the answer.")
+LLM_LOAD_SECONDS = REGISTRY.histogram(
+    "yta_llm_load_seconds", "Time Ollama spent loading the model before a request.")
+LLM_ERRORS = REGISTRY.counter(
+    "yta_llm_errors_total", "Failed Ollama requests or attempts by error class.", ["error"])
+LLM_IN_FLIGHT = REGISTRY.gauge(
+    "yta_llm_in_flight", "Ollama requests currently in flight per replica.", ["replica"])
+LLM_QUEUE_WAIT_SECONDS = REGISTRY.histogram(
+    "yta_llm_queue_wait_seconds", "Time LLM requests waited for a scheduler slot, by priority.", ["priority"])
+LLM_SERVICE_SECONDS = REGISTRY.histogram(
+    "yta_llm_service_seconds", "Time LLM requests held a scheduler slot, by priority.", ["priority"])
+LLM_QUEUE_DEPTH = REGISTRY.gauge(
+    "yta_llm_queue_depth", "LLM requests waiting for a scheduler slot, by priority.", ["priority"])
+LLM_SHED = REGISTRY.counter(
+    "yta_llm_shed_total", "LLM requests rejected by the scheduler, by priority and reason.", ["priority", "reason"])
+PROMPT_BUDGET_TOKENS = REGISTRY.histogram(
+    "yta_prompt_budget_tokens", "Estimated prompt tokens per part of an assembled chat prompt.", ["part"],
+    buckets=TOKEN_BUCKETS)
+PROMPT_TRUNCATIONS = REGISTRY.counter(
+    "yta_prompt_truncations_total", "Prompts whose transcript context was cut to fit num_ctx.")
+SUMMARY_STAGE_SECONDS = REGISTRY.histogram(
+    "yta_summary_stage_seconds", "Time spent in each map-reduce summarization stage.", ["stage"])
+SINGLEFLIGHT_CALLS = REGISTRY.counter(
+    "yta_singleflight_calls_total", "Coalesced calls by whether they ran the work or shared a running call.",
+    ["flight", "role"])
+
+# Background jobs
+JOB_RUNS = REGISTRY.counter(
+    "yta_job_runs_total", "Background jobs run by kind, outcome and error class.", ["kind", "status", "error"])
+JOB_SECONDS = REGISTRY.histogram(
+    "yta_job_seconds", "Time background jobs spent queued (wait) and running (run).", ["kind", "stage"])
+
+# HTTP API
+API_PENDING = REGISTRY.gauge(
+    "yta_api_pending", "Distinct fetches or chats queued or running in this worker.", ["queue"])
+API_REJECTED = REGISTRY.counter(
+    "yta_api_rejected_total", "Requests rejected with 503 because a queue was full.", ["queue"])
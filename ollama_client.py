@@ -0,0 +1,427 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import (LLM_REQUEST_SECONDS, LLM_TIME_TO_FIRST_TOKEN, LLM_PROMPT_CHARS, LLM_PROMPT_TOKENS,
+                     LLM_COMPLETION_TOKENS, LLM_PROMPT_EVAL_SECONDS, LLM_EVAL_SECONDS, LLM_LOAD_SECONDS, LLM_ERRORS,
+                     LLM_IN_FLIGHT, error_class)
+from scheduler import INTERACTIVE, get_scheduler
+from singleflight import SingleFlight
+
+SYSTEM_PROMPT = (
+    "You are an assistant that answers questions about YouTube video transcripts. "
+    "Base your answers only on the information in the transcript provided in each query."
+)
+
+
+class OllamaError(Exception):
+    """Raised when the Ollama API returns an error status or error message."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def record_usage(stats):
+    """Record the token counts and durations Ollama reports in a final response or stream chunk."""
+    if "prompt_eval_count" in stats:
+        LLM_PROMPT_TOKENS.observe(stats["prompt_eval_count"])
+    if "eval_count" in stats:
+        LLM_COMPLETION_TOKENS.observe(stats["eval_count"])
+    # Durations are reported in nanoseconds
+    if "prompt_eval_duration" in stats:
+        LLM_PROMPT_EVAL_SECONDS.observe(stats["prompt_eval_duration"] / 1e9)
+    if "eval_duration" in stats:
+        LLM_EVAL_SECONDS.observe(stats["eval_duration"] / 1e9)
+    if "load_duration" in stats:
+        LLM_LOAD_SECONDS.observe(stats["load_duration"] / 1e9)
+
+
+def describe_usage(stats):
+    """One line summary of where the time of a generation went, or "" without stats."""
+    if "prompt_eval_duration" not in stats or "eval_duration" not in stats:
+        return ""
+    prompt_tokens = stats.get("prompt_eval_count", 0)
+    text = (f"prompt {prompt_tokens} tokens in {stats['prompt_eval_duration'] / 1e9:.2f}s · "
+            f"answer {stats.get('eval_count', 0)} tokens in {stats['eval_duration'] / 1e9:.2f}s")
+    if stats.get("load_duration", 0) > 0.5e9:
+        text += f" · model load {stats['load_duration'] / 1e9:.1f}s"
+    return text
+
+
+def prompt_chars(payload):
+    return sum(len(message.get("content", "")) for message in payload.get("messages", []))
+
+
+class ChatStream:
+    """Iterate over the content tokens of a streaming /api/chat response.
+
+    The NDJSON stream is consumed line by line as it arrives. Timing is
+    recorded as the stream is read: `time_to_first_token` and `total_time` in
+    seconds, and the final Ollama statistics (`eval_count`,
+    `prompt_eval_duration`, ...) in `stats`. Closing the stream early, or
+    abandoning the iteration, closes the HTTP connection so Ollama stops
+    generating. Timings and token counts are also recorded in `metrics`.
+    """
+
+    def __init__(self, api_url, payload, timeout=120, session=None, on_close=None):
+        self.started = time.perf_counter()
+        self.time_to_first_token = None
+        self.total_time = None
+        self.stats = {}
+        self.parts = []
+        self.closed = False
+        self._on_close = on_close
+
+        payload = dict(payload, stream=True)
+        self._response = (session or requests).post(api_url, json=payload, stream=True, timeout=timeout)
+        if self._response.status_code != 200:
+            body = self._response.text[:500]
+            self.close()
+            raise OllamaError(f"Status code: {self._response.status_code}, Response: {body}",
+                              self._response.status_code)
+
+    def __iter__(self):
+        try:
+            for line in self._response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    LLM_ERRORS.inc(error="OllamaError")
+                    raise OllamaError(chunk["error"])
+
+                token = chunk.get("message", {}).get("content", "")
+                if token:
+                    if self.time_to_first_token is None:
+                        self.time_to_first_token = time.perf_counter() - self.started
+                    self.parts.append(token)
+                    yield token
+
+                if chunk.get("done"):
+                    self.stats = {k: v for k, v in chunk.items() if k not in ("message", "done")}
+                    break
+        finally:
+            self.close()
+
+    @property
+    def content(self):
+        """Everything received so far."""
+        return "".join(self.parts)
+
+    def close(self):
+        """Stop reading and close the connection (cancels generation server-side)."""
+        if not self.closed:
+            self.closed = True
+            self.total_time = time.perf_counter() - self.started
+            self._response.close()
+            LLM_REQUEST_SECONDS.observe(self.total_time, endpoint="stream")
+            if self.time_to_first_token is not None:
+                LLM_TIME_TO_FIRST_TOKEN.observe(self.time_to_first_token)
+            record_usage(self.stats)
+            if self._on_close is not None:
+                self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class OllamaConfig:
+    """Endpoint, model, context size, timeout and pool settings, read from the environment.
+
+    OLLAMA_URLS holds one or more comma separated base URLs
+    (e.g. "http://gpu1:11434,http://gpu2:11434"); requests are spread over them.
+    `num_ctx` is the context window requested from the model and
+    `num_predict` the share of it kept for the answer. Every request uses the
+    same `num_ctx`, since changing it makes Ollama reload the model, and asks
+    Ollama to keep the model (and its prompt cache) loaded for `keep_alive`.
+    """
+
+    def __init__(self, base_urls=("http://localhost:11434",), model="llama3.2:latest", timeout=120,
+                 pool_connections=4, pool_maxsize=16, health_interval=30, num_ctx=8192, num_predict=800,
+                 temperature=0.1, keep_alive="30m"):
+        self.base_urls = [url.rstrip("/") for url in base_urls]
+        self.model = model
+        self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.health_interval = health_interval
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.temperature = temperature
+        self.keep_alive = keep_alive
+
+    def options(self):
+        """Model options sent with every request (callers' options take precedence)."""
+        return {"num_ctx": self.num_ctx, "num_predict": self.num_predict, "temperature": self.temperature}
+
+    @classmethod
+    def from_env(cls, environ=None):
+        env = os.environ if environ is None else environ
+        urls = env.get("OLLAMA_URLS") or env.get("OLLAMA_URL") or "http://localhost:11434"
+        return cls(
+            base_urls=[url.strip() for url in urls.split(",") if url.strip()],
+            model=env.get("OLLAMA_MODEL", "llama3.2:latest"),
+            timeout=float(env.get("OLLAMA_TIMEOUT", 120)),
+            pool_connections=int(env.get("OLLAMA_POOL_CONNECTIONS", 4)),
+            pool_maxsize=int(env.get("OLLAMA_POOL_MAXSIZE", 16)),
+            health_interval=float(env.get("OLLAMA_HEALTH_INTERVAL", 30)),
+            num_ctx=int(env.get("OLLAMA_NUM_CTX", 8192)),
+            num_predict=int(env.get("OLLAMA_NUM_PREDICT", 800)),
+            temperature=float(env.get("OLLAMA_TEMPERATURE", 0.1)),
+            keep_alive=env.get("OLLAMA_KEEP_ALIVE", "30m"),
+        )
+
+
+class Replica:
+    """One Ollama server and what the client knows about its state."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.healthy = True
+        self.in_flight = 0
+        self.failures = 0
+        self.checked_at = 0.0
+
+
+# Failures that mean "try another replica" rather than "the request is bad"
+FAILOVER_ERRORS = (requests.ConnectionError, requests.Timeout)
+
+
+class OllamaClient:
+    """Keep-alive HTTP client for one or more Ollama replicas.
+
+    A single requests.Session (and its connection pool) is reused for every
+    call, so follow-up questions skip the TCP/TLS handshake. Each request goes
+    to the healthy replica with the fewest requests in flight; a replica that
+    refuses connections, times out or returns a 5xx is marked unhealthy and
+    the request fails over to the next one. Unhealthy replicas are probed
+    again after `health_interval` seconds.
+
+    Requests given the same `affinity` key (e.g. a video ID) go to the same
+    replica while it is healthy and not much busier than the others, so
+    follow-up questions hit the prompt cache Ollama kept for that transcript.
+
+    Identical non-streaming requests made while one is already running wait
+    for it and share its response instead of generating the answer twice.
+
+    Chat requests first take a slot from `scheduler` (the process-wide
+    LLMScheduler by default), queued by `priority` and shared fairly between
+    `flow`s; they raise LLMBusy when the scheduler sheds them.
+    """
+
+    # How many more in-flight requests the affinity replica may have than the least loaded one
+    AFFINITY_SLACK = 2
+
+    def __init__(self, config=None, scheduler=None):
+        self.config = config or OllamaConfig.from_env()
+        self.scheduler = scheduler or get_scheduler()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.config.pool_connections,
+                              pool_maxsize=self.config.pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.replicas = [Replica(url) for url in self.config.base_urls]
+        self._turn = 0
+        self._lock = threading.Lock()
+        # In-process only: without a shared result cache another process would generate the answer anyway
+        self._flight = SingleFlight("llm", lock_dir="")
+
+    @classmethod
+    def from_env(cls):
+        return cls(OllamaConfig.from_env())
+
+    @property
+    def model(self):
+        return self.config.model
+
+    def check_health(self, replica):
+        """Probe a replica and update its health flag."""
+        try:
+            response = self.session.get(replica.base_url + "/api/version", timeout=2)
+            healthy = response.status_code == 200
+        except requests.RequestException:
+            healthy = False
+        with self._lock:
+            replica.healthy = healthy
+            replica.checked_at = time.monotonic()
+            if healthy:
+                replica.failures = 0
+        return healthy
+
+    def _candidates(self, affinity=None):
+        """Replicas to try in order: healthy ones by load, then unhealthy ones due a re-check."""
+        now = time.monotonic()
+        with self._lock:
+            # Fewest requests in flight first, ties broken round-robin
+            healthy = [r for r in self.replicas if r.healthy]
+            if healthy:
+                self._turn += 1
+                shift = self._turn % len(healthy)
+                healthy = healthy[shift:] + healthy[:shift]
+            healthy.sort(key=lambda r: r.in_flight)
+            if affinity is not None and len(healthy) > 1:
+                home = self.replicas[zlib.crc32(str(affinity).encode("utf-8")) % len(self.replicas)]
+                if home in healthy and home.in_flight <= healthy[0].in_flight + self.AFFINITY_SLACK:
+                    healthy.remove(home)
+                    healthy.insert(0, home)
+            stale = [r for r in self.replicas
+                     if not r.healthy and now - r.checked_at >= self.config.health_interval]
+        recovered = [r for r in stale if self.check_health(r)]
+        candidates = healthy + recovered
+        if not candidates:
+            # Everything looks down: try them all rather than failing without a request
+            candidates = list(self.replicas)
+        return candidates
+
+    def _acquire(self, replica):
+        with self._lock:
+            replica.in_flight += 1
+        LLM_IN_FLIGHT.inc(replica=replica.base_url)
+
+    def _release(self, replica):
+        with self._lock:
+            replica.in_flight -= 1
+        LLM_IN_FLIGHT.dec(replica=replica.base_url)
+
+    def _mark_failed(self, replica, error):
+        LLM_ERRORS.inc(error=error_class(error))
+        with self._lock:
+            replica.healthy = False
+            replica.failures += 1
+            replica.checked_at = time.monotonic()
+
+    def _prepare(self, payload, stream):
+        """Fill in the model, keep_alive and default options of a /api/chat payload."""
+        payload = dict(payload, stream=stream)
+        payload.setdefault("model", self.config.model)
+        payload.setdefault("keep_alive", self.config.keep_alive)
+        payload["options"] = dict(self.config.options(), **payload.get("options", {}))
+        return payload
+
+    def _request(self, path, payload, stream=False, affinity=None):
+        """POST to the first replica that answers; returns (replica, response)."""
+        last_error = None
+        for replica in self._candidates(affinity):
+            self._acquire(replica)
+            try:
+                response = self.session.post(replica.base_url + path, json=payload,
+                                             stream=stream, timeout=self.config.timeout)
+            except FAILOVER_ERRORS as e:
+                self._release(replica)
+                self._mark_failed(replica, e)
+                last_error = e
+                continue
+            if response.status_code >= 500:
+                self._release(replica)
+                last_error = OllamaError(
+                    f"Status code: {response.status_code}, Response: {response.text[:500]}", response.status_code)
+                self._mark_failed(replica, last_error)
+                response.close()
+                continue
+            return replica, response
+        if isinstance(last_error, OllamaError):
+            raise last_error
+        raise OllamaError(f"No Ollama replica reachable: {last_error}")
+
+    def chat(self, payload, affinity=None, flow=None, priority=INTERACTIVE, on_wait=None):
+        """Send a non-streaming /api/chat request and return the decoded response.
+
+        The response is shared with identical requests that arrive while it
+        runs; only the first one queues for a scheduler slot, calling
+        `on_wait(position)` while it waits.
+        """
+        payload = self._prepare(payload, stream=False)
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+        result, _ = self._flight.do(key, self._chat, payload, affinity, flow, priority, on_wait)
+        return result
+
+    def _chat(self, payload, affinity, flow, priority, on_wait):
+        LLM_PROMPT_CHARS.observe(prompt_chars(payload))
+        with self.scheduler.slot(flow, priority, on_wait), LLM_REQUEST_SECONDS.time(endpoint="chat"):
+            replica, response = self._request("/api/chat", payload, affinity=affinity)
+            try:
+                if response.status_code != 200:
+                    error = OllamaError(
+                        f"Status code: {response.status_code}, Response: {response.text[:500]}", response.status_code)
+                    LLM_ERRORS.inc(error=error_class(error))
+                    raise error
+                result = response.json()
+            finally:
+                self._release(replica)
+        record_usage(result)
+        return result
+
+    def complete(self, prompt, system=SYSTEM_PROMPT, options=None, flow=None, priority=INTERACTIVE):
+        """Single-turn helper: send one user prompt and return the answer text."""
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"messages": messages}
+        if options:
+            payload["options"] = options
+        return self.chat(payload, flow=flow, priority=priority).get("message", {}).get("content", "")
+
+    def stream(self, payload, affinity=None, flow=None, priority=INTERACTIVE, on_wait=None):
+        """Start a streaming /api/chat request and return a ChatStream.
+
+        The scheduler slot is held until the stream is closed.
+        """
+        payload = self._prepare(payload, stream=True)
+        LLM_PROMPT_CHARS.observe(prompt_chars(payload))
+        ticket = self.scheduler.acquire(flow, priority, on_wait)
+        try:
+            stream = self._stream(payload, affinity)
+        except BaseException:
+            self.scheduler.release(ticket)
+            raise
+        release_replica = stream._on_close
+
+        def on_close():
+            release_replica()
+            self.scheduler.release(ticket)
+
+        stream._on_close = on_close
+        return stream
+
+    def _stream(self, payload, affinity):
+        last_error = None
+        for replica in self._candidates(affinity):
+            self._acquire(replica)
+            try:
+                return ChatStream(replica.base_url + "/api/chat", payload, timeout=self.config.timeout,
+                                  session=self.session, on_close=lambda r=replica: self._release(r))
+            except FAILOVER_ERRORS as e:
+                self._release(replica)
+                self._mark_failed(replica, e)
+                last_error = e
+            except OllamaError as e:
+                # ChatStream already released the replica through on_close
+                if e.status_code is None or e.status_code < 500:
+                    LLM_ERRORS.inc(error=error_class(e))
+                    raise
+                self._mark_failed(replica, e)
+                last_error = e
+        raise OllamaError(f"No Ollama replica reachable: {last_error}")
+
+    def embed(self, texts, model):
+        """Return embeddings for `texts` from /api/embed."""
+        with LLM_REQUEST_SECONDS.time(endpoint="embed"):
+            replica, response = self._request("/api/embed", {"model": model, "input": list(texts)})
+            try:
+                if response.status_code != 200:
+                    error = OllamaError(
+                        f"Status code: {response.status_code}, Response: {response.text[:500]}", response.status_code)
+                    LLM_ERRORS.inc(error=error_class(error))
+                    raise error
+                return response.json()["embeddings"]
+            finally:
+                self._release(replica)
@@ -0,0 +1,243 @@
+from metrics import PROMPT_BUDGET_TOKENS, PROMPT_TRUNCATIONS
+from ollama_client import SYSTEM_PROMPT
+from retrieval import build_question_prompt
+from summarize import estimate_tokens
+
+# Chat template tokens added around each message (role markers, separators)
+MESSAGE_OVERHEAD = 4
+
+# Older turns are compacted to at most this many words each
+COMPACT_WORDS_PER_MESSAGE = 40
+
+# Room kept for the question in the stable prefix layout, whose context size must not depend on it
+QUESTION_RESERVE = 256
+
+# System message of the stable prefix layout: identical on every turn about the same transcript
+PREFIX_SYSTEM_PROMPT = """{system}
+Answer the user's questions based only on the YouTube transcript below.
+
+Transcript:
+{context}
+"""
+
+SUMMARY_PROMPT = """Update the summary of an ongoing conversation about a YouTube video.
+Keep it short: the questions asked and the key facts given in the answers.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+SUMMARY_HEADER = "Summary of the earlier conversation:\n"
+
+
+def truncate_to_tokens(text, max_tokens, estimate=estimate_tokens):
+    """Cut text at a word boundary so that it fits in about `max_tokens` tokens."""
+    tokens = estimate(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    cut = text[:int(len(text) * max_tokens / tokens)]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+def _compact_message(message):
+    words = message["content"].split()
+    text = " ".join(words[:COMPACT_WORDS_PER_MESSAGE])
+    if len(words) > COMPACT_WORDS_PER_MESSAGE:
+        text += " …"
+    return f"{message['role'].capitalize()}: {text}"
+
+
+class ConversationMemory:
+    """Rolling summary of the turns that no longer fit in the verbatim history.
+
+    Messages that fall out of the history window are folded into `summary`
+    once, as they age out. By default each is shortened to its first words
+    and the oldest lines are dropped past the summary budget; pass
+    `summarize` (a prompt -> text function such as OllamaClient.complete) to
+    have the model rewrite the summary instead.
+    """
+
+    def __init__(self, summarize=None):
+        self.summarize = summarize
+        self.summary = ""
+        self.covered = []
+
+    def update(self, aged, max_tokens, estimate=estimate_tokens):
+        """Fold newly aged messages into the summary and return it."""
+        if aged[:len(self.covered)] != self.covered:
+            # The conversation was cleared or replaced: start over
+            self.summary, self.covered = "", []
+        new = aged[len(self.covered):]
+        if new:
+            if self.summarize is not None:
+                lines = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in new)
+                self.summary = self.summarize(SUMMARY_PROMPT.format(summary=self.summary or "(none)", messages=lines))
+            else:
+                lines = [line for line in self.summary.split("\n") if line] + [_compact_message(m) for m in new]
+                while len(lines) > 1 and estimate("\n".join(lines)) > max_tokens:
+                    lines.pop(0)
+                self.summary = "\n".join(lines)
+            self.covered = list(aged)
+        return truncate_to_tokens(self.summary, max_tokens, estimate)
+
+
+class PromptPlan:
+    """The messages to send and how the context window was spent on them."""
+
+    def __init__(self, messages, breakdown):
+        self.messages = messages
+        self.breakdown = breakdown
+
+    def describe(self):
+        b = self.breakdown
+        text = (f"{b['total']}/{b['num_ctx']} tokens ({b['layout']} layout): context {b['context']}, history {b['history']} "
+                f"({b['history_messages']} msgs), summary {b['summary']}, reserved for answer {b['reserved_output']}")
+        if b["context_truncated"]:
+            text += ", context truncated"
+        return text
+
+
+class PromptBudget:
+    """Fit system prompt, conversation history and transcript context into `num_ctx` tokens.
+
+    `reserved_output` tokens are kept free for the answer. The most recent
+    `max_history` messages are sent verbatim while they fit in
+    `history_share` of the remaining budget; older ones are compacted into a
+    rolling summary of at most `summary_share`. The transcript context gets
+    everything left and is truncated, rather than silently cut by Ollama,
+    when it does not fit. Token counts are estimates (see `estimate`).
+
+    Two layouts are supported. "question" puts the context in the final user
+    message next to the question, for context that changes with every
+    question (retrieved excerpts). "prefix" puts it in the system message
+    and sends the bare question last, so the prompt starts with the same
+    tokens on every turn and Ollama can reuse its KV cache for the
+    transcript; the context size is then fixed by `context_budget()`.
+    """
+
+    def __init__(self, num_ctx=8192, reserved_output=800, max_history=4, history_share=0.25, summary_share=0.1,
+                 system=SYSTEM_PROMPT, estimate=estimate_tokens):
+        self.num_ctx = num_ctx
+        self.reserved_output = reserved_output
+        self.max_history = max_history
+        self.history_share = history_share
+        self.summary_share = summary_share
+        self.system = system
+        self.estimate = estimate
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Budget matching an OllamaConfig's `num_ctx` and `num_predict`."""
+        return cls(num_ctx=config.num_ctx, reserved_output=config.num_predict, **kwargs)
+
+    def _tokens(self, text):
+        return self.estimate(text) + MESSAGE_OVERHEAD
+
+    def _available(self, question):
+        return (self.num_ctx - self.reserved_output - self._tokens(self.system)
+                - self._tokens(build_question_prompt(question, "")))
+
+    def _base(self):
+        return self.num_ctx - self.reserved_output - self._tokens(PREFIX_SYSTEM_PROMPT.format(system=self.system, context=""))
+
+    def context_budget(self):
+        """Tokens available to the context in the prefix layout, independent of question and history."""
+        base = self._base()
+        return base - QUESTION_RESERVE - int(base * self.history_share) - int(base * self.summary_share)
+
+    def fits_prefix(self, context):
+        """Whether `context` fits the prefix layout without truncation."""
+        return self.estimate(context) <= self.context_budget()
+
+    def _layout_available(self, question, layout):
+        return self._base() if layout == "prefix" else self._available(question)
+
+    def fit_history(self, history, available=None, memory=None):
+        """Return (history messages to send, verbatim message count, summary tokens).
+
+        The first message is the rolling summary when older turns were compacted.
+        """
+        history = [{"role": m["role"], "content": m["content"]} for m in (history or [])]
+        if available is None:
+            available = self.num_ctx - self.reserved_output - self._tokens(self.system)
+        history_budget = int(available * self.history_share)
+
+        # Newest first, while they fit the window and the budget
+        kept, used = [], 0
+        for message in reversed(history[-self.max_history:] if self.max_history else []):
+            tokens = self._tokens(message["content"])
+            if used + tokens > history_budget:
+                break
+            kept.insert(0, message)
+            used += tokens
+        # Keep whole exchanges: never start with an orphaned answer
+        if kept and kept[0]["role"] == "assistant" and len(kept) < len(history):
+            kept.pop(0)
+
+        aged = history[:len(history) - len(kept)]
+        if not aged:
+            return kept, len(kept), 0
+        memory = memory if memory is not None else ConversationMemory()
+        summary = memory.update(aged, int(available * self.summary_share), self.estimate)
+        if not summary:
+            return kept, len(kept), 0
+        summary_message = {"role": "system", "content": SUMMARY_HEADER + summary}
+        return [summary_message] + kept, len(kept), self._tokens(summary_message["content"])
+
+    def sent_history(self, question, history=None, memory=None, layout="question"):
+        """The history messages build() sends with `question`, without building the prompt."""
+        messages, _, _ = self.fit_history(history, self._layout_available(question, layout), memory)
+        return messages
+
+    def build(self, question, context, history=None, memory=None, layout="question"):
+        """Return a PromptPlan whose messages fit the budget."""
+        available = self._layout_available(question, layout)
+        if layout == "prefix":
+            question_message = question
+            system_template = PREFIX_SYSTEM_PROMPT.format(system=self.system, context="")
+        else:
+            question_message = build_question_prompt(question, "")
+            system_template = self.system
+        messages, verbatim, summary_tokens = self.fit_history(history, available, memory)
+        history_tokens = sum(self._tokens(m["content"]) for m in messages) - summary_tokens
+
+        if layout == "prefix":
+            # Fixed size so the prefix is the same on every turn, unless the question is unusually long
+            context_budget = min(self.context_budget(),
+                                 available - history_tokens - summary_tokens - self._tokens(question))
+        else:
+            context_budget = available - history_tokens - summary_tokens
+        fitted = truncate_to_tokens(context, context_budget, self.estimate)
+        truncated = len(fitted) < len(context)
+        if truncated:
+            PROMPT_TRUNCATIONS.inc()
+
+        if layout == "prefix":
+            messages = ([{"role": "system", "content": PREFIX_SYSTEM_PROMPT.format(system=self.system, context=fitted)}]
+                        + messages + [{"role": "user", "content": question}])
+        else:
+            messages = ([{"role": "system", "content": self.system}] + messages
+                        + [{"role": "user", "content": build_question_prompt(question, fitted)}])
+        breakdown = {
+            "layout": layout,
+            "num_ctx": self.num_ctx,
+            "reserved_output": self.reserved_output,
+            "system": self._tokens(system_template),
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "question": self._tokens(question_message),
+            "context": self.estimate(fitted),
+            "history_messages": verbatim,
+            "compacted_messages": len(history or []) - verbatim,
+            "context_truncated": truncated,
+        }
+        breakdown["total"] = sum(breakdown[part] for part in ("system", "summary", "history", "question", "context"))
+        for part in ("system", "summary", "history", "question", "context", "total"):
+            PROMPT_BUDGET_TOKENS.observe(breakdown[part], part=part)
+        return PromptPlan(messages, breakdown)
@@ -0,0 +1,376 @@
+"""Incremental re-crawl of transcripts that were fetched before.
+
+Captions change after a video is published: auto-generated tracks are
+replaced by manual ones, languages are added and creators fix mistakes.
+RefreshState records per video the track inventory YouTube listed, the
+track the policy chose from it and a hash of that track's content. A
+refresh lists every video again (one request) and fetches the transcript
+only when the chosen track changed or the last fetch is older than `ttl`;
+all other videos are skipped after the listing.
+
+When a fetched transcript's hash differs from the recorded one, the
+artifacts derived from it are brought up to date, and only for that
+video: the transcript cache, the saved `<video_id>_transcript.txt`, the
+archive (analytics and the knowledge store pick the new file up on their
+next refresh) and the search index. Cached answers and summaries are keyed
+by the transcript's hash, so they stop matching on their own.
+
+    python refresh.py urls.txt --ttl 604800
+    python refresh.py              # every video refreshed before
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from bulk import HostRateLimiter, PERMANENT_ERRORS, read_urls, remote_call
+from metrics import TRANSCRIPT_REFRESHES, TRANSCRIPT_STAGE_SECONDS, start_textfile_exporter
+from youtube import (DEFAULT_POLICY, NoUsableTranscript, extract_video_id, format_transcript, list_transcripts,
+                     get_transcript_cache, get_archive_store, get_search_index, archive_transcript, index_transcript,
+                     transcript_file_path)
+
+DEFAULT_STATE_PATH = os.environ.get(
+    "REFRESH_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "refresh_state.sqlite3")
+)
+# Seconds after which an unchanged listing still leads to fetching the transcript again
+DEFAULT_TTL_SECONDS = int(os.environ.get("REFRESH_TTL", 7 * 24 * 3600))
+# Expiry is spread over the last quarter of the TTL, so videos first fetched
+# together are not all refetched by the same run
+TTL_SPREAD = 0.25
+
+
+def content_hash(segments):
+    """Hash of a transcript's text and timing."""
+    digest = hashlib.sha256()
+    for segment in segments:
+        digest.update(json.dumps([segment["text"], segment.get("start"), segment.get("duration")],
+                                 ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def track_inventory(transcript_list):
+    """The listed tracks as a sorted list of [language_code, is_generated]."""
+    return sorted([track.language_code, bool(track.is_generated)] for track in transcript_list)
+
+
+class RefreshState:
+    """SQLite record of what each video looked like at its last refresh, and a log of runs."""
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    inventory TEXT NOT NULL,
+                    language_code TEXT NOT NULL,
+                    is_generated INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    listed_at REAL NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    changed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    started_at REAL PRIMARY KEY,
+                    elapsed REAL NOT NULL,
+                    summary TEXT NOT NULL
+                )
+            """)
+
+    def get(self, video_id):
+        """Return the video's recorded state as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT inventory, language_code, is_generated, content_hash, listed_at, fetched_at, changed_at "
+                "FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "video_id": video_id,
+            "inventory": json.loads(row[0]),
+            "language_code": row[1],
+            "is_generated": bool(row[2]),
+            "content_hash": row[3],
+            "listed_at": row[4],
+            "fetched_at": row[5],
+            "changed_at": row[6],
+        }
+
+    def put(self, state):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (state["video_id"], json.dumps(state["inventory"]), state["language_code"],
+                 int(state["is_generated"]), state["content_hash"], state["listed_at"], state["fetched_at"],
+                 state["changed_at"])
+            )
+
+    def video_ids(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT video_id FROM videos ORDER BY video_id")]
+
+    def record_run(self, started_at, summary):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?)",
+                               (started_at, summary["elapsed"], json.dumps(summary)))
+
+    def runs(self, limit=10):
+        """The summaries of the most recent runs, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT started_at, summary FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(json.loads(summary), started_at=started_at) for started_at, summary in rows]
+
+    def stats(self):
+        with self._lock:
+            videos, manual = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(1 - is_generated), 0) FROM videos"
+            ).fetchone()
+        return {"videos": videos, "manual": manual}
+
+
+def _expired(state, ttl, now):
+    # The same video always gets the same share of the spread
+    spread = zlib.crc32(state["video_id"].encode("utf-8")) / 2 ** 32 * TTL_SPREAD
+    return now - state["fetched_at"] >= ttl * (1 - spread)
+
+
+def update_artifacts(video_id, segments, language_code, is_generated):
+    """Rewrite the saved file, archive and search index entry of a changed video, where they exist.
+
+    Returns the names of the artifacts updated.
+    """
+    updated = []
+    transcript = format_transcript(segments)
+    path = transcript_file_path(video_id)
+    if os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(transcript)
+        updated.append("file")
+    store = get_archive_store()
+    if store is not None and os.path.exists(store.path(video_id)):
+        if archive_transcript(video_id, segments, language_code, is_generated):
+            updated.append("archive")
+    index = get_search_index()
+    try:
+        indexed = index is not None and index.contains(video_id)
+    except sqlite3.Error:
+        indexed = False
+    if indexed and index_transcript(video_id, transcript, segments, language_code):
+        updated.append("index")
+    return updated
+
+
+def refresh_video(video_id, state, limiter, ttl=DEFAULT_TTL_SECONDS, force=False, policy=None,
+                  max_retries=3, backoff=1.0):
+    """List one video's tracks and fetch its transcript again only if needed.
+
+    Returns a record saying whether the transcript was `fetched`, whether
+    its content `changed`, and the `reason`. A fetch happens for a "new"
+    video, when the policy now picks another track ("track_changed"), when
+    the last fetch "expired", or with `force` ("forced"). Otherwise the
+    video is skipped as "unchanged", or "tracks_changed" when only tracks
+    other than the chosen one were added or removed. A new video whose
+    chosen track is in the transcript cache is recorded from there
+    ("cached") instead of being fetched.
+    """
+    policy = policy or DEFAULT_POLICY
+    started = time.perf_counter()
+    record = {"video_id": video_id, "status": "ok", "fetched": False, "changed": False}
+    try:
+        (transcript_list, _), _ = remote_call(limiter, max_retries, backoff, list_transcripts, video_id, False)
+        track = policy.select(transcript_list)
+        if track is None:
+            raise NoUsableTranscript(video_id)
+    except Exception as e:
+        record.update(status="error", permanent=isinstance(e, PERMANENT_ERRORS), reason="error",
+                      error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - started)
+        return record
+
+    now = time.time()
+    inventory = track_inventory(transcript_list)
+    previous = state.get(video_id)
+    same_track = previous is not None and (previous["language_code"], previous["is_generated"]) == (
+        track.language_code, bool(track.is_generated))
+    cache = get_transcript_cache()
+    record.update(language_code=track.language_code, is_generated=bool(track.is_generated))
+
+    segments = None
+    if previous is None:
+        entry = cache.get(video_id, track.language_code, track.is_generated) if cache is not None else None
+        if entry is not None:
+            segments, reason = entry["segments"], "cached"
+        else:
+            reason = "new"
+    elif force:
+        reason = "forced"
+    elif not same_track:
+        reason = "track_changed"
+    elif _expired(previous, ttl, now):
+        reason = "expired"
+    else:
+        reason = "unchanged" if inventory == previous["inventory"] else "tracks_changed"
+        state.put(dict(previous, inventory=inventory, listed_at=now))
+        record.update(reason=reason, elapsed=time.perf_counter() - started)
+        return record
+
+    if segments is None:
+        try:
+            with TRANSCRIPT_STAGE_SECONDS.time(stage="fetch"):
+                segments, _ = remote_call(limiter, max_retries, backoff, track.fetch)
+        except Exception as e:
+            record.update(status="error", permanent=isinstance(e, PERMANENT_ERRORS), reason=reason,
+                          error=f"{type(e).__name__}: {e}", elapsed=time.perf_counter() - started)
+            return record
+        record["fetched"] = True
+
+    digest = content_hash(segments)
+    changed = previous is not None and digest != previous["content_hash"]
+    if cache is not None and record["fetched"]:
+        if changed:
+            # Also drops superseded tracks, such as the auto-generated one a manual track replaced
+            cache.invalidate(video_id)
+        cache.put(video_id, track.language_code, track.is_generated, segments)
+    if changed:
+        record["updated"] = update_artifacts(video_id, segments, track.language_code, track.is_generated)
+    state.put({
+        "video_id": video_id,
+        "inventory": inventory,
+        "language_code": track.language_code,
+        "is_generated": bool(track.is_generated),
+        "content_hash": digest,
+        "listed_at": now,
+        "fetched_at": now,
+        "changed_at": now if changed or previous is None else previous["changed_at"],
+    })
+    record.update(changed=changed, reason=reason, content_hash=digest, elapsed=time.perf_counter() - started)
+    return record
+
+
+def iter_refresh(video_ids, state, workers=8, rate=5.0, ttl=DEFAULT_TTL_SECONDS, force=False, policy=None,
+                 max_retries=3, backoff=1.0):
+    """Refresh videos concurrently and yield their records as they complete."""
+    limiter = HostRateLimiter(rate)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for video_id in dict.fromkeys(video_ids):
+            pending.add(executor.submit(refresh_video, video_id, state, limiter, ttl, force, policy,
+                                        max_retries, backoff))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def refresh_many(video_ids, state, workers=8, rate=5.0, ttl=DEFAULT_TTL_SECONDS, force=False, policy=None,
+                 max_retries=3, backoff=1.0, progress=None):
+    """Refresh videos and return a summary of the run, which is also recorded in `state`.
+
+    The summary counts videos `listed`, `fetched`, `skipped` (listed but not
+    fetched), `changed` (fetched with different content) and `failed`, and
+    how many took each `reason`.
+    """
+    summary = {"listed": 0, "fetched": 0, "skipped": 0, "changed": 0, "failed": 0}
+    reasons = Counter()
+    started_at, started = time.time(), time.perf_counter()
+    for record in iter_refresh(video_ids, state, workers, rate, ttl, force, policy, max_retries, backoff):
+        if record["status"] == "ok":
+            summary["listed"] += 1
+            summary["fetched" if record["fetched"] else "skipped"] += 1
+            summary["changed"] += record["changed"]
+            outcome = "changed" if record["changed"] else "fetched" if record["fetched"] else "skipped"
+        else:
+            summary["failed"] += 1
+            outcome = "failed"
+        reasons[record["reason"]] += 1
+        TRANSCRIPT_REFRESHES.inc(outcome=outcome, reason=record["reason"])
+        if progress is not None:
+            progress(record, summary)
+    summary["reasons"] = dict(reasons)
+    summary["elapsed"] = time.perf_counter() - started
+    state.record_run(started_at, summary)
+    return summary
+
+
+def describe(summary):
+    return (f"{summary['listed']} listed, {summary['fetched']} fetched, {summary['skipped']} skipped, "
+            f"{summary['changed']} changed, {summary['failed']} failed in {summary['elapsed']:.1f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Refetch only the transcripts that changed since the last run.")
+    parser.add_argument("input", nargs="?",
+                        help="File with one YouTube URL per line, or '-' for stdin (default: every video refreshed before)")
+    parser.add_argument("--state", default=DEFAULT_STATE_PATH, help="Refresh state database (default: %(default)s)")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL_SECONDS,
+                        help="Seconds after which unchanged videos are fetched again (default: %(default)s)")
+    parser.add_argument("--force", action="store_true", help="Fetch every video again")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="Concurrent videos (default: %(default)s)")
+    parser.add_argument("--rate", type=float, default=5.0, help="Max requests per second to YouTube, 0 to disable (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=3, help="Retries for transient failures (default: %(default)s)")
+    parser.add_argument("--history", action="store_true", help="Show the most recent runs and exit")
+    args = parser.parse_args(argv)
+
+    state = RefreshState(args.state)
+    if args.history:
+        for run in state.runs():
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(run['started_at']))}  {describe(run)}")
+        return
+
+    if args.input is None:
+        video_ids = state.video_ids()
+    else:
+        # Closing stdin would close it for the whole process
+        source = contextlib.nullcontext(sys.stdin) if args.input == "-" else open(args.input, encoding="utf-8")
+        with source as stream:
+            video_ids = []
+            for url in read_urls(stream):
+                video_id = extract_video_id(url)
+                if video_id:
+                    video_ids.append(video_id)
+                else:
+                    print(f"Skipping {url}: could not extract a video ID", file=sys.stderr)
+
+    def report(record, summary):
+        if record["status"] != "ok":
+            status = f"error ({record.get('error')})"
+        elif record["changed"]:
+            status = f"changed ({record['reason']}), updated {', '.join(record['updated']) or 'nothing else'}"
+        else:
+            status = f"{'fetched' if record['fetched'] else 'skipped'} ({record['reason']})"
+        print(f"[{summary['listed'] + summary['failed']}] {record['video_id']}: {status}", file=sys.stderr)
+
+    exporter = start_textfile_exporter()
+    try:
+        summary = refresh_many(video_ids, state, workers=args.workers, rate=args.rate, ttl=args.ttl, force=args.force,
+                               max_retries=args.retries, progress=report)
+    finally:
+        if exporter is not None:
+            exporter.stop()
+    print(f"Done: {describe(summary)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
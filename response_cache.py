@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from metrics import CACHE_REQUESTS
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "RESPONSE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_cache.sqlite3")
+)
+DEFAULT_TTL_SECONDS = int(os.environ.get("RESPONSE_CACHE_TTL", 30 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", 20000))
+# Minimum word-set similarity for a near-duplicate question to reuse an answer; 0 disables
+DEFAULT_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", 0))
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words ignored when comparing questions for near-duplicates. Question words
+# (what, why, how, ...) are kept on purpose: they change the answer.
+FILLER_WORDS = frozenset("a an the of in on to is are was be this that it video transcript please me can you".split())
+
+
+def transcript_digest(transcript):
+    """Stable hash identifying a transcript's content."""
+    return hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+
+def normalize_prompt(prompt):
+    """Lowercase and reduce a prompt to its words, ignoring spacing and punctuation."""
+    return " ".join(WORD_PATTERN.findall(prompt.lower()))
+
+
+def _similarity(a, b):
+    a, b = set(a.split()) - FILLER_WORDS, set(b.split()) - FILLER_WORDS
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ResponseCache:
+    """SQLite-backed cache of LLM answers.
+
+    Answers are keyed by (model, transcript hash, normalized prompt, history),
+    where history is the conversation actually sent with the prompt. With
+    `similarity` above 0, a question whose normalized words overlap an earlier
+    one for the same model, transcript and history by at least that Jaccard
+    ratio reuses its answer. Entries expire after `ttl` seconds and the least
+    recently used are evicted past `max_entries`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES,
+                 similarity=DEFAULT_SIMILARITY):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_scope ON responses (scope)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+
+    @staticmethod
+    def _scope(model, transcript_hash, history):
+        # Everything except the prompt itself; near-duplicate matching stays within a scope
+        history = [(m["role"], m["content"]) for m in (history or [])]
+        data = json.dumps([model, transcript_hash, history], ensure_ascii=False)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def _key(self, scope, prompt):
+        return hashlib.sha256(f"{scope}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, model, transcript_hash, prompt, history=None):
+        """Return a cached answer or None."""
+        scope = self._scope(model, transcript_hash, history)
+        prompt = normalize_prompt(prompt)
+        now = time.time()
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT key, response FROM responses WHERE key = ? AND created_at >= ?",
+                (self._key(scope, prompt), now - self.ttl)
+            ).fetchone()
+            result = "hit"
+            if row is None and self.similarity > 0:
+                row = self._nearest(scope, prompt, now)
+                if row is not None:
+                    self.near_hits += 1
+                    result = "near_hit"
+            if row is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="response", result="miss")
+                return None
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="response", result=result)
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, row[0]))
+        return row[1]
+
+    def _nearest(self, scope, prompt, now):
+        best, best_score = None, self.similarity
+        rows = self._conn.execute(
+            "SELECT key, prompt, response FROM responses WHERE scope = ? AND created_at >= ?",
+            (scope, now - self.ttl)
+        )
+        for key, cached_prompt, response in rows:
+            score = _similarity(prompt, cached_prompt)
+            if score >= best_score:
+                best, best_score = (key, response), score
+        return best
+
+    def put(self, model, transcript_hash, prompt, response, history=None):
+        """Store an answer and evict expired or excess entries."""
+        scope = self._scope(model, transcript_hash, history)
+        prompt = normalize_prompt(prompt)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(scope, prompt), scope, prompt, response, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("""
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?
+                    )
+                """, (count - self.max_entries,))
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self.hits = self.near_hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
@@ -0,0 +1,207 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+try:
+    import numpy as np
+except ImportError:  # embeddings are optional, BM25 works without numpy
+    np = None
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by do does did for from has have he her his how i if in into is it its
+me my no not of on or our she so than that the their them then there these they this to was we
+were what when where which who why will with would you your about can could just like
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens with common stopwords removed."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def format_timestamp(seconds):
+    """Format seconds as m:ss or h:mm:ss."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def chunk_segments(segments, max_words=180, overlap_words=40):
+    """Group transcript segments into overlapping, timestamped chunks.
+
+    Each chunk is a dict with `text`, `start` and `end` (seconds). Chunks hold
+    up to `max_words` words and repeat roughly the last `overlap_words` words
+    of the previous chunk so an answer spanning a boundary is not lost.
+    """
+    counts = [len(s["text"].split()) for s in segments]
+    chunks = []
+    start = 0
+
+    while start < len(segments):
+        end = start
+        words = 0
+        while end < len(segments) and words < max_words:
+            words += counts[end]
+            end += 1
+        chunks.append(_make_chunk(segments[start:end]))
+        if end >= len(segments):
+            break
+
+        # Step back far enough to repeat the overlap, but always move forward
+        next_start = end
+        carried = 0
+        while next_start > start + 1 and carried < overlap_words:
+            next_start -= 1
+            carried += counts[next_start]
+        start = next_start
+
+    return chunks
+
+
+def _make_chunk(segments):
+    last = segments[-1]
+    return {
+        "text": " ".join(s["text"] for s in segments),
+        "start": segments[0]["start"],
+        "end": last["start"] + last.get("duration", 0),
+    }
+
+
+class BM25Index:
+    """Okapi BM25 over transcript chunks."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(list)
+        self._lengths = []
+
+        for i, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["text"]))
+            self._lengths.append(sum(terms.values()))
+            for term, freq in terms.items():
+                self._postings[term].append((i, freq))
+
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        count = len(chunks)
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, query):
+        """Return {chunk index: score} for chunks sharing a term with the query."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, freq in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / self._avg_length)
+                scores[i] += idf * freq * (self.k1 + 1) / (freq + norm)
+        return scores
+
+    def search(self, query, k=5):
+        """Return the indexes of the top `k` chunks for the query, best first."""
+        scores = self.scores(query)
+        return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+class EmbeddingIndex:
+    """Cosine similarity search over chunk embeddings (requires numpy).
+
+    `embed` takes a list of strings and returns one vector per string.
+    """
+
+    def __init__(self, chunks, embed):
+        if np is None:
+            raise RuntimeError("numpy is required for embedding search")
+        self.chunks = chunks
+        self.embed = embed
+        self._matrix = self._normalize(np.asarray(embed([c["text"] for c in chunks]), dtype=np.float32))
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def search(self, query, k=5):
+        query_vector = self._normalize(np.asarray(self.embed([query])[0], dtype=np.float32))
+        similarities = self._matrix @ query_vector
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-similarities[top])]]
+
+
+class TranscriptIndex:
+    """Per-video retrieval index: BM25, fused with embeddings when available."""
+
+    def __init__(self, segments, embed=None, max_words=180, overlap_words=40):
+        self.chunks = chunk_segments(segments, max_words, overlap_words)
+        self.bm25 = BM25Index(self.chunks)
+        self.embeddings = None
+        if embed is not None and np is not None and self.chunks:
+            try:
+                self.embeddings = EmbeddingIndex(self.chunks, embed)
+            except Exception:
+                # Embedding backend unavailable, keep lexical search only
+                self.embeddings = None
+
+    def search(self, query, k=5):
+        """Return the top `k` chunks for the query in chronological order."""
+        if len(self.chunks) <= k:
+            return list(self.chunks)
+
+        rankings = [self.bm25.search(query, k * 2)]
+        if self.embeddings is not None:
+            try:
+                rankings.append(self.embeddings.search(query, k * 2))
+            except Exception:
+                pass
+
+        # Reciprocal rank fusion of the lexical and semantic rankings
+        fused = defaultdict(float)
+        for ranking in rankings:
+            for rank, i in enumerate(ranking):
+                fused[i] += 1.0 / (60 + rank)
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        if not best:
+            # No term overlap at all: fall back to the opening of the video
+            best = list(range(k))
+        return [self.chunks[i] for i in sorted(best)]
+
+
+def format_context(chunks):
+    """Render retrieved chunks as timestamped transcript excerpts."""
+    return "\n\n".join(
+        f"[{format_timestamp(c['start'])} - {format_timestamp(c['end'])}] {c['text']}" for c in chunks
+    )
+
+
+def build_question_prompt(question, transcript_text):
+    """The user message asking a question about (part of) a transcript."""
+    return f"""I want you to answer this question based only on the YouTube transcript provided below.
+
+Question: {question}
+
+Transcript:
+{transcript_text}
+"""
+
+
+def ollama_embedder(embed_url, model, timeout=60):
+    """Return an `embed` function backed by Ollama's /api/embed endpoint."""
+    import requests
+
+    def embed(texts):
+        response = requests.post(embed_url, json={"model": model, "input": texts}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    return embed
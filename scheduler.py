@@ -0,0 +1,233 @@
+"""Admission control and fair queueing for LLM requests made by this process.
+
+Ollama generates at most OLLAMA_NUM_PARALLEL answers at once per server and
+queues the rest internally, where a burst from one user delays everybody.
+Every LLM request instead takes one of `slots` from the process-wide
+LLMScheduler first. Waiting requests are served by priority (interactive
+chat before background summaries), and within a priority round-robin
+across flows (one per Streamlit session, API client or job), so a user
+firing off several requests only ever gets their turn. Requests that would
+wait too long are rejected with LLMBusy instead of timing out later.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from metrics import LLM_QUEUE_WAIT_SECONDS, LLM_SERVICE_SECONDS, LLM_QUEUE_DEPTH, LLM_SHED
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+
+def _default_slots():
+    replicas = (os.environ.get("OLLAMA_URLS") or os.environ.get("OLLAMA_URL") or "http://localhost:11434").split(",")
+    per_replica = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+    return per_replica * len([url for url in replicas if url.strip()])
+
+
+LLM_SLOTS = int(os.environ.get("LLM_SLOTS", 0)) or _default_slots()
+# Slots background work may hold at once, so a chat question never waits for a whole map-reduce
+LLM_BACKGROUND_SLOTS = int(os.environ.get("LLM_BACKGROUND_SLOTS", 0)) or max(1, LLM_SLOTS - 1)
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", 32))
+LLM_MAX_QUEUE_PER_FLOW = int(os.environ.get("LLM_MAX_QUEUE_PER_FLOW", 4))
+LLM_MAX_WAIT = float(os.environ.get("LLM_MAX_WAIT", 60))
+LLM_MAX_WAIT_BACKGROUND = float(os.environ.get("LLM_MAX_WAIT_BACKGROUND", 600))
+
+
+class LLMBusy(Exception):
+    """Raised when an LLM request is not admitted because too much work is already waiting."""
+
+    def __init__(self, message, reason, retry_after=5):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    def __init__(self, flow, priority):
+        self.flow = flow
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = None
+
+
+class LLMScheduler:
+    """Bounded concurrency with strict priorities and round-robin between flows.
+
+    `slots` requests run at once, at most `background_slots` of them
+    BACKGROUND. A new request is shed with LLMBusy when `max_queue` requests
+    of its priority or higher are already waiting, when its flow already has
+    `max_queue_per_flow` waiting, or when it waited longer than
+    `max_wait[priority]` seconds. Use `slot()` around the request; its
+    `on_wait(position)` callback is called while it waits whenever the number
+    of requests ahead of it changes.
+    """
+
+    # How often waiting requests recompute their position and check the deadline
+    POLL_SECONDS = 0.5
+
+    def __init__(self, slots=LLM_SLOTS, background_slots=LLM_BACKGROUND_SLOTS, max_queue=LLM_MAX_QUEUE,
+                 max_queue_per_flow=LLM_MAX_QUEUE_PER_FLOW,
+                 max_wait=(LLM_MAX_WAIT, LLM_MAX_WAIT_BACKGROUND)):
+        self.slots = max(1, slots)
+        self.background_slots = max(1, min(background_slots, self.slots))
+        self.max_queue = max_queue
+        self.max_queue_per_flow = max_queue_per_flow
+        self.max_wait = {INTERACTIVE: max_wait[0], BACKGROUND: max_wait[1]}
+        self._cond = threading.Condition()
+        # Per priority: flow -> waiting tickets, in round-robin order
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+
+    def _waiting(self, priority):
+        return sum(len(tickets) for tickets in self._queues[priority].values())
+
+    def _shed(self, ticket, reason, message):
+        LLM_SHED.inc(priority=PRIORITY_NAMES[ticket.priority], reason=reason)
+        raise LLMBusy(message, reason)
+
+    def _admit(self, ticket):
+        """Queue a ticket, or raise LLMBusy if the queue is full."""
+        ahead = sum(self._waiting(priority) for priority in PRIORITY_NAMES if priority <= ticket.priority)
+        if ahead >= self.max_queue:
+            self._shed(ticket, "queue_full",
+                       f"The model is busy: {ahead} requests are already waiting. Please try again in a moment.")
+        flows = self._queues[ticket.priority]
+        if len(flows.get(ticket.flow, ())) >= self.max_queue_per_flow:
+            self._shed(ticket, "flow_full",
+                       f"You already have {self.max_queue_per_flow} requests waiting for the model. "
+                       "Please wait for them to finish.")
+        flows.setdefault(ticket.flow, deque()).append(ticket)
+        LLM_QUEUE_DEPTH.set(self._waiting(ticket.priority), priority=PRIORITY_NAMES[ticket.priority])
+
+    def _remove(self, ticket):
+        flows = self._queues[ticket.priority]
+        tickets = flows[ticket.flow]
+        tickets.remove(ticket)
+        if not tickets:
+            del flows[ticket.flow]
+        LLM_QUEUE_DEPTH.set(self._waiting(ticket.priority), priority=PRIORITY_NAMES[ticket.priority])
+
+    def _can_run(self, priority):
+        if sum(self._running.values()) >= self.slots:
+            return False
+        return priority != BACKGROUND or self._running[BACKGROUND] < self.background_slots
+
+    def _dispatch(self):
+        """Grant free slots to the heads of the flows, highest priority first, then round-robin."""
+        granted = False
+        for priority in sorted(self._queues):
+            flows = self._queues[priority]
+            while flows and self._can_run(priority):
+                flow, tickets = next(iter(flows.items()))
+                ticket = tickets.popleft()
+                # The flow goes to the back of the rotation
+                del flows[flow]
+                if tickets:
+                    flows[flow] = tickets
+                ticket.granted = time.monotonic()
+                self._running[priority] += 1
+                granted = True
+            LLM_QUEUE_DEPTH.set(self._waiting(priority), priority=PRIORITY_NAMES[priority])
+            if flows:
+                # Lower priorities wait while higher ones do
+                break
+        if granted:
+            self._cond.notify_all()
+
+    def _position(self, ticket):
+        """Estimated number of requests that will be served before this one."""
+        ahead = sum(self._waiting(priority) for priority in PRIORITY_NAMES if priority < ticket.priority)
+        flows = self._queues[ticket.priority]
+        index = flows[ticket.flow].index(ticket)
+        before = True
+        for flow, tickets in flows.items():
+            if flow == ticket.flow:
+                before = False
+                continue
+            # Flows earlier in the rotation get one more turn before this ticket's
+            ahead += min(len(tickets), index + 1 if before else index)
+        return ahead + index
+
+    def _wait(self, ticket, deadline, on_wait):
+        reported = None
+        while ticket.granted is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._remove(ticket)
+                LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - ticket.enqueued,
+                                               priority=PRIORITY_NAMES[ticket.priority])
+                self._shed(ticket, "timeout",
+                           f"The model is busy: no slot became free within {self.max_wait[ticket.priority]:g}s. "
+                           "Please try again in a moment.")
+            position = self._position(ticket)
+            if on_wait is not None and position != reported:
+                reported = position
+                # Report without holding the lock; the callback may be slow (e.g. a UI update)
+                self._cond.release()
+                try:
+                    on_wait(position)
+                finally:
+                    self._cond.acquire()
+                continue
+            self._cond.wait(min(remaining, self.POLL_SECONDS))
+
+    def acquire(self, flow=None, priority=INTERACTIVE, on_wait=None):
+        """Wait for a slot and return the ticket to pass to `release`."""
+        ticket = _Ticket(flow, priority)
+        name = PRIORITY_NAMES[priority]
+        deadline = ticket.enqueued + self.max_wait[priority]
+        with self._cond:
+            self._admit(ticket)
+            self._dispatch()
+            try:
+                self._wait(ticket, deadline, on_wait)
+            except BaseException:
+                # Shed, or interrupted (e.g. a stopped script run) while waiting or reporting
+                if ticket.granted is None:
+                    if ticket in self._queues[priority].get(flow, ()):
+                        self._remove(ticket)
+                else:
+                    self._running[priority] -= 1
+                    self._dispatch()
+                raise
+        LLM_QUEUE_WAIT_SECONDS.observe(ticket.granted - ticket.enqueued, priority=name)
+        return ticket
+
+    def release(self, ticket):
+        LLM_SERVICE_SECONDS.observe(time.monotonic() - ticket.granted, priority=PRIORITY_NAMES[ticket.priority])
+        with self._cond:
+            self._running[ticket.priority] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, flow=None, priority=INTERACTIVE, on_wait=None):
+        """Hold a slot for the duration of the block."""
+        ticket = self.acquire(flow, priority, on_wait)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self):
+        """Running and waiting requests per priority."""
+        with self._cond:
+            return {name: {"running": self._running[priority], "waiting": self._waiting(priority),
+                           "flows": len(self._queues[priority])}
+                    for priority, name in PRIORITY_NAMES.items()}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """The scheduler shared by every LLM client in this process."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
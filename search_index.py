@@ -0,0 +1,258 @@
+"""Full-text search over every saved transcript (SQLite FTS5).
+
+Transcripts are indexed segment by segment, so hits point at the moment of
+the video where the words are spoken. Re-indexing a video replaces its
+segments only when their text changed.
+
+    python search_index.py search "gradient descent" [--video ID] [--raw]
+    python search_index.py import [directory | transcripts.jsonl]
+    python search_index.py stats
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from retrieval import format_timestamp
+
+DEFAULT_INDEX_PATH = os.environ.get(
+    "SEARCH_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index.sqlite3")
+)
+
+# Untimed transcripts (old .txt dumps) are indexed in pieces of this many words
+UNTIMED_CHUNK_WORDS = 60
+
+QUERY_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _content_hash(segments):
+    digest = hashlib.sha256()
+    for segment in segments:
+        digest.update(segment["text"].encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def to_match_query(query):
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    terms = [f'"{term}"' for term in QUERY_TERM_PATTERN.findall(query)]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """Full-text index over every saved transcript, at segment (timestamp) level.
+
+    Backed by SQLite FTS5 with BM25 ranking. Transcripts are added
+    incrementally; re-adding an unchanged transcript is a no-op.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    language_code TEXT,
+                    content_hash TEXT NOT NULL,
+                    segment_count INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    first_rowid INTEGER
+                )
+            """)
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(videos)")]
+            if "first_rowid" not in columns:
+                # Indexes created before segments were numbered per video
+                self._conn.execute("ALTER TABLE videos ADD COLUMN first_rowid INTEGER")
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+                    text,
+                    video_id UNINDEXED,
+                    start UNINDEXED,
+                    duration UNINDEXED,
+                    tokenize = 'porter unicode61'
+                )
+            """)
+
+    def _delete_segments(self, video_id):
+        """Delete a video's segments by their rowid range; `video_id` is not indexed in the FTS table."""
+        row = self._conn.execute(
+            "SELECT first_rowid, segment_count FROM videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if row is None:
+            return
+        first_rowid, count = row
+        if first_rowid is None:
+            # Indexed before rowid ranges were recorded: scan for it once
+            self._conn.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+        else:
+            self._conn.execute("DELETE FROM segments WHERE rowid BETWEEN ? AND ?",
+                               (first_rowid, first_rowid + count - 1))
+
+    def add_transcript(self, video_id, segments, language_code=None):
+        """Index (or re-index) one transcript. Returns False if it was already up to date."""
+        content_hash = _content_hash(segments)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content_hash FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            if row is not None and row[0] == content_hash:
+                return False
+            self._delete_segments(video_id)
+            # Each video's segments get consecutive rowids, so they can be deleted without a table scan
+            first_rowid = self._conn.execute("SELECT COALESCE(MAX(rowid), 0) + 1 FROM segments").fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO segments (rowid, text, video_id, start, duration) VALUES (?, ?, ?, ?, ?)",
+                ((first_rowid + i, s["text"], video_id, s.get("start"), s.get("duration"))
+                 for i, s in enumerate(segments))
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, language_code, content_hash, len(segments), time.time(), first_rowid)
+            )
+        return True
+
+    def add_text(self, video_id, text, language_code=None):
+        """Index a transcript that has no timestamps."""
+        words = text.split()
+        segments = [
+            {"text": " ".join(words[i:i + UNTIMED_CHUNK_WORDS]), "start": None, "duration": None}
+            for i in range(0, len(words), UNTIMED_CHUNK_WORDS)
+        ]
+        return self.add_transcript(video_id, segments, language_code)
+
+    def contains(self, video_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def remove(self, video_id):
+        with self._lock, self._conn:
+            self._delete_segments(video_id)
+            self._conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+
+    def search(self, query, limit=20, video_id=None, raw=False):
+        """Return the best matching segments as dicts, most relevant first.
+
+        `query` is free text unless `raw` is True, in which case it is passed
+        to FTS5 unchanged (phrases, OR, NEAR, ...).
+        """
+        match = query if raw else to_match_query(query)
+        if not match:
+            return []
+        sql = """
+            SELECT video_id, start, duration, text,
+                   snippet(segments, 0, '**', '**', '…', 16), bm25(segments)
+            FROM segments WHERE segments MATCH ?
+        """
+        params = [match]
+        if video_id is not None:
+            sql += " AND video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY bm25(segments) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"video_id": v, "start": start, "duration": duration, "text": text, "snippet": snippet, "score": -score}
+            for v, start, duration, text, snippet, score in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            videos, segments = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(segment_count), 0) FROM videos"
+            ).fetchone()
+        return {"videos": videos, "segments": segments}
+
+    def import_text_files(self, directory):
+        """Index `<video_id>_transcript.txt` files of videos not indexed yet; returns how many were added.
+
+        Videos already in the index are skipped: their entry was usually made
+        with timestamps when the file was saved, which the text file lacks.
+        """
+        count = 0
+        for path in glob.glob(os.path.join(directory, "*_transcript.txt")):
+            video_id = os.path.basename(path)[:-len("_transcript.txt")]
+            if self.contains(video_id):
+                continue
+            with open(path, encoding="utf-8") as f:
+                if self.add_text(video_id, f.read()):
+                    count += 1
+        return count
+
+    def import_jsonl(self, path):
+        """Index the fetched transcripts in a bulk.py output file that are not indexed yet; returns how many."""
+        count = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("status") != "ok" or self.contains(record["video_id"]):
+                    continue
+                if self.add_text(record["video_id"], record["transcript"], record.get("language_code")):
+                    count += 1
+        return count
+
+
+def hit_url(hit):
+    """YouTube link that starts playback at the hit."""
+    if hit["start"] is None:
+        return f"https://youtu.be/{hit['video_id']}"
+    return f"https://youtu.be/{hit['video_id']}?t={int(hit['start'])}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search all saved transcripts.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index database (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="Search the index")
+    search.add_argument("query")
+    search.add_argument("-n", "--limit", type=int, default=20)
+    search.add_argument("--video", help="Only search this video ID")
+    search.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unchanged")
+
+    importer = commands.add_parser("import", help="Index existing *_transcript.txt files or a bulk.py JSONL output")
+    importer.add_argument("path", nargs="?", default=os.path.dirname(os.path.abspath(__file__)))
+
+    commands.add_parser("stats", help="Show index size")
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.index)
+    if args.command == "search":
+        started = time.perf_counter()
+        try:
+            hits = index.search(args.query, args.limit, args.video, args.raw)
+        except sqlite3.OperationalError as e:
+            # Only raw queries can be malformed; the others are quoted term by term
+            parser.error(f"invalid query: {e}")
+        elapsed = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            when = format_timestamp(hit["start"]) if hit["start"] is not None else "--:--"
+            print(f"{hit['video_id']} [{when}] {hit['snippet']}\n    {hit_url(hit)}")
+        print(f"{len(hits)} hit(s) in {elapsed:.1f} ms", file=sys.stderr)
+    elif args.command == "import":
+        if os.path.isdir(args.path):
+            count = index.import_text_files(args.path)
+        else:
+            count = index.import_jsonl(args.path)
+        print(f"Indexed {count} transcript(s)")
+    else:
+        stats = index.stats()
+        print(f"{stats['videos']} videos, {stats['segments']} segments")
+
+
+if __name__ == "__main__":
+    main()
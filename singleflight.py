@@ -0,0 +1,100 @@
+"""Coalesce concurrent identical work: one call runs, everyone waiting for it shares the outcome.
+
+Used for transcript resolution (many sessions extracting the same video at
+once) and identical LLM requests. Set SINGLEFLIGHT_LOCK_DIR to also
+serialize the same work across processes with file locks.
+"""
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: coalesce within the process only
+    fcntl = None
+
+from metrics import SINGLEFLIGHT_CALLS
+
+DEFAULT_LOCK_DIR = os.environ.get("SINGLEFLIGHT_LOCK_DIR", "")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.finished = False
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its outcome.
+
+    The first caller for a key runs the function. Callers arriving while it
+    runs wait and get the same return value or exception. Nothing is kept
+    once the call returns: the transcript and response caches remember
+    results, this only stops the same work from starting twice.
+
+    With `lock_dir` the running call also holds an exclusive file lock for its
+    key, so the same call in another process (Streamlit, bulk or API
+    workers) waits for it. That process then runs the function itself, which
+    is cheap when the function looks in a shared cache first.
+    """
+
+    def __init__(self, name, lock_dir=DEFAULT_LOCK_DIR):
+        self.name = name
+        self.lock_dir = lock_dir if fcntl is not None else ""
+        self._lock = threading.Lock()
+        self._calls = {}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+    def do(self, key, func, *args, **kwargs):
+        """Return (result of func(*args, **kwargs), whether it was shared with an earlier caller).
+
+        `key` must be hashable and identify everything the result depends on.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    break
+            SINGLEFLIGHT_CALLS.inc(flight=self.name, role="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            if call.finished:
+                return call.result, True
+            # The running call was interrupted (e.g. a stopped script run): try again
+
+        SINGLEFLIGHT_CALLS.inc(flight=self.name, role="leader")
+        try:
+            with self._process_lock(key):
+                call.result = func(*args, **kwargs)
+            call.finished = True
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    @contextmanager
+    def _process_lock(self, key):
+        if not self.lock_dir:
+            yield
+            return
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        with open(os.path.join(self.lock_dir, f"{self.name}-{digest}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -1,492 +1,1114 @@
-import streamlit as st
-import pandas as pd
-from youtube import extract_video_id, get_best_transcript, save_transcript_to_file
-import base64
-import os
-import time
-import requests
-import json
-import random
-
-# Set page config
-st.set_page_config(
-    page_title="YouTube Transcript Extractor by @Pawankumar-py4tk",
-    page_icon="🤖",
-    layout="wide"
-)
-
-# Add custom CSS for AI styling
-st.markdown("""
-<style>
-    /* AI Chat styling */
-    .ai-badge {
-        background-color: black;
-        color: white;
-        padding: 0.2rem 0.6rem;
-        border-radius: 0.5rem;
-        font-size: 0.8rem;
-        font-weight: bold;
-        margin-right: 0.5rem;
-    }
-    
-    .ai-container {
-        border-left: 4px solid #8B44FF;
-        padding-left: 1rem;
-        margin: 1rem 0;
-    }
-    
-    .ai-header {
-        display: flex;
-        align-items: center;
-        margin-bottom: 0.5rem;
-    }
-    
-    .ai-thinking {
-        color: #8B44FF;
-        font-style: italic;
-    }
-    
-    /* Pulsating AI effect */
-    .ai-pulse {
-        animation: pulse 2s infinite;
-    }
-    
-    @keyframes pulse {
-        0% { opacity: 1; }
-        50% { opacity: 0.5; }
-        100% { opacity: 1; }
-    }
-    
-    /* AI Tool Card */
-    .ai-tool-card {
-        border: 1px solid #f0f0f5;
-        border-radius: 0.5rem;
-        padding: 1rem;
-        margin-bottom: 1rem;
-        background: black;
-    }
-    
-    .ai-tool-card:hover {
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-    }
-    
-    /* Channel branding */
-    .channel-banner {
-        background: linear-gradient(90deg, #FF0000 0%, #FF5500 100%);
-        color: white;
-        padding: 10px;
-        border-radius: 5px;
-        margin-bottom: 10px;
-        text-align: center;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Constants for Ollama API
-OLLAMA_API_URL = "{your ollama url}/api/chat"
-OLLAMA_MODEL = "llama3.2:latest"
-
-# Channel information
-CHANNEL_NAME = "Pawan Kumar"
-CHANNEL_USERNAME = "@Pawankumar-py4tk"
-CHANNEL_URL = "https://www.youtube.com/@Pawankumar-py4tk"
-CHANNEL_DESCRIPTION = "Learn Python and AI tools with practical examples and tutorials."
-
-# GenAI Icons for rotating display
-AI_ICONS = ["🤖", "🧠", "💬", "🔮", "📊", "🔍", "⚙️", "💻", "🧩", "🌐", "🚀", "📝"]
-
-def get_ai_icon():
-    """Get a random AI-related emoji"""
-    return random.choice(AI_ICONS)
-
-def display_header():
-    """Display branded header with channel information"""
-    # Channel banner with AI icon
-
-    
-    col1, col2 = st.columns([1, 3])
-    
-    with col2:
-        st.title("📝 YouTube Transcript AI Assistant")
-        st.markdown(f"### Created by [{CHANNEL_NAME} ({CHANNEL_USERNAME})]({CHANNEL_URL})")
-
-def display_ai_features():
-    """Display AI features with nice icons"""
-    st.markdown("## 🧠 AI-Powered Features")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.markdown("""
-        <div class="ai-tool-card">
-            <h3>🔍 Transcript Extraction</h3>
-            <p>AI-powered extraction of YouTube transcripts with support for multiple languages.</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-        <div class="ai-tool-card">
-            <h3>💬 Interactive Chat</h3>
-            <p>Chat with video content using latest LLM technology to understand key points.</p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-        <div class="ai-tool-card">
-            <h3>📊 Content Analysis</h3>
-            <p>Get summaries, insights, and analyze video content efficiently.</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-def display_video_info(video_id):
-    """Display YouTube video thumbnail and embed"""
-    col1, col2 = st.columns([1, 1])
-    
-    with col1:
-        st.image(f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg", 
-                 caption="Video Thumbnail", 
-                 use_container_width =True)
-    
-    with col2:
-        st.write("Video Preview:")
-        st.components.v1.iframe(
-            src=f"https://www.youtube.com/embed/{video_id}",
-            width=400, 
-            height=225,
-            scrolling=False
-        )
-
-def query_ollama(prompt, transcript, history=None):
-    """Query the Ollama API with the transcript as context"""
-    if history is None:
-        history = []
-    
-    # Ensure transcript is properly formatted and not empty
-    if not transcript or transcript.startswith("Error"):
-        return "I don't have access to the transcript. Please extract a valid transcript first."
-    
-    # Simplify the approach: combine prompt and transcript in a single query
-    # This avoids relying on the model to remember the transcript across turns
-    current_query = f"""I want you to answer this question based only on the YouTube transcript provided below.
-    
-Question: {prompt}
-
-Transcript:
-{transcript}
-"""
-
-    try:
-        # Create payload with minimal history
-        messages = []
-        
-        # Only include system message and recent history (limit to 2 previous exchanges)
-        messages.append({
-            "role": "system", 
-            "content": "You are an assistant that answers questions about YouTube video transcripts. Base your answers only on the information in the transcript provided in each query."
-        })
-        
-        # Add limited conversation history if it exists
-        recent_history = history[-4:] if len(history) > 4 else history
-        for msg in recent_history:
-            messages.append({"role": msg["role"], "content": msg["content"]})
-        
-        # Add the current query with embedded transcript
-        messages.append({"role": "user", "content": current_query})
-        
-        # For debugging
-        st.session_state.last_api_request = {
-            "model": OLLAMA_MODEL,
-            "messages_count": len(messages),
-            "current_query_preview": current_query[:100] + "..."
-        }
-        
-        payload = {
-            "model": OLLAMA_MODEL,
-            "messages": messages,
-            "stream": False,
-            # Add parameters to control response
-            "temperature": 0.1,  # Lower temperature for more focused responses
-            "max_tokens": 800    # Limit response length
-        }
-        
-        response = requests.post(
-            OLLAMA_API_URL,
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(payload),
-            timeout=120
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            response_content = result.get("message", {}).get("content", "")
-            
-            # Check for problematic responses
-            problematic_phrases = [
-                "provide the transcript", 
-                "don't see the transcript",
-                "didn't share a transcript",
-                "need the transcript",
-                "share the transcript"
-            ]
-            
-            if any(phrase in response_content.lower() for phrase in problematic_phrases):
-                return "I'm having trouble analyzing the transcript. Let me try a different approach to answer your question about the video content."
-            
-            return response_content
-        else:
-            # Log the error response
-            st.session_state.last_api_error = f"Status code: {response.status_code}, Response: {response.text[:500]}"
-            return f"Error: API returned status code {response.status_code}. Please try again or ask a different question."
-    
-    except Exception as e:
-        st.session_state.last_api_error = str(e)
-        return f"Error communicating with Ollama API. Please try again. Error: {str(e)}"
-
-def chat_interface(transcript):
-    """Display chat interface for interacting with the transcript"""
-    st.markdown(f"""
-    <div class="ai-header">
-        <span class="ai-badge">AI ASSISTANT</span>
-        <span>LLM-powered transcript analysis</span>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.subheader("💬 Chat with the Transcript")
-    st.write("Ask questions about the video content and get answers based on the transcript.")
-    
-    # Initialize chat history in session state
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-    
-    # Add buttons for chat controls with AI icons
-    col1, col2, col3 = st.columns([3, 1, 1])
-    
-    with col2:
-        if st.button("🧹 Clear Chat"):
-            st.session_state.chat_history = []
-            st.rerun()
-    
-    with col3:
-        if st.button("🧠 Quick Analysis"):
-            # Add an AI analysis request to the chat
-            with st.spinner("AI is analyzing the content..."):
-                quick_analysis_prompt = "Give me a quick summary and the main topics of this video based on the transcript."
-                analysis_response = query_ollama(quick_analysis_prompt, transcript, [])
-                
-                # Add to chat history
-                st.session_state.chat_history.append({"role": "user", "content": quick_analysis_prompt})
-                st.session_state.chat_history.append({"role": "assistant", "content": analysis_response})
-                st.rerun()
-    
-    # Display chat messages with AI styling
-    for message in st.session_state.chat_history:
-        if message["role"] == "user":
-            with st.chat_message("user", avatar="👤"):
-                st.write(message["content"])
-        else:
-            with st.chat_message("assistant", avatar="🤖"):
-                st.write(message["content"])
-    
-    # Chat input with AI icon
-    user_query = st.chat_input("🔍 Ask AI about the video content...")
-    
-    if user_query:
-        # Display user message
-        with st.chat_message("user", avatar="👤"):
-            st.write(user_query)
-        
-        # Add to history
-        st.session_state.chat_history.append({"role": "user", "content": user_query})
-        
-        # Get AI response with loading indicator
-        with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("🧠 AI is thinking..."):
-                response = query_ollama(
-                    user_query, 
-                    transcript, 
-                    st.session_state.chat_history[:-1]  # Exclude the current message
-                )
-            st.write(response)
-        
-        # Add to history
-        st.session_state.chat_history.append({"role": "assistant", "content": response})
-
-def display_footer():
-    """Display footer with channel information and links"""
-    st.divider()
-    
-    col1, col2, col3 = st.columns([1, 1, 1])
-    
-    with col1:
-        st.markdown("### About")
-        st.write(f"This tool was created by [{CHANNEL_NAME}]({CHANNEL_URL}) to help you extract and interact with YouTube video transcripts.")
-        st.write(CHANNEL_DESCRIPTION)
-    
-    with col2:
-        st.markdown("### Subscribe")
-        st.markdown(f"""
-        <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">
-            <img src="https://img.shields.io/youtube/channel/subscribers/UC_k33KzNxQ3z3bGLZJBGUaA?style=social" alt="Subscribe to {CHANNEL_NAME}">
-        </a>
-        """, unsafe_allow_html=True)
-        st.write("Subscribe to my channel for more Python and AI tutorials!")
-    
-    with col3:
-        st.markdown("### Other Tools")
-        st.write("Check out my other Python tools and tutorials:")
-        st.markdown(f"[Visit My Channel]({CHANNEL_URL})")
-    
-    # Copyright notice
-    st.caption(f"© {time.strftime('%Y')} {CHANNEL_NAME} | YouTube Transcript Extractor & Chat | Powered by youtube-transcript-api and Ollama LLM")
-
-def main():
-    # Display branded header
-    display_header()
-    
-    st.markdown(f"""
-    <div class="ai-container">
-        <p>{get_ai_icon()} Get the complete transcript of any YouTube video and chat with the content using AI.
-        This tool leverages advanced language models to help you interact with video content.</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Add AI features section
-    display_ai_features()
-    
-    # Add a link to the creator's channel
-    st.markdown(f"""
-    <div style="background-color:black; padding:10px; border-radius:5px; margin-bottom:10px;">
-        <small>❤️ If you find this AI tool useful, please consider <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">subscribing to my YouTube channel</a> for more Python and AI tools.</small>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    tabs = st.tabs(["🔍 Extract Transcript", "🤖 AI Chat", "ℹ️ About"])
-    
-    with tabs[0]:
-        # Input for YouTube URL
-        st.markdown("<h3>🎬 Enter YouTube Video URL</h3>", unsafe_allow_html=True)
-        youtube_url = st.text_input("", 
-                                  placeholder="https://www.youtube.com/watch?v=...",
-                                  key="url_input")
-        
-        col1, col2, col3 = st.columns([2, 1, 1])
-        extract_btn = col1.button("🔍 Extract Transcript", type="primary")
-        demo_btn = col2.button("🎮 Try Demo Video")
-        
-        # Add a button to visit your channel
-        if col3.button("📺 Visit My Channel"):
-            st.markdown(f'<meta http-equiv="refresh" content="0;URL=\'{CHANNEL_URL}\'" />', unsafe_allow_html=True)
-        
-        # Use session state to store transcript
-        if 'transcript' not in st.session_state:
-            st.session_state.transcript = ""
-            st.session_state.video_id = ""
-        
-        # Demo video - use one from your channel if available
-        if demo_btn:
-            youtube_url = "https://youtu.be/5WtVOYh15Nk?si=FzGqfx_U3GIXbP9h"  # You can replace with a video from your channel
-            st.session_state.video_id = extract_video_id(youtube_url)
-            
-            with st.spinner("Extracting transcript..."):
-                st.session_state.transcript = get_best_transcript(youtube_url)
-        
-        # Extract transcript when button is clicked
-        if extract_btn and youtube_url:
-            video_id = extract_video_id(youtube_url)
-            
-            if not video_id:
-                st.error("Invalid YouTube URL. Please check the URL and try again.")
-            else:
-                st.session_state.video_id = video_id
-                with st.spinner("Extracting transcript..."):
-                    st.session_state.transcript = get_best_transcript(youtube_url)
-                    time.sleep(0.5)  # Small delay for better UX
-                # Reset chat history when new transcript is loaded
-                if "chat_history" in st.session_state:
-                    st.session_state.chat_history = []
-        
-        # Display video and transcript if available
-        if st.session_state.video_id:
-            st.divider()
-            display_video_info(st.session_state.video_id)
-            
-            st.divider()
-            st.subheader("Transcript")
-            
-            if st.session_state.transcript.startswith("Error"):
-                st.error(st.session_state.transcript)
-            else:
-                # Add word count
-                word_count = len(st.session_state.transcript.split())
-                st.write(f"**Word count:** {word_count}")
-                
-                # Display transcript in expandable text area
-                with st.expander("View Full Transcript", expanded=True):
-                    st.text_area("", st.session_state.transcript, height=300)
-                
-                # Save to local file option
-                if st.button("Save to local file"):
-                    try:
-                        filepath = save_transcript_to_file(st.session_state.transcript, st.session_state.video_id)
-                        st.success(f"Transcript saved to: {filepath}")
-                    except Exception as e:
-                        st.error(f"Failed to save file: {str(e)}")
-    
-    with tabs[1]:
-        if not st.session_state.transcript or st.session_state.transcript.startswith("Error"):
-            st.info("🔍 Please extract a transcript first to chat with the AI.")
-            
-            # Add a promotional message with AI styling
-            st.markdown(f"""
-            <div class="ai-container">
-                <div class="ai-header">
-                    <span class="ai-badge">TIP</span>
-                </div>
-                <p>While you're here, check out my <a href="{CHANNEL_URL}" target="_blank">YouTube channel</a> for Python and AI tutorials!</p>
-            </div>
-            """, unsafe_allow_html=True)
-        else:
-            chat_interface(st.session_state.transcript)
-    
-    with tabs[2]:
-        st.header(f"About {CHANNEL_NAME}")
-        st.write("""
-        This tool was created to help YouTube viewers extract and interact with video transcripts.
-        It's particularly useful for:
-        
-        - Students who want to study video content
-        - Researchers collecting information from videos
-        - Content creators analyzing other videos
-        - Anyone who prefers reading over watching
-        """)
-        
-        st.subheader("How it works")
-        st.write("""
-        1. Enter a YouTube URL in the "Extract Transcript" tab
-        2. The tool fetches the transcript using YouTube's API
-        3. You can view, download, or chat with the transcript content
-        4. The AI chat functionality helps you understand video content through Q&A
-        """)
-        
-        st.subheader("About the Creator")
-        st.write(f"""
-        [{CHANNEL_NAME}]({CHANNEL_URL}) creates Python tutorials and tools to help make programming and AI more accessible.
-        Subscribe to the channel for more useful tools and tutorials!
-        """)
-        
-        # Subscribe button
-        st.markdown(f"""
-        <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">
-            <button style="background-color:#FF0000; color:white; padding:10px 20px; border:none; border-radius:5px; cursor:pointer;">
-                Subscribe to {CHANNEL_USERNAME}
-            </button>
-        </a>
-        """, unsafe_allow_html=True)
-    
-    # Display footer with branding
-    display_footer()
-
-if __name__ == "__main__":
-    main()
+import streamlit as st
+import pandas as pd
+from youtube import extract_video_id, get_best_transcript_resolution, save_transcript_to_file, get_search_index
+from retrieval import TranscriptIndex, format_context, format_timestamp
+from ollama_client import OllamaClient, OllamaError, describe_usage
+from scheduler import LLMBusy, BACKGROUND, INTERACTIVE
+from response_cache import ResponseCache, transcript_digest
+from summarize import Summarizer, estimate_tokens
+from transcript_format import FORMATS as TRANSCRIPT_FORMATS, SegmentArray
+from api_client import TranscriptService
+from search_index import hit_url
+from metrics import REGISTRY, start_textfile_exporter
+from prompt_budget import PromptBudget, ConversationMemory
+from singleflight import SingleFlight
+from jobs import JobQueue, start_workers
+from transcript_view import TranscriptView
+from transcript_archive import parse_time
+from analytics import get_corpus, build_report, MIN_SILENCE_SECONDS
+from knowledge_store import get_knowledge_store, ask as ask_library, cite
+import base64
+import os
+import time
+import random
+import uuid
+from contextlib import contextmanager
+from functools import partial
+
+# Set page config
+st.set_page_config(
+    page_title="YouTube Transcript Extractor by @Pawankumar-py4tk",
+    page_icon="🤖",
+    layout="wide"
+)
+
+# Add custom CSS for AI styling
+st.markdown("""
+<style>
+    /* AI Chat styling */
+    .ai-badge {
+        background-color: black;
+        color: white;
+        padding: 0.2rem 0.6rem;
+        border-radius: 0.5rem;
+        font-size: 0.8rem;
+        font-weight: bold;
+        margin-right: 0.5rem;
+    }
+    
+    .ai-container {
+        border-left: 4px solid #8B44FF;
+        padding-left: 1rem;
+        margin: 1rem 0;
+    }
+    
+    .ai-header {
+        display: flex;
+        align-items: center;
+        margin-bottom: 0.5rem;
+    }
+    
+    .ai-thinking {
+        color: #8B44FF;
+        font-style: italic;
+    }
+    
+    /* Pulsating AI effect */
+    .ai-pulse {
+        animation: pulse 2s infinite;
+    }
+    
+    @keyframes pulse {
+        0% { opacity: 1; }
+        50% { opacity: 0.5; }
+        100% { opacity: 1; }
+    }
+    
+    /* AI Tool Card */
+    .ai-tool-card {
+        border: 1px solid #f0f0f5;
+        border-radius: 0.5rem;
+        padding: 1rem;
+        margin-bottom: 1rem;
+        background: black;
+    }
+    
+    .ai-tool-card:hover {
+        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
+    }
+    
+    /* Channel branding */
+    .channel-banner {
+        background: linear-gradient(90deg, #FF0000 0%, #FF5500 100%);
+        color: white;
+        padding: 10px;
+        border-radius: 5px;
+        margin-bottom: 10px;
+        text-align: center;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# Ollama endpoints, model, timeout and pool sizes come from the environment
+# (OLLAMA_URLS, OLLAMA_MODEL, OLLAMA_TIMEOUT, ...), see ollama_client.OllamaConfig
+
+# When set (e.g. "http://localhost:8000"), extraction and chat run on the api_server
+# service instead of inside this Streamlit process
+TRANSCRIPT_API_URL = os.environ.get("TRANSCRIPT_API_URL", "")
+
+# Retrieval settings: only the most relevant transcript chunks are sent with a question.
+# Set OLLAMA_EMBED_MODEL (e.g. "nomic-embed-text") to fuse embedding search into BM25.
+OLLAMA_EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "")
+RETRIEVAL_TOP_K = 5
+
+# Most recent chat messages sent verbatim with each question; older ones are summarized
+CHAT_HISTORY_LIMIT = 4
+
+# Send transcripts that fit the context window as a fixed prompt prefix, so Ollama
+# reuses its cache of it for follow-up questions instead of re-reading it each turn
+CHAT_STABLE_PREFIX = os.environ.get("CHAT_STABLE_PREFIX", "1") != "0"
+
+QUICK_ANALYSIS_PROMPT = "Give me a quick summary and the main topics of this video based on the transcript."
+
+# Transcripts longer than this (estimated tokens) are summarized map-reduce style
+SUMMARY_DIRECT_LIMIT = 6000
+SUMMARY_CHUNK_TOKENS = 3000
+SUMMARY_WORKERS = 4
+
+# Extraction and Quick Analysis run as background jobs that survive reruns and disconnects.
+# JOB_WORKERS threads in this process run them; set it to 0 when separate
+# `python jobs.py worker` processes share the JOBS_PATH database.
+BACKGROUND_JOBS = os.environ.get("BACKGROUND_JOBS", "1") != "0"
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_POLL_SECONDS = 1.0
+
+# Matches listed when searching within the transcript viewer
+VIEWER_SEARCH_LIMIT = 20
+
+# Results shown per search in the Search tab
+SEARCH_RESULT_LIMIT = 25
+
+# Rows of the longest-pauses table in the Analytics tab
+ANALYTICS_GAP_ROWS = 50
+
+# Passages retrieved per Library question, and how much of each is shown under the answer
+LIBRARY_TOP_K = 8
+LIBRARY_EXCERPT_CHARS = 200
+
+# Show the metrics panel in the About tab (metrics cover all sessions of this process)
+SHOW_DIAGNOSTICS = os.environ.get("SHOW_DIAGNOSTICS", "") not in ("", "0")
+
+# Channel information
+CHANNEL_NAME = "Pawan Kumar"
+CHANNEL_USERNAME = "@Pawankumar-py4tk"
+CHANNEL_URL = "https://www.youtube.com/@Pawankumar-py4tk"
+CHANNEL_DESCRIPTION = "Learn Python and AI tools with practical examples and tutorials."
+
+# GenAI Icons for rotating display
+AI_ICONS = ["🤖", "🧠", "💬", "🔮", "📊", "🔍", "⚙️", "💻", "🧩", "🌐", "🚀", "📝"]
+
+def get_ai_icon():
+    """Get a random AI-related emoji"""
+    return random.choice(AI_ICONS)
+
+def display_header():
+    """Display branded header with channel information"""
+    # Channel banner with AI icon
+
+    
+    col1, col2 = st.columns([1, 3])
+    
+    with col2:
+        st.title("📝 YouTube Transcript AI Assistant")
+        st.markdown(f"### Created by [{CHANNEL_NAME} ({CHANNEL_USERNAME})]({CHANNEL_URL})")
+
+def display_ai_features():
+    """Display AI features with nice icons"""
+    st.markdown("## 🧠 AI-Powered Features")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown("""
+        <div class="ai-tool-card">
+            <h3>🔍 Transcript Extraction</h3>
+            <p>AI-powered extraction of YouTube transcripts with support for multiple languages.</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown("""
+        <div class="ai-tool-card">
+            <h3>💬 Interactive Chat</h3>
+            <p>Chat with video content using latest LLM technology to understand key points.</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("""
+        <div class="ai-tool-card">
+            <h3>📊 Content Analysis</h3>
+            <p>Get summaries, insights, and analyze video content efficiently.</p>
+        </div>
+        """, unsafe_allow_html=True)
+
+def display_video_info(video_id):
+    """Display YouTube video thumbnail and embed"""
+    col1, col2 = st.columns([1, 1])
+    
+    with col1:
+        st.image(f"https://img.youtube.com/vi/{video_id}/maxresdefault.jpg", 
+                 caption="Video Thumbnail", 
+                 use_container_width =True)
+    
+    with col2:
+        st.write("Video Preview:")
+        st.components.v1.iframe(
+            src=f"https://www.youtube.com/embed/{video_id}",
+            width=400, 
+            height=225,
+            scrolling=False
+        )
+
+@st.cache_resource(show_spinner=False)
+def get_ollama_client():
+    """One pooled keep-alive Ollama client shared by all sessions and reruns"""
+    return OllamaClient.from_env()
+
+@st.cache_resource(show_spinner=False)
+def get_prompt_budget():
+    """Token budget matching the model's configured context window"""
+    return PromptBudget.from_config(get_ollama_client().config, max_history=CHAT_HISTORY_LIMIT)
+
+def llm_flow():
+    """This session's queue in the LLM scheduler, so every session gets its fair share of the model"""
+    if "llm_flow" not in st.session_state:
+        st.session_state.llm_flow = uuid.uuid4().hex
+    return st.session_state.llm_flow
+
+@contextmanager
+def queue_position():
+    """Yield an on_wait callback that shows the request's place in the LLM queue until it starts"""
+    placeholder = st.empty()
+    
+    def on_wait(position):
+        if position:
+            placeholder.info(f"⏳ Waiting for the model: {position} request(s) ahead of yours")
+        else:
+            placeholder.info("⏳ Waiting for the model: yours is next")
+    
+    try:
+        yield on_wait
+    finally:
+        placeholder.empty()
+
+def get_chat_memory():
+    """Rolling summary of this session's older chat turns"""
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
+    return st.session_state.chat_memory
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_transcript_index(video_id, transcript_hash, _segments):
+    """Build (once per video and transcript content) the retrieval index over transcript chunks"""
+    embed = None
+    if OLLAMA_EMBED_MODEL:
+        client = get_ollama_client()
+        embed = lambda texts: client.embed(texts, OLLAMA_EMBED_MODEL)
+    return TranscriptIndex(_segments, embed=embed)
+
+@st.cache_resource(show_spinner=False)
+def get_transcript_service():
+    """Client for the transcript API service, or None to work in-process"""
+    return TranscriptService(TRANSCRIPT_API_URL) if TRANSCRIPT_API_URL else None
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Persistent answer cache shared by all sessions, or None if unavailable"""
+    try:
+        return ResponseCache()
+    except Exception:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Background job queue shared by all sessions, or None to run work in the script run"""
+    if not BACKGROUND_JOBS or get_transcript_service() is not None:
+        # The transcript service already does the work outside this process
+        return None
+    try:
+        queue = JobQueue()
+    except Exception:
+        return None
+    start_workers(queue, JOB_WORKERS)
+    return queue
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight(name):
+    """Coalesces identical work started by concurrent sessions (and, with SINGLEFLIGHT_LOCK_DIR, processes)"""
+    return SingleFlight(name)
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_exporter():
+    """Write metrics to METRICS_TEXTFILE periodically, if configured"""
+    return start_textfile_exporter()
+
+def _response_cache_key(prompt, transcript, history):
+    transcript_hash = st.session_state.get("transcript_hash") or transcript_digest(transcript)
+    # Key on the history that is actually sent: recent turns plus the summary of older ones,
+    # fitted to the same budget build_chat_payload gives them
+    sent_history = get_prompt_budget().sent_history(prompt, history, memory=get_chat_memory(),
+                                                    layout=chat_layout(transcript))
+    return get_ollama_client().model, transcript_hash, prompt, sent_history
+
+def cached_answer(prompt, transcript, history=None):
+    """Return a previously generated answer to the same question, or None"""
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    model, transcript_hash, prompt, history = _response_cache_key(prompt, transcript, history)
+    return cache.get(model, transcript_hash, prompt, history)
+
+def remember_answer(prompt, transcript, history, response):
+    """Store a successful answer so the same question is not generated again"""
+    cache = get_response_cache()
+    failed_prefixes = ("Error", "I don't have access", "I'm having trouble")
+    if cache is None or not response or response.startswith(failed_prefixes):
+        return
+    model, transcript_hash, prompt, history = _response_cache_key(prompt, transcript, history)
+    cache.put(model, transcript_hash, prompt, response, history)
+
+def quick_analysis(transcript):
+    """Answer the Quick Analysis prompt from the cache, or generate and cache the answer"""
+    response = cached_answer(QUICK_ANALYSIS_PROMPT, transcript)
+    if response is None:
+        if get_transcript_service() is None and estimate_tokens(transcript) > SUMMARY_DIRECT_LIMIT:
+            response = summarize_transcript(QUICK_ANALYSIS_PROMPT, transcript)
+        else:
+            response = query_ollama(QUICK_ANALYSIS_PROMPT, transcript, [], priority=BACKGROUND)
+        remember_answer(QUICK_ANALYSIS_PROMPT, transcript, [], response)
+    return response
+
+def summarize_transcript(prompt, transcript):
+    """Answer a summary-style prompt over a long transcript with map-reduce"""
+    client = get_ollama_client()
+    summarizer = Summarizer(
+        partial(client.complete, flow=llm_flow(), priority=BACKGROUND),
+        chunk_tokens=SUMMARY_CHUNK_TOKENS,
+        reduce_tokens=SUMMARY_CHUNK_TOKENS,
+        workers=SUMMARY_WORKERS,
+        cache=get_response_cache(),
+        model=client.model
+    )
+    try:
+        result = summarizer.summarize(transcript, prompt, segments=st.session_state.get("segments"))
+    except LLMBusy as e:
+        return f"Error: {e}"
+    except Exception as e:
+        st.session_state.last_api_error = str(e)
+        return f"Error communicating with Ollama API. Please try again. Error: {str(e)}"
+    st.session_state.last_summary_stats = result.describe()
+    return result.summary
+
+def use_stable_prefix(transcript):
+    """Whether the whole transcript goes into a cacheable prompt prefix instead of excerpts"""
+    return CHAT_STABLE_PREFIX and get_prompt_budget().fits_prefix(transcript)
+
+def chat_layout(transcript, context=None):
+    """Prompt layout of a question about the transcript; see PromptBudget"""
+    # retrieve_context returns no excerpts when the stable prefix is used
+    return "prefix" if context is None and use_stable_prefix(transcript) else "question"
+
+def retrieve_context(question):
+    """Return timestamped transcript excerpts relevant to the question, or None"""
+    segments = st.session_state.get("segments")
+    if not segments or get_transcript_service() is not None:
+        # The transcript service does its own retrieval
+        return None
+    if use_stable_prefix(st.session_state.transcript):
+        # The whole transcript is sent (and cached by Ollama) anyway
+        return None
+    # Keyed by content too, so a transcript changed by refresh.py gets a new index
+    transcript_hash = st.session_state.get("transcript_hash") or transcript_digest(st.session_state.transcript)
+    index = get_transcript_index(st.session_state.video_id, transcript_hash, segments)
+    return format_context(index.search(question, RETRIEVAL_TOP_K))
+
+def build_chat_payload(prompt, transcript, history=None, context=None, stream=False):
+    """Build the /api/chat payload for a question about the transcript"""
+    # The transcript is resent on every turn, so the model never has to remember it.
+    # When it fits, it leads the prompt unchanged from turn to turn (KV cache reuse);
+    # otherwise retrieved excerpts are sent next to the question.
+    # Recent history is sent as is, older turns as a summary, all within num_ctx.
+    plan = get_prompt_budget().build(prompt, context or transcript, history, memory=get_chat_memory(),
+                                     layout=chat_layout(transcript, context))
+    messages = plan.messages
+    
+    # For debugging
+    st.session_state.last_api_request = {
+        "model": get_ollama_client().model,
+        "messages_count": len(messages),
+        "current_query_preview": messages[-1]["content"][:100] + "...",
+        "stream": stream,
+        "budget": plan.breakdown
+    }
+    
+    return {
+        "model": get_ollama_client().model,
+        "messages": messages,
+        "stream": stream
+        # num_ctx, num_predict, temperature and keep_alive come from the client's OllamaConfig
+    }
+
+def query_ollama(prompt, transcript, history=None, context=None, priority=INTERACTIVE):
+    """Query the Ollama API with the transcript (or retrieved excerpts of it) as context"""
+    # Ensure transcript is properly formatted and not empty
+    if not transcript or transcript.startswith("Error"):
+        return "I don't have access to the transcript. Please extract a valid transcript first."
+    
+    try:
+        service = get_transcript_service()
+        if service is not None:
+            # The service builds the prompt itself from its copy of the transcript
+            mode = "answer" if context else "summary"
+            try:
+                return service.chat(st.session_state.video_id, prompt, history, mode=mode, session=llm_flow())
+            except OllamaError as e:
+                st.session_state.last_api_error = str(e)
+                if e.status_code == 503:
+                    return "Error: The model is busy. Please try again in a moment."
+                return f"Error: API returned status code {e.status_code}. Please try again or ask a different question."
+        
+        payload = build_chat_payload(prompt, transcript, history, context)
+        
+        try:
+            with queue_position() as on_wait:
+                result = get_ollama_client().chat(payload, affinity=st.session_state.video_id, flow=llm_flow(),
+                                                  priority=priority, on_wait=on_wait)
+        except LLMBusy as e:
+            return f"Error: {e}"
+        except OllamaError as e:
+            if e.status_code is None:
+                raise
+            # Log the error response
+            st.session_state.last_api_error = str(e)
+            return f"Error: API returned status code {e.status_code}. Please try again or ask a different question."
+        
+        response_content = result.get("message", {}).get("content", "")
+        st.session_state.last_api_request["usage"] = describe_usage(result)
+        
+        # Check for problematic responses
+        problematic_phrases = [
+            "provide the transcript", 
+            "don't see the transcript",
+            "didn't share a transcript",
+            "need the transcript",
+            "share the transcript"
+        ]
+        
+        if any(phrase in response_content.lower() for phrase in problematic_phrases):
+            return "I'm having trouble analyzing the transcript. Let me try a different approach to answer your question about the video content."
+        
+        return response_content
+    
+    except Exception as e:
+        st.session_state.last_api_error = str(e)
+        return f"Error communicating with Ollama API. Please try again. Error: {str(e)}"
+
+def stream_ollama(prompt, transcript, history=None, context=None):
+    """Start a streaming answer; returns a ChatStream, or an error message string"""
+    if not transcript or transcript.startswith("Error"):
+        return "I don't have access to the transcript. Please extract a valid transcript first."
+    
+    try:
+        service = get_transcript_service()
+        if service is not None:
+            st.session_state.last_api_request = {"service": TRANSCRIPT_API_URL, "stream": True}
+            return service.stream(st.session_state.video_id, prompt, history, session=llm_flow())
+        payload = build_chat_payload(prompt, transcript, history, context, stream=True)
+        with queue_position() as on_wait:
+            return get_ollama_client().stream(payload, affinity=st.session_state.video_id, flow=llm_flow(),
+                                              on_wait=on_wait)
+    except LLMBusy as e:
+        return f"Error: {e}"
+    except Exception as e:
+        st.session_state.last_api_error = str(e)
+        return f"Error communicating with Ollama API. Please try again. Error: {str(e)}"
+
+def display_streamed_response(stream):
+    """Render tokens as they arrive; returns (full response text, completed)"""
+    if isinstance(stream, str):
+        st.write(stream)
+        return stream, False
+    
+    completed = False
+    try:
+        st.write_stream(stream)
+        completed = True
+    except Exception as e:
+        st.session_state.last_api_error = str(e)
+        st.error(f"Error while streaming the response: {str(e)}")
+    finally:
+        # Also runs when the user stops the run, closing the connection to Ollama
+        stream.close()
+    
+    usage = describe_usage(stream.stats)
+    if stream.time_to_first_token is not None:
+        caption = f"⚡ First token after {stream.time_to_first_token:.2f}s · {stream.total_time:.1f}s total"
+        st.caption(f"{caption} · {usage}" if usage else caption)
+    st.session_state.last_api_request["time_to_first_token"] = stream.time_to_first_token
+    st.session_state.last_api_request["total_time"] = stream.total_time
+    st.session_state.last_api_request["usage"] = usage
+    return stream.content, completed
+
+def chat_interface(transcript):
+    """Display chat interface for interacting with the transcript"""
+    st.markdown(f"""
+    <div class="ai-header">
+        <span class="ai-badge">AI ASSISTANT</span>
+        <span>LLM-powered transcript analysis</span>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    st.subheader("💬 Chat with the Transcript")
+    st.write("Ask questions about the video content and get answers based on the transcript.")
+    
+    # Initialize chat history in session state
+    if "chat_history" not in st.session_state:
+        st.session_state.chat_history = []
+    
+    # Add buttons for chat controls with AI icons
+    col1, col2, col3 = st.columns([3, 1, 1])
+    
+    with col2:
+        if st.button("🧹 Clear Chat"):
+            st.session_state.chat_history = []
+            st.session_state.analysis_job = None
+            st.rerun()
+    
+    with col3:
+        if st.button("🧠 Quick Analysis"):
+            queue = get_job_queue()
+            if queue is not None and cached_answer(QUICK_ANALYSIS_PROMPT, transcript) is None:
+                # Runs in the background; the answer is added to the chat when the job finishes
+                st.session_state.analysis_job = queue.submit(
+                    "analyze", {"video_id": st.session_state.video_id, "prompt": QUICK_ANALYSIS_PROMPT}
+                )
+                st.session_state.chat_history.append({"role": "user", "content": QUICK_ANALYSIS_PROMPT})
+                st.rerun()
+            
+            # Add an AI analysis request to the chat
+            with st.spinner("AI is analyzing the content..."):
+                # Sessions analyzing the same transcript at the same time wait for one answer
+                key = (get_ollama_client().model, st.session_state.get("transcript_hash") or transcript_digest(transcript))
+                analysis_response, _ = get_single_flight("quick_analysis").do(key, quick_analysis, transcript)
+                
+                # Add to chat history
+                st.session_state.chat_history.append({"role": "user", "content": QUICK_ANALYSIS_PROMPT})
+                st.session_state.chat_history.append({"role": "assistant", "content": analysis_response})
+                st.rerun()
+    
+    if st.session_state.get("last_summary_stats"):
+        st.caption(f"📊 Last summary: {st.session_state.last_summary_stats}")
+    
+    # Display chat messages with AI styling
+    for message in st.session_state.chat_history:
+        if message["role"] == "user":
+            with st.chat_message("user", avatar="👤"):
+                st.write(message["content"])
+        else:
+            with st.chat_message("assistant", avatar="🤖"):
+                st.write(message["content"])
+    
+    if st.session_state.get("analysis_job"):
+        with st.chat_message("assistant", avatar="🤖"):
+            analysis_progress()
+    
+    # Chat input with AI icon
+    user_query = st.chat_input("🔍 Ask AI about the video content...")
+    
+    if user_query:
+        # Display user message
+        with st.chat_message("user", avatar="👤"):
+            st.write(user_query)
+        
+        # Add to history
+        st.session_state.chat_history.append({"role": "user", "content": user_query})
+        
+        history = st.session_state.chat_history[:-1]  # Exclude the current message
+        
+        # Repeated questions are answered from the cache, new ones streamed token by token
+        with st.chat_message("assistant", avatar="🤖"):
+            response = cached_answer(user_query, transcript, history)
+            if response is not None:
+                st.write(response)
+                st.caption("⚡ Answered from cache")
+            else:
+                with st.spinner("🧠 AI is thinking..."):
+                    stream = stream_ollama(
+                        user_query, 
+                        transcript, 
+                        history,
+                        context=retrieve_context(user_query)
+                    )
+                response, completed = display_streamed_response(stream)
+                if completed:
+                    remember_answer(user_query, transcript, history, response)
+        
+        # Add to history
+        st.session_state.chat_history.append({"role": "assistant", "content": response})
+
+def display_footer():
+    """Display footer with channel information and links"""
+    st.divider()
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    
+    with col1:
+        st.markdown("### About")
+        st.write(f"This tool was created by [{CHANNEL_NAME}]({CHANNEL_URL}) to help you extract and interact with YouTube video transcripts.")
+        st.write(CHANNEL_DESCRIPTION)
+    
+    with col2:
+        st.markdown("### Subscribe")
+        st.markdown(f"""
+        <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">
+            <img src="https://img.shields.io/youtube/channel/subscribers/UC_k33KzNxQ3z3bGLZJBGUaA?style=social" alt="Subscribe to {CHANNEL_NAME}">
+        </a>
+        """, unsafe_allow_html=True)
+        st.write("Subscribe to my channel for more Python and AI tutorials!")
+    
+    with col3:
+        st.markdown("### Other Tools")
+        st.write("Check out my other Python tools and tutorials:")
+        st.markdown(f"[Visit My Channel]({CHANNEL_URL})")
+    
+    # Copyright notice
+    st.caption(f"© {time.strftime('%Y')} {CHANNEL_NAME} | YouTube Transcript Extractor & Chat | Powered by youtube-transcript-api and Ollama LLM")
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_transcript_view(transcript_hash, _transcript, _segments):
+    """Pages and stats of a transcript, built once per transcript"""
+    return TranscriptView(_transcript, _segments)
+
+def current_transcript_view():
+    return get_transcript_view(st.session_state.transcript_hash, st.session_state.transcript,
+                               st.session_state.segments)
+
+def go_to_page(page):
+    st.session_state.viewer_page = page
+
+def jump_to_time():
+    """Show the page playing at the time typed into the viewer"""
+    value = st.session_state.viewer_time.strip()
+    st.session_state.viewer_time_error = ""
+    if not value:
+        return
+    try:
+        st.session_state.viewer_page = current_transcript_view().page_at(parse_time(value))
+    except ValueError:
+        st.session_state.viewer_time_error = f"Could not read {value!r} as a time, e.g. 12:30 or 1:02:03"
+
+@st.fragment
+def transcript_viewer():
+    """One page of the transcript; paging, jumping and searching only rerun this fragment"""
+    view = current_transcript_view()
+    search_col, time_col, page_col = st.columns([3, 1, 1])
+    query = search_col.text_input("Search in transcript", key="viewer_search",
+                                  placeholder="🔍 Search in transcript...", label_visibility="collapsed")
+    if view.timed:
+        time_col.text_input("Jump to time", key="viewer_time", placeholder="⏱ Jump to m:ss",
+                            label_visibility="collapsed", on_change=jump_to_time)
+    page = page_col.number_input("Page", min_value=1, max_value=view.pages, key="viewer_page",
+                                 label_visibility="collapsed")
+    if st.session_state.get("viewer_time_error"):
+        st.warning(st.session_state.viewer_time_error)
+    
+    if query:
+        hits = view.search(query, VIEWER_SEARCH_LIMIT)
+        more = "+" if len(hits) == VIEWER_SEARCH_LIMIT else ""
+        st.caption(f"{len(hits)}{more} segment(s) match")
+        for hit in hits:
+            where = format_timestamp(hit["start"]) if hit["start"] is not None else f"page {hit['page']}"
+            snippet = hit["text"] if len(hit["text"]) <= 90 else hit["text"][:90] + "…"
+            st.button(f"{where} · {snippet}", key=f"viewer_hit_{hit['index']}", on_click=go_to_page,
+                      args=(hit["page"],))
+    
+    # Only the visible page is sent to the browser
+    st.text(view.render_page(page))
+    time_range = view.time_range(page)
+    where = f" · {format_timestamp(time_range[0])}–{format_timestamp(time_range[1])}" if time_range else ""
+    st.caption(f"Page {page} of {view.pages}{where}")
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def render_transcript(transcript_hash, _segments, fmt):
+    """Render the transcript in a download format, once per transcript and format"""
+    return SegmentArray.from_segments(_segments).render(fmt)
+
+def search_interface():
+    """Search every saved transcript and link each hit to its moment in the video"""
+    st.markdown("<h3>🔎 Search Saved Transcripts</h3>", unsafe_allow_html=True)
+    index = get_search_index()
+    if index is None:
+        st.error("The search index could not be opened.")
+        return
+    stats = index.stats()
+    st.caption(f"{stats['videos']} transcripts indexed. Transcripts are added when you save them to a local file.")
+    
+    query = st.text_input("Search", placeholder="Words or phrases spoken in any saved video...",
+                          key="search_query", label_visibility="collapsed")
+    if not query:
+        return
+    
+    started = time.perf_counter()
+    hits = index.search(query, limit=SEARCH_RESULT_LIMIT)
+    elapsed = (time.perf_counter() - started) * 1000
+    st.caption(f"{len(hits)} result(s) in {elapsed:.1f} ms")
+    for hit in hits:
+        when = format_timestamp(hit["start"]) if hit["start"] is not None else "--:--"
+        st.markdown(f"[`{hit['video_id']}` @ {when}]({hit_url(hit)}) — {hit['snippet']}")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def corpus_report(version, name, _segments, **params):
+    """Compute an analytics report once per corpus version and parameters"""
+    return build_report(_segments, name, **params)
+
+@st.fragment
+def analytics_interface():
+    """Aggregate reports over every archived transcript"""
+    st.markdown("<h3>📊 Corpus Analytics</h3>", unsafe_allow_html=True)
+    corpus = get_corpus()
+    if corpus is None:
+        st.error("Analytics needs the transcript archive (TRANSCRIPT_ARCHIVE_DIR) and the pyarrow package.")
+        return
+    # Only new and changed transcripts are read, so refreshing a large corpus is cheap
+    if st.button("🔄 Refresh", key="analytics_refresh") or corpus.segments is None:
+        corpus.refresh()
+    changes = corpus.last_refresh
+    st.caption(f"Refreshed {time.strftime('%H:%M:%S', time.localtime(changes['refreshed_at']))}: "
+               f"{changes['added']} added, {changes['updated']} updated, {changes['removed']} removed "
+               f"in {changes['seconds'] * 1000:.0f} ms. Transcripts are added when you save them to a local file.")
+    segments = corpus.segments
+    if segments.empty:
+        st.info("No archived transcripts yet. Save a transcript, or run `python transcript_archive.py import`.")
+        return
+    
+    stats = corpus.stats()
+    columns = st.columns(4)
+    columns[0].metric("Videos", stats["videos"])
+    columns[1].metric("Hours", f"{stats['hours']:.1f}")
+    columns[2].metric("Words", f"{stats['words']:,}")
+    columns[3].metric("Languages", stats["languages"])
+    
+    def report(name, **params):
+        return corpus_report(corpus.version, name, segments, **params)
+    
+    st.subheader("Languages")
+    coverage = report("languages")
+    st.bar_chart(coverage[["manual", "generated"]])
+    st.dataframe(coverage, use_container_width=True,
+                 column_config={"share": st.column_config.ProgressColumn("share", min_value=0, max_value=1)})
+    
+    st.subheader("Speaking rate")
+    st.dataframe(report("wpm").round(1), use_container_width=True)
+    
+    st.subheader("Silence")
+    min_gap = st.slider("Shortest pause (seconds)", 0.5, 30.0, MIN_SILENCE_SECONDS, 0.5, key="analytics_min_gap")
+    st.dataframe(report("silence", min_gap=min_gap).round(3), use_container_width=True)
+    gaps = report("gaps", min_gap=min_gap, limit=ANALYTICS_GAP_ROWS)
+    if not gaps.empty:
+        st.caption("Longest pauses")
+        gaps = gaps.assign(link=[hit_url({"video_id": video_id, "start": at})
+                                 for video_id, at in zip(gaps["video_id"], gaps["at"])])
+        st.dataframe(gaps, hide_index=True, use_container_width=True,
+                     column_config={"link": st.column_config.LinkColumn("link", display_text="Open")})
+    
+    st.subheader("Keywords over time")
+    default_terms = ", ".join(report("terms", limit=3).index)
+    keywords = st.text_input("Keywords or phrases, comma-separated", value=default_terms, key="analytics_keywords")
+    keyword_col, bucket_col = st.columns([2, 1])
+    per_thousand = keyword_col.checkbox("Per 1,000 words", key="analytics_per_thousand")
+    bucket = bucket_col.selectbox("Bucket (minutes)", [1, 5, 10], key="analytics_bucket")
+    keywords = tuple(keyword.strip() for keyword in keywords.split(",") if keyword.strip())
+    if keywords:
+        timeline = report("keywords", keywords=keywords, bucket_minutes=bucket, per_thousand_words=per_thousand)
+        st.line_chart(timeline, x_label="Minute of the video")
+
+@st.fragment
+def library_interface():
+    """Answer questions across every archived transcript, citing videos and timestamps"""
+    st.markdown("<h3>📚 Ask the Library</h3>", unsafe_allow_html=True)
+    knowledge = get_knowledge_store(get_ollama_client())
+    if knowledge is None:
+        st.error("The library needs the transcript archive (TRANSCRIPT_ARCHIVE_DIR) and the numpy package.")
+        return
+    # Only new and changed transcripts are embedded. The first visit refreshes automatically; after a
+    # failure (e.g. the embedding model is unreachable) only the button retries, not every rerun
+    refresh = st.button("🔄 Refresh", key="library_refresh")
+    if refresh or (knowledge.last_refresh is None and "library_refresh_error" not in st.session_state):
+        progress = st.progress(0.0, text="Embedding new transcripts...")
+        try:
+            knowledge.refresh(progress=lambda done, total: progress.progress(
+                done / total, text=f"Embedded {done}/{total} new or changed videos"))
+            st.session_state.pop("library_refresh_error", None)
+        except Exception as e:
+            st.session_state.library_refresh_error = str(e)
+        progress.empty()
+    if "library_refresh_error" in st.session_state:
+        st.error(f"Could not embed the transcripts: {st.session_state.library_refresh_error}")
+    stats = knowledge.stats()
+    if knowledge.last_refresh is not None:
+        changes = knowledge.last_refresh
+        st.caption(f"{stats['videos']} videos, {stats['chunks']:,} passages ({stats['model']} embeddings). "
+                   f"Last refresh {time.strftime('%H:%M:%S', time.localtime(changes['refreshed_at']))}: "
+                   f"{changes['added']} added, {changes['updated']} updated, {changes['removed']} removed.")
+    if not stats["chunks"]:
+        st.info("No archived transcripts yet. Save transcripts to a local file, then refresh.")
+        return
+    
+    question = st.text_input("Ask a question about all saved videos", key="library_question")
+    videos = st.multiselect("Only these videos (optional)", knowledge.video_ids(), key="library_videos")
+    if st.button("🧠 Ask", key="library_ask") and question:
+        try:
+            with st.spinner("🧠 Searching the library and asking the AI..."), queue_position() as on_wait:
+                answer, hits = ask_library(knowledge, get_ollama_client(), question, k=LIBRARY_TOP_K,
+                                           video_ids=videos or None, flow=llm_flow(), on_wait=on_wait)
+        except LLMBusy as e:
+            answer, hits = f"Error: {e}", []
+        except Exception as e:
+            st.session_state.last_api_error = str(e)
+            answer, hits = f"Error communicating with Ollama API. Please try again. Error: {str(e)}", []
+        st.session_state.library_answer = {"question": question, "answer": answer, "hits": hits}
+    
+    result = st.session_state.get("library_answer")
+    if result:
+        with st.chat_message("user", avatar="👤"):
+            st.write(result["question"])
+        with st.chat_message("assistant", avatar="🤖"):
+            st.write(result["answer"])
+            for n, hit in enumerate(result["hits"], 1):
+                st.markdown(f"[{n}] [`{cite(hit)}`]({hit_url(hit)}) — {hit['text'][:LIBRARY_EXCERPT_CHARS]}…")
+
+def display_diagnostics():
+    """Latency, size, token and cache metrics collected by this process"""
+    with st.expander("📈 Diagnostics", expanded=False):
+        rows = REGISTRY.rows()
+        if not rows:
+            st.info("No metrics recorded yet.")
+        else:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if st.session_state.get("last_api_request"):
+            st.caption("Last LLM request")
+            st.json(st.session_state.last_api_request)
+        st.download_button("⬇️ Prometheus metrics", REGISTRY.render(), file_name="metrics.prom", mime="text/plain")
+
+def store_transcript(transcript, source="", segments=None, language_code=None, is_generated=False):
+    """Make a transcript (or an "Error: ..." message) the current one"""
+    st.session_state.transcript = transcript
+    st.session_state.transcript_source = source
+    st.session_state.segments = segments or []
+    st.session_state.transcript_track = (language_code, is_generated)
+    st.session_state.transcript_hash = transcript_digest(transcript)
+    # Stats are computed here once instead of on every rerun; the viewer starts on page 1
+    usable = transcript and not transcript.startswith("Error")
+    st.session_state.transcript_stats = current_transcript_view().stats if usable else {}
+    st.session_state.pop("viewer_page", None)
+
+def load_transcript(youtube_url):
+    """Resolve the best transcript for a URL into session state"""
+    service = get_transcript_service()
+    if service is not None:
+        resolution = service.resolve(youtube_url)
+    else:
+        resolution = get_best_transcript_resolution(youtube_url)
+    if isinstance(resolution, str):
+        store_transcript(resolution)
+    else:
+        store_transcript(resolution.text, resolution.describe(), resolution.segments,
+                         resolution.language_code, resolution.is_generated)
+
+def start_extraction(youtube_url):
+    """Load the transcript for a URL: as a background job when available, otherwise right away"""
+    queue = get_job_queue()
+    if queue is None:
+        with st.spinner("Extracting transcript..."):
+            load_transcript(youtube_url)
+        return
+    store_transcript("")
+    st.session_state.extract_job = queue.submit("extract", {"url": youtube_url})
+
+def poll_job(name):
+    """Return the job stored in session state under `name`, or None (clearing it) once it is gone"""
+    job_id = st.session_state.get(name)
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None:
+        st.session_state[name] = None
+    return job
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def extraction_progress():
+    """Show the extraction job's progress; reruns the app when the transcript is ready"""
+    job = poll_job("extract_job")
+    if job is None:
+        store_transcript("Error: The extraction job was lost. Please try again.")
+    elif job["status"] == "done":
+        result = job["result"]
+        store_transcript(result["transcript"], result["source"], result["segments"],
+                         result.get("language_code"), result.get("is_generated", False))
+    elif job["status"] == "failed":
+        store_transcript(job["error"])
+    else:
+        st.progress(job["progress"], text=job["message"] or "Waiting for a worker...")
+        return
+    st.session_state.extract_job = None
+    st.rerun()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def analysis_progress():
+    """Show the Quick Analysis job's progress; adds the answer to the chat when it is done"""
+    job = poll_job("analysis_job")
+    if job is None:
+        response = "Error: The analysis job was lost. Please try again."
+    elif job["status"] == "done":
+        response = job["result"]["response"]
+        if job["result"].get("summary_stats"):
+            st.session_state.last_summary_stats = job["result"]["summary_stats"]
+    elif job["status"] == "failed":
+        response = f"Error communicating with Ollama API. Please try again. {job['error']}"
+    else:
+        st.progress(job["progress"], text=job["message"] or "Waiting for a worker...")
+        return
+    st.session_state.chat_history.append({"role": "assistant", "content": response})
+    st.session_state.analysis_job = None
+    st.rerun()
+
+def main():
+    get_metrics_exporter()
+    
+    # Display branded header
+    display_header()
+    
+    st.markdown(f"""
+    <div class="ai-container">
+        <p>{get_ai_icon()} Get the complete transcript of any YouTube video and chat with the content using AI.
+        This tool leverages advanced language models to help you interact with video content.</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Add AI features section
+    display_ai_features()
+    
+    # Add a link to the creator's channel
+    st.markdown(f"""
+    <div style="background-color:black; padding:10px; border-radius:5px; margin-bottom:10px;">
+        <small>❤️ If you find this AI tool useful, please consider <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">subscribing to my YouTube channel</a> for more Python and AI tools.</small>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    tabs = st.tabs(["🔍 Extract Transcript", "🤖 AI Chat", "🔎 Search", "📚 Library", "📊 Analytics", "ℹ️ About"])
+    
+    with tabs[0]:
+        # Input for YouTube URL
+        st.markdown("<h3>🎬 Enter YouTube Video URL</h3>", unsafe_allow_html=True)
+        youtube_url = st.text_input("", 
+                                  placeholder="https://www.youtube.com/watch?v=...",
+                                  key="url_input")
+        
+        col1, col2, col3 = st.columns([2, 1, 1])
+        extract_btn = col1.button("🔍 Extract Transcript", type="primary")
+        demo_btn = col2.button("🎮 Try Demo Video")
+        
+        # Add a button to visit your channel
+        if col3.button("📺 Visit My Channel"):
+            st.markdown(f'<meta http-equiv="refresh" content="0;URL=\'{CHANNEL_URL}\'" />', unsafe_allow_html=True)
+        
+        # Use session state to store transcript
+        if 'transcript' not in st.session_state:
+            st.session_state.transcript = ""
+            st.session_state.video_id = ""
+            st.session_state.transcript_source = ""
+            st.session_state.segments = []
+        
+        # Demo video - use one from your channel if available
+        if demo_btn:
+            youtube_url = "https://youtu.be/5WtVOYh15Nk?si=FzGqfx_U3GIXbP9h"  # You can replace with a video from your channel
+            st.session_state.video_id = extract_video_id(youtube_url)
+            start_extraction(youtube_url)
+        
+        # Extract transcript when button is clicked
+        if extract_btn and youtube_url:
+            video_id = extract_video_id(youtube_url)
+            
+            if not video_id:
+                st.error("Invalid YouTube URL. Please check the URL and try again.")
+            else:
+                st.session_state.video_id = video_id
+                start_extraction(youtube_url)
+                # Reset chat history when new transcript is loaded
+                if "chat_history" in st.session_state:
+                    st.session_state.chat_history = []
+                st.session_state.analysis_job = None
+        
+        # Display video and transcript if available
+        if st.session_state.video_id:
+            st.divider()
+            display_video_info(st.session_state.video_id)
+            
+            st.divider()
+            st.subheader("Transcript")
+            
+            if st.session_state.get("extract_job"):
+                extraction_progress()
+            elif st.session_state.transcript.startswith("Error"):
+                st.error(st.session_state.transcript)
+            else:
+                # Add word count
+                stats = st.session_state.get("transcript_stats") or current_transcript_view().stats
+                st.write(f"**Word count:** {stats['words']}")
+                if st.session_state.transcript_source:
+                    st.caption(f"Transcript track: {st.session_state.transcript_source}")
+                
+                # Display the transcript page by page; the download below has all of it
+                with st.expander("View Transcript", expanded=True):
+                    transcript_viewer()
+                
+                # Download with timestamps in a subtitle or data format
+                if st.session_state.segments:
+                    fmt_col, download_col = st.columns([1, 3])
+                    fmt = fmt_col.selectbox("Format", list(TRANSCRIPT_FORMATS), label_visibility="collapsed")
+                    extension, mime, _ = TRANSCRIPT_FORMATS[fmt]
+                    download_col.download_button(
+                        f"⬇️ Download .{extension}",
+                        render_transcript(st.session_state.transcript_hash, st.session_state.segments, fmt),
+                        file_name=f"{st.session_state.video_id}_transcript.{extension}",
+                        mime=mime
+                    )
+                
+                # Save to local file option
+                if st.button("Save to local file"):
+                    try:
+                        filepath = save_transcript_to_file(
+                            st.session_state.transcript, st.session_state.video_id, st.session_state.segments,
+                            *st.session_state.get("transcript_track", (None, False))
+                        )
+                        st.success(f"Transcript saved to: {filepath}")
+                    except Exception as e:
+                        st.error(f"Failed to save file: {str(e)}")
+    
+    with tabs[1]:
+        if not st.session_state.transcript or st.session_state.transcript.startswith("Error"):
+            st.info("🔍 Please extract a transcript first to chat with the AI.")
+            
+            # Add a promotional message with AI styling
+            st.markdown(f"""
+            <div class="ai-container">
+                <div class="ai-header">
+                    <span class="ai-badge">TIP</span>
+                </div>
+                <p>While you're here, check out my <a href="{CHANNEL_URL}" target="_blank">YouTube channel</a> for Python and AI tutorials!</p>
+            </div>
+            """, unsafe_allow_html=True)
+        else:
+            chat_interface(st.session_state.transcript)
+    
+    with tabs[2]:
+        search_interface()
+    
+    with tabs[3]:
+        library_interface()
+    
+    with tabs[4]:
+        analytics_interface()
+    
+    with tabs[5]:
+        st.header(f"About {CHANNEL_NAME}")
+        st.write("""
+        This tool was created to help YouTube viewers extract and interact with video transcripts.
+        It's particularly useful for:
+        
+        - Students who want to study video content
+        - Researchers collecting information from videos
+        - Content creators analyzing other videos
+        - Anyone who prefers reading over watching
+        """)
+        
+        st.subheader("How it works")
+        st.write("""
+        1. Enter a YouTube URL in the "Extract Transcript" tab
+        2. The tool fetches the transcript using YouTube's API
+        3. You can view, download, or chat with the transcript content
+        4. The AI chat functionality helps you understand video content through Q&A
+        """)
+        
+        st.subheader("About the Creator")
+        st.write(f"""
+        [{CHANNEL_NAME}]({CHANNEL_URL}) creates Python tutorials and tools to help make programming and AI more accessible.
+        Subscribe to the channel for more useful tools and tutorials!
+        """)
+        
+        # Subscribe button
+        st.markdown(f"""
+        <a href="{CHANNEL_URL}?sub_confirmation=1" target="_blank">
+            <button style="background-color:#FF0000; color:white; padding:10px 20px; border:none; border-radius:5px; cursor:pointer;">
+                Subscribe to {CHANNEL_USERNAME}
+            </button>
+        </a>
+        """, unsafe_allow_html=True)
+        
+        if SHOW_DIAGNOSTICS:
+            display_diagnostics()
+    
+    # Display footer with branding
+    display_footer()
+
+if __name__ == "__main__":
+    main()
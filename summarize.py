@@ -0,0 +1,169 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import SUMMARY_STAGE_SECONDS
+from response_cache import transcript_digest
+from retrieval import chunk_segments, format_timestamp
+
+MAP_PROMPT = """Summarize the following part of a YouTube video transcript ({start} - {end}).
+Keep the key points, names, numbers and the timestamps of important moments.
+
+Transcript part:
+{text}
+"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of one YouTube video.
+Combine them into a single summary that keeps the key points in order.
+
+{text}
+"""
+
+FINAL_PROMPT = """{instruction}
+
+The following are summaries of consecutive parts of the video, in order:
+
+{text}
+"""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def split_text(text, max_tokens):
+    """Split plain text into word-boundary pieces of roughly `max_tokens` tokens."""
+    words = text.split()
+    step = max(1, int(max_tokens * 0.75))  # roughly 0.75 words per token
+    return [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+
+
+class SummaryResult:
+    """Final summary plus how it was produced."""
+
+    def __init__(self, summary, chunks, cached_chunks, reduce_rounds, timings):
+        self.summary = summary
+        self.chunks = chunks
+        self.cached_chunks = cached_chunks
+        self.reduce_rounds = reduce_rounds
+        self.timings = timings
+
+    def describe(self):
+        t = self.timings
+        return (f"{self.chunks} chunks ({self.cached_chunks} cached), {self.reduce_rounds} reduce round(s): "
+                f"map {t['map']:.1f}s, reduce {t['reduce']:.1f}s, total {t['total']:.1f}s")
+
+
+class Summarizer:
+    """Map-reduce summarization of long transcripts.
+
+    `complete` takes a prompt string and returns the model's answer. The
+    transcript is split into chunks of about `chunk_tokens` tokens which are
+    summarized in parallel by up to `workers` threads (map); the partial
+    summaries are then combined in groups that fit `reduce_tokens` until one
+    remains (reduce). Chunk summaries are stored in `cache` (a ResponseCache)
+    so changing only the final instruction redoes just the reduce step.
+    """
+
+    # Stop combining after this many rounds even if the summaries do not shrink
+    MAX_REDUCE_ROUNDS = 5
+
+    def __init__(self, complete, chunk_tokens=3000, reduce_tokens=3000, workers=4, cache=None, model=""):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.workers = workers
+        self.cache = cache
+        self.model = model
+
+    def split(self, transcript, segments=None):
+        """Return the chunks to summarize as dicts with `text`, `start` and `end`."""
+        if segments:
+            return chunk_segments(segments, max_words=int(self.chunk_tokens * 0.75), overlap_words=0)
+        return [{"text": text, "start": None, "end": None} for text in split_text(transcript, self.chunk_tokens)]
+
+    def _map_prompt(self, chunk):
+        if chunk["start"] is None:
+            start, end = "?", "?"
+        else:
+            start, end = format_timestamp(chunk["start"]), format_timestamp(chunk["end"])
+        return MAP_PROMPT.format(start=start, end=end, text=chunk["text"])
+
+    def _summarize_chunk(self, chunk):
+        """Return (summary, served_from_cache) for one chunk."""
+        prompt = self._map_prompt(chunk)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, transcript_digest(chunk["text"]), prompt)
+            if cached is not None:
+                return cached, True
+        summary = self.complete(prompt)
+        if self.cache is not None:
+            self.cache.put(self.model, transcript_digest(chunk["text"]), prompt, summary)
+        return summary, False
+
+    def _group(self, summaries):
+        """Pack consecutive summaries into groups that fit the reduce budget."""
+        groups, current, size = [], [], 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if current and size + tokens > self.reduce_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(summary)
+            size += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    def summarize(self, transcript, instruction, segments=None, progress=None):
+        """Summarize a transcript according to `instruction`; returns a SummaryResult.
+
+        `progress`, if given, is called with the fraction of chunks summarized so far.
+        """
+        started = time.perf_counter()
+        timings = {"split": 0.0, "map": 0.0, "reduce": 0.0}
+
+        chunks = self.split(transcript, segments)
+        timings["split"] = time.perf_counter() - started
+
+        # Short transcripts need no map-reduce at all
+        if len(chunks) <= 1:
+            t = time.perf_counter()
+            summary = self.complete(f"{instruction}\n\nTranscript:\n{transcript}")
+            timings["reduce"] = time.perf_counter() - t
+            timings["total"] = time.perf_counter() - started
+            return self._result(summary, len(chunks), 0, 0, timings)
+
+        t = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            mapped = []
+            for result in executor.map(self._summarize_chunk, chunks):
+                mapped.append(result)
+                if progress is not None:
+                    progress(len(mapped) / len(chunks))
+        timings["map"] = time.perf_counter() - t
+        summaries = [summary for summary, _ in mapped]
+        cached_chunks = sum(1 for _, cached in mapped if cached)
+
+        t = time.perf_counter()
+        rounds = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Combine intermediate summaries until everything fits one final prompt
+            while True:
+                groups = self._group(summaries)
+                if len(groups) == 1 or rounds >= self.MAX_REDUCE_ROUNDS:
+                    break
+                rounds += 1
+                prompts = [REDUCE_PROMPT.format(text="\n\n".join(group)) for group in groups]
+                summaries = list(executor.map(self.complete, prompts))
+        rounds += 1
+        summary = self.complete(FINAL_PROMPT.format(instruction=instruction, text="\n\n".join(summaries)))
+        timings["reduce"] = time.perf_counter() - t
+        timings["total"] = time.perf_counter() - started
+
+        return self._result(summary, len(chunks), cached_chunks, rounds, timings)
+
+    def _result(self, summary, chunks, cached_chunks, rounds, timings):
+        for stage, seconds in timings.items():
+            SUMMARY_STAGE_SECONDS.observe(seconds, stage=stage)
+        return SummaryResult(summary, chunks, cached_chunks, rounds, timings)
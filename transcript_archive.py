@@ -0,0 +1,341 @@
+"""Compressed, timestamp-preserving transcript archive with random access.
+
+Each video is stored in one `<video_id>.yta` file:
+
+    header     magic, codec, flags, segment and block counts, language code
+    starts     uint32 start time of every segment in milliseconds  (columnar)
+    durations  uint32 duration of every segment in milliseconds
+    blocks     index of the first segment, file offset and length of each block
+    data       compressed blocks of BLOCK_SEGMENTS segment texts each
+
+Files are read through mmap: the timestamp columns are searched in place and
+only the blocks holding the requested segments are decompressed, so reading
+"12:00 to 15:00" of a 10-hour video touches a few kilobytes. Blocks are
+compressed with zstd (`zstandard`, listed in requirements.txt), or zlib
+where it is missing; the codec is recorded per file.
+"""
+import argparse
+import glob
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from retrieval import format_timestamp
+from transcript_format import SegmentArray, to_plain_text
+
+DEFAULT_ARCHIVE_DIR = os.environ.get(
+    "TRANSCRIPT_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_archive")
+)
+
+MAGIC = b"YTA1"
+HEADER = struct.Struct("<4sBBHII")  # magic, codec, flags, language length, segments, blocks
+CODEC_ZLIB, CODEC_ZSTD = 0, 1
+FLAG_GENERATED, FLAG_UNTIMED = 1, 2
+
+# Segments per compressed block: about 8 minutes of a typical video
+BLOCK_SEGMENTS = 256
+# Decompressed blocks kept per open archive
+CACHED_BLOCKS = 8
+# Words per pseudo-segment when importing transcripts without timestamps
+UNTIMED_SEGMENT_WORDS = 60
+
+SEPARATOR = "\0"
+
+
+def _compress(data, codec):
+    if codec == CODEC_ZSTD:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(data, codec):
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("This archive is zstd compressed; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _column(typecode, values):
+    column = array(typecode, values)
+    if sys.byteorder == "big":
+        column.byteswap()  # The format is little-endian
+    return column.tobytes()
+
+
+def _pad(out):
+    out.write(b"\0" * (-out.tell() % 8))
+
+
+def write_archive(path, segments, language_code="", is_generated=False, codec=None,
+                  block_segments=BLOCK_SEGMENTS):
+    """Write segment dicts (`text`, `start`, `duration`) to an archive file.
+
+    Segments without a start time are stored untimed. The file is written
+    next to `path` and renamed into place, so readers never see a partial one.
+    """
+    if codec is None:
+        codec = CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+    texts = [segment["text"].replace(SEPARATOR, " ") for segment in segments]
+    untimed = any(segment.get("start") is None for segment in segments)
+    if untimed:
+        starts = durations = [0] * len(segments)
+    else:
+        starts = [int(round(segment["start"] * 1000)) for segment in segments]
+        durations = [int(round((segment.get("duration") or 0) * 1000)) for segment in segments]
+    flags = (FLAG_GENERATED if is_generated else 0) | (FLAG_UNTIMED if untimed else 0)
+    language = (language_code or "").encode("utf-8")
+    blocks = [_compress(SEPARATOR.join(texts[i:i + block_segments]).encode("utf-8"), codec)
+              for i in range(0, len(texts), block_segments)]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, codec, flags, len(language), len(segments), len(blocks)))
+        out.write(language)
+        _pad(out)
+        out.write(_column("I", starts))
+        _pad(out)
+        out.write(_column("I", durations))
+        _pad(out)
+        out.write(_column("I", range(0, len(texts), block_segments)))
+        _pad(out)
+        # Block offsets are only known once the table itself has been laid out
+        offset = out.tell() + 8 * len(blocks) + 4 * len(blocks)
+        offset += -offset % 8
+        offsets = []
+        for block in blocks:
+            offsets.append(offset)
+            offset += len(block)
+        out.write(_column("Q", offsets))
+        out.write(_column("I", (len(block) for block in blocks)))
+        _pad(out)
+        for block in blocks:
+            out.write(block)
+    os.replace(tmp_path, path)
+    return path
+
+
+class TranscriptArchive:
+    """Read-only, memory-mapped view of one archive file."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.codec, flags, language_length, count, block_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a transcript archive")
+        self.is_generated = bool(flags & FLAG_GENERATED)
+        self.timed = not flags & FLAG_UNTIMED
+        position = HEADER.size
+        self.language_code = self._mmap[position:position + language_length].decode("utf-8")
+        position += language_length
+
+        self._views = []
+        self.starts, position = self._view("I", position, count)
+        self.durations, position = self._view("I", position, count)
+        self._block_first, position = self._view("I", position, block_count)
+        self._block_offsets, position = self._view("Q", position, block_count)
+        self._block_lengths, position = self._view("I", position, block_count)
+        self._blocks = OrderedDict()
+
+    def _view(self, typecode, position, count):
+        position += -position % 8
+        size = array(typecode).itemsize * count
+        view = memoryview(self._mmap)[position:position + size]
+        self._views.append(view)
+        if sys.byteorder == "big":
+            column = array(typecode, view.tobytes())
+            column.byteswap()
+        else:
+            column = view.cast(typecode)
+            self._views.append(column)
+        return column, position + size
+
+    def close(self):
+        # The mapping can only be closed once no views of it remain
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def duration(self):
+        """Seconds until the end of the last segment."""
+        if not self.timed or not len(self):
+            return 0.0
+        return (self.starts[-1] + self.durations[-1]) / 1000
+
+    def _block(self, b):
+        texts = self._blocks.get(b)
+        if texts is None:
+            offset, length = self._block_offsets[b], self._block_lengths[b]
+            texts = _decompress(self._mmap[offset:offset + length], self.codec).decode("utf-8").split(SEPARATOR)
+            self._blocks[b] = texts
+            if len(self._blocks) > CACHED_BLOCKS:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(b)
+        return texts
+
+    def texts(self, first, stop):
+        """Texts of segments first..stop-1, decompressing only the blocks they are in."""
+        texts = []
+        i = first
+        while i < stop:
+            b = bisect_right(self._block_first, i) - 1
+            block_first = self._block_first[b]
+            block = self._block(b)
+            end = min(stop, block_first + len(block))
+            texts.extend(block[i - block_first:end - block_first])
+            i = end
+        return texts
+
+    def segments(self, start=None, end=None):
+        """Segment dicts starting within [start, end) seconds; all of them by default."""
+        if start is None and end is None:
+            first, stop = 0, len(self)
+        elif not self.timed:
+            raise ValueError(f"{self.path} has no timestamps")
+        else:
+            first = bisect_left(self.starts, int(round((start or 0) * 1000)))
+            stop = len(self) if end is None else bisect_left(self.starts, int(round(end * 1000)))
+        texts = self.texts(first, stop)
+        if not self.timed:
+            return [{"text": text, "start": None, "duration": None} for text in texts]
+        return [
+            {"text": text, "start": self.starts[i] / 1000, "duration": self.durations[i] / 1000}
+            for i, text in zip(range(first, stop), texts)
+        ]
+
+    def text(self):
+        """The whole transcript as plain text, as youtube.format_transcript builds it."""
+        return "".join([text + " " for text in self.texts(0, len(self))])
+
+    def to_segment_array(self):
+        """Load a timed archive as a SegmentArray for rendering SRT/VTT/JSONL."""
+        return SegmentArray.from_segments(self.segments())
+
+
+class ArchiveStore:
+    """Directory of per-video archives."""
+
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, video_id):
+        return os.path.join(self.root, f"{video_id}.yta")
+
+    def put(self, video_id, segments, language_code="", is_generated=False):
+        return write_archive(self.path(video_id), segments, language_code, is_generated)
+
+    def put_text(self, video_id, text, language_code=""):
+        """Store a transcript without timestamps, split into pseudo-segments."""
+        words = text.split()
+        segments = [
+            {"text": " ".join(words[i:i + UNTIMED_SEGMENT_WORDS]), "start": None, "duration": None}
+            for i in range(0, len(words), UNTIMED_SEGMENT_WORDS)
+        ]
+        return self.put(video_id, segments, language_code)
+
+    def open(self, video_id):
+        """Return the video's TranscriptArchive (close it when done), or None."""
+        path = self.path(video_id)
+        return TranscriptArchive(path) if os.path.exists(path) else None
+
+    def video_ids(self):
+        return sorted(os.path.basename(path)[:-len(".yta")] for path in glob.glob(os.path.join(self.root, "*.yta")))
+
+    def import_text_files(self, directory, cache=None):
+        """Archive every `<video_id>_transcript.txt` in `directory`; returns (timed, untimed) counts.
+
+        The files have no timestamps. When `cache` (a TranscriptCache) still
+        holds the same transcript with its segments, those are archived instead.
+        """
+        timed = untimed = 0
+        for path in glob.glob(os.path.join(directory, "*_transcript.txt")):
+            video_id = os.path.basename(path)[:-len("_transcript.txt")]
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            entry = cache.get(video_id) if cache is not None else None
+            if entry is not None and to_plain_text(entry["segments"]).strip() == text.strip():
+                self.put(video_id, entry["segments"], entry["language_code"], entry["is_generated"])
+                timed += 1
+            else:
+                self.put_text(video_id, text)
+                untimed += 1
+        return timed, untimed
+
+    def stats(self):
+        paths = glob.glob(os.path.join(self.root, "*.yta"))
+        return {"videos": len(paths), "bytes": sum(os.path.getsize(path) for path in paths)}
+
+
+def parse_time(value):
+    """Parse "ss", "m:ss" or "h:mm:ss" into seconds."""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed transcript archive.")
+    parser.add_argument("--dir", default=DEFAULT_ARCHIVE_DIR, help="Archive directory (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Archive existing *_transcript.txt files")
+    importer.add_argument("path", nargs="?", default=os.path.dirname(os.path.abspath(__file__)))
+
+    show = commands.add_parser("show", help="Print the segments of a video, optionally within a time range")
+    show.add_argument("video_id")
+    show.add_argument("--from", dest="start", type=parse_time, help="Start time, e.g. 12:00")
+    show.add_argument("--to", dest="end", type=parse_time, help="End time, e.g. 15:00")
+
+    commands.add_parser("stats", help="Show archive size")
+    args = parser.parse_args(argv)
+
+    store = ArchiveStore(args.dir)
+    if args.command == "import":
+        from youtube import get_transcript_cache
+        timed, untimed = store.import_text_files(args.path, get_transcript_cache())
+        print(f"Archived {timed + untimed} transcript(s), {timed} with timestamps from the transcript cache")
+    elif args.command == "show":
+        archive = store.open(args.video_id)
+        if archive is None:
+            parser.error(f"{args.video_id} is not archived")
+        with archive:
+            for segment in archive.segments(args.start, args.end):
+                if segment["start"] is None:
+                    print(segment["text"])
+                else:
+                    print(f"[{format_timestamp(segment['start'])}] {segment['text']}")
+    else:
+        stats = store.stats()
+        print(f"{stats['videos']} videos, {stats['bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from metrics import CACHE_REQUESTS
+
+# Default location and limits, overridable through the environment
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TRANSCRIPT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcript_cache.sqlite3")
+)
+DEFAULT_TTL_SECONDS = int(os.environ.get("TRANSCRIPT_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_ENTRIES", 5000))
+
+CachedTrack = namedtuple("CachedTrack", ["language_code", "is_generated"])
+
+
+class TranscriptCache:
+    """SQLite-backed transcript store keyed by (video_id, language_code, is_generated).
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once more than `max_entries` are stored.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    video_id TEXT NOT NULL,
+                    language_code TEXT NOT NULL,
+                    is_generated INTEGER NOT NULL,
+                    segments TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (video_id, language_code, is_generated)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcripts_accessed ON transcripts (accessed_at)"
+            )
+
+    def get(self, video_id, language_code=None, is_generated=None):
+        """Return a cached entry for the video or None.
+
+        `language_code` and `is_generated` narrow the lookup; when omitted the
+        most recently used manual transcript wins over an auto-generated one.
+        """
+        query = "SELECT language_code, is_generated, segments FROM transcripts WHERE video_id = ? AND created_at >= ?"
+        now = time.time()
+        params = [video_id, now - self.ttl]
+        if language_code is not None:
+            query += " AND language_code = ?"
+            params.append(language_code)
+        if is_generated is not None:
+            query += " AND is_generated = ?"
+            params.append(int(is_generated))
+        query += " ORDER BY is_generated ASC, accessed_at DESC LIMIT 1"
+
+        with self._lock, self._conn:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="transcript", result="miss")
+                return None
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="transcript", result="hit")
+            self._conn.execute(
+                "UPDATE transcripts SET accessed_at = ? WHERE video_id = ? AND language_code = ? AND is_generated = ?",
+                (now, video_id, row[0], row[1])
+            )
+
+        return {
+            "video_id": video_id,
+            "language_code": row[0],
+            "is_generated": bool(row[1]),
+            "segments": json.loads(row[2]),
+        }
+
+    def get_preferred(self, video_id, select):
+        """Return the cached track of a video chosen by `select`, or None.
+
+        `select` receives the cached tracks (objects with `language_code` and
+        `is_generated`) and returns one of them or None, so the same policy
+        that picks a remote track can pick among the cached ones.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT language_code, is_generated FROM transcripts WHERE video_id = ? AND created_at >= ?",
+                (video_id, time.time() - self.ttl)
+            ).fetchall()
+        choice = select([CachedTrack(code, bool(generated)) for code, generated in rows]) if rows else None
+        if choice is None:
+            with self._lock:
+                self.misses += 1
+            CACHE_REQUESTS.inc(cache="transcript", result="miss")
+            return None
+        return self.get(video_id, choice.language_code, choice.is_generated)
+
+    def put(self, video_id, language_code, is_generated, segments):
+        """Store transcript segments and evict expired or excess entries."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, language_code, int(is_generated), json.dumps(segments), now, now)
+            )
+            self._evict(now)
+
+    def invalidate(self, video_id):
+        """Drop every cached track of a video."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transcripts WHERE video_id = ?", (video_id,))
+
+    def clear(self):
+        """Remove all entries and reset the counters."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transcripts")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def _evict(self, now):
+        # Expired entries first, then least recently used ones over the limit
+        self._conn.execute("DELETE FROM transcripts WHERE created_at < ?", (now - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute("""
+                DELETE FROM transcripts WHERE rowid IN (
+                    SELECT rowid FROM transcripts ORDER BY accessed_at ASC LIMIT ?
+                )
+            """, (count - self.max_entries,))
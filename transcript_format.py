@@ -0,0 +1,164 @@
+import io
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Lines are collected and written in batches of this size when streaming
+WRITE_BATCH = 1024
+
+
+class SegmentArray:
+    """Compact, timestamp-preserving transcript representation.
+
+    Segment texts are stored back to back in one string with a parallel
+    array of offsets, next to float arrays of start times and durations.
+    This takes a fraction of the memory of a list of per-segment dicts and
+    lets every output format be rendered in a single pass.
+    """
+
+    __slots__ = ("starts", "durations", "offsets", "text")
+
+    def __init__(self, starts, durations, offsets, text):
+        self.starts = starts
+        self.durations = durations
+        self.offsets = offsets
+        self.text = text
+
+    @classmethod
+    def from_segments(cls, segments):
+        """Build from youtube_transcript_api style dicts (`text`, `start`, `duration`)."""
+        starts = array("d")
+        durations = array("d")
+        offsets = array("Q", [0])
+        texts = []
+        position = 0
+        for segment in segments:
+            text = segment["text"]
+            starts.append(segment["start"])
+            durations.append(segment.get("duration", 0.0))
+            texts.append(text)
+            position += len(text)
+            offsets.append(position)
+        return cls(starts, durations, offsets, "".join(texts))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def text_at(self, i):
+        return self.text[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return {"text": self.text_at(i), "start": self.starts[i], "duration": self.durations[i]}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_segments(self):
+        return list(self)
+
+    def index_at(self, seconds):
+        """Index of the segment playing at `seconds` (or the next one)."""
+        return max(0, bisect_right(self.starts, seconds) - 1)
+
+    def between(self, start, end):
+        """Range of segment indexes starting within [start, end)."""
+        return range(bisect_left(self.starts, start), bisect_left(self.starts, end))
+
+    # Renderers. Each writes to a file object in one pass over the arrays.
+
+    def write_text(self, out):
+        """Plain text: segment texts separated (and terminated) by a space."""
+        write_lines(out, (self.text_at(i) + " " for i in range(len(self))))
+
+    def write_srt(self, out):
+        write_lines(out, (
+            f"{i + 1}\n{srt_time(self.starts[i])} --> {srt_time(self.starts[i] + self.durations[i])}\n"
+            f"{self.text_at(i)}\n\n"
+            for i in range(len(self))
+        ))
+
+    def write_vtt(self, out):
+        out.write("WEBVTT\n\n")
+        write_lines(out, (
+            f"{vtt_time(self.starts[i])} --> {vtt_time(self.starts[i] + self.durations[i])}\n"
+            f"{self.text_at(i)}\n\n"
+            for i in range(len(self))
+        ))
+
+    def write_jsonl(self, out):
+        # Only the text needs JSON escaping; the floats are written directly
+        encode = _encode_string
+        write_lines(out, (
+            f'{{"start": {self.starts[i]!r}, "duration": {self.durations[i]!r}, "text": {encode(self.text_at(i))}}}\n'
+            for i in range(len(self))
+        ))
+
+    def render(self, fmt):
+        """Return the transcript rendered in `fmt` (one of FORMATS) as a string."""
+        out = io.StringIO()
+        write(self, fmt, out)
+        return out.getvalue()
+
+
+_encode_string = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def write_lines(out, lines):
+    """Write an iterable of strings in batches to limit per-call overhead."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= WRITE_BATCH:
+            out.write("".join(batch))
+            batch.clear()
+    if batch:
+        out.write("".join(batch))
+
+
+def _split_time(seconds):
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return hours, minutes, secs, millis
+
+
+def srt_time(seconds):
+    return "%02d:%02d:%02d,%03d" % _split_time(seconds)
+
+
+def vtt_time(seconds):
+    return "%02d:%02d:%02d.%03d" % _split_time(seconds)
+
+
+# Output format name -> (file extension, MIME type, renderer)
+FORMATS = {
+    "txt": ("txt", "text/plain", SegmentArray.write_text),
+    "srt": ("srt", "application/x-subrip", SegmentArray.write_srt),
+    "vtt": ("vtt", "text/vtt", SegmentArray.write_vtt),
+    "jsonl": ("jsonl", "application/jsonl", SegmentArray.write_jsonl),
+}
+
+
+def write(segments, fmt, out):
+    """Stream a transcript (SegmentArray or list of segment dicts) to a file object."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown transcript format: {fmt!r} (expected one of {', '.join(FORMATS)})")
+    if not isinstance(segments, SegmentArray):
+        segments = SegmentArray.from_segments(segments)
+    FORMATS[fmt][2](segments, out)
+
+
+def to_plain_text(segments):
+    """Plain transcript text, straight from segment dicts.
+
+    CPython extends the string in place, so this is as fast as a join and
+    peaks at about half the memory (see benchmarks/bench_format.py).
+    """
+    transcript_text = ""
+    for segment in segments:
+        transcript_text += segment["text"] + " "
+    return transcript_text
@@ -0,0 +1,94 @@
+"""Pages, time lookup and search over one transcript, for the transcript viewer."""
+from retrieval import format_timestamp
+from transcript_format import SegmentArray
+
+# Segments shown per page of the viewer (a few minutes of video)
+PAGE_SEGMENTS = 100
+# Words per pseudo-segment of transcripts without timestamps
+UNTIMED_SEGMENT_WORDS = 60
+
+
+class TranscriptView:
+    """Read-only, paged view of a transcript with its stats computed once.
+
+    Built once per transcript (the app caches it by transcript hash), so a
+    rerun only slices out the page on screen instead of sending and
+    re-tokenizing the whole transcript. Transcripts without segments are
+    paged by words and cannot be searched by time.
+    """
+
+    def __init__(self, text, segments=None, page_size=PAGE_SEGMENTS):
+        self.timed = bool(segments)
+        if not self.timed:
+            words = text.split()
+            segments = [
+                {"text": " ".join(words[i:i + UNTIMED_SEGMENT_WORDS]), "start": 0.0, "duration": 0.0}
+                for i in range(0, len(words), UNTIMED_SEGMENT_WORDS)
+            ]
+        self.segments = SegmentArray.from_segments(segments)
+        self.page_size = page_size
+        self._lowered = None
+        count = len(self.segments)
+        self.stats = {
+            "words": len(text.split()),
+            "characters": len(text),
+            "segments": count if self.timed else 0,
+            "duration": self.segments.starts[-1] + self.segments.durations[-1] if self.timed else None,
+        }
+
+    @property
+    def pages(self):
+        return max(1, -(-len(self.segments) // self.page_size))
+
+    def page_of(self, index):
+        """1-based page holding segment `index`."""
+        return index // self.page_size + 1
+
+    def page_at(self, seconds):
+        """1-based page holding the segment playing at `seconds`."""
+        return self.page_of(self.segments.index_at(seconds))
+
+    def page(self, number):
+        """Segments of a 1-based page as (start, text) pairs; start is None when untimed."""
+        first = (min(max(number, 1), self.pages) - 1) * self.page_size
+        stop = min(first + self.page_size, len(self.segments))
+        starts = self.segments.starts
+        return [(starts[i] if self.timed else None, self.segments.text_at(i)) for i in range(first, stop)]
+
+    def render_page(self, number):
+        """A page as plain text lines, prefixed with their timestamps."""
+        return "\n".join(text if start is None else f"[{format_timestamp(start)}] {text}"
+                         for start, text in self.page(number))
+
+    def search(self, query, limit=20):
+        """Segments containing `query` (case-insensitive), in transcript order.
+
+        Returns dicts with the segment `index`, its `start` (None when
+        untimed), the `page` it is on and its `text`.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        if self._lowered is None:
+            # Built on the first search only
+            self._lowered = [self.segments.text_at(i).lower() for i in range(len(self.segments))]
+        hits = []
+        for i, text in enumerate(self._lowered):
+            if query in text:
+                hits.append({
+                    "index": i,
+                    "start": self.segments.starts[i] if self.timed else None,
+                    "page": self.page_of(i),
+                    "text": self.segments.text_at(i),
+                })
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    def time_range(self, number):
+        """(first start, last start) of a 1-based page, or None when untimed."""
+        if not self.timed:
+            return None
+        first = (min(max(number, 1), self.pages) - 1) * self.page_size
+        last = min(first + self.page_size, len(self.segments)) - 1
+        return self.segments.starts[first], self.segments.starts[last]
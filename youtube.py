@@ -1,122 +1,353 @@
-import re
-import os
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
-
-def extract_video_id(youtube_url):
-    """Extract the video ID from a YouTube URL."""
-    # Regular expression patterns for different YouTube URL formats
-    patterns = [
-        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',  # Standard and shortened URLs
-        r'(?:embed\/)([0-9A-Za-z_-]{11})',   # Embed URLs
-        r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})'  # youtu.be URLs
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, youtube_url)
-        if match:
-            return match.group(1)
-    
-    return None
-
-def get_available_transcripts(video_id):
-    """Get list of available transcript languages for a video."""
-    try:
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        available_languages = []
-        
-        for transcript in transcript_list:
-            language_code = transcript.language_code
-            language_name = transcript.language
-            available_languages.append((language_code, language_name))
-            
-        return available_languages
-    except Exception:
-        return []
-
-def get_best_transcript(youtube_url):
-    """Try multiple approaches to get the best available transcript."""
-    video_id = extract_video_id(youtube_url)
-    
-    if not video_id:
-        return "Error: Could not extract video ID from the URL."
-    
-    try:
-        # Try default transcript first
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        return format_transcript(transcript_list)
-    except (TranscriptsDisabled, NoTranscriptFound):
-        # Try to get available languages
-        try:
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            
-            # First try English if available
-            try:
-                english_transcript = transcript_list.find_transcript(['en'])
-                transcript_list = english_transcript.fetch()
-                return format_transcript(transcript_list)
-            except:
-                pass
-            
-            # If English not available, try auto-generated
-            try:
-                auto_transcript = transcript_list.find_generated_transcript(['en', 'en-US'])
-                transcript_list = auto_transcript.fetch()
-                return format_transcript(transcript_list)
-            except:
-                pass
-            
-            # As last resort, use the first available transcript
-            available = list(transcript_list)
-            if available:
-                transcript_list = available[0].fetch()
-                return format_transcript(transcript_list)
-            
-            return "Error: No usable transcripts found for this video."
-        except Exception as e:
-            return f"Error: No transcripts available. {str(e)}"
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-def format_transcript(transcript_list):
-    """Format transcript for better readability."""
-    transcript_text = ""
-    for segment in transcript_list:
-        transcript_text += segment['text'] + " "
-    return transcript_text
-
-def save_transcript_to_file(transcript, video_id):
-    """Save transcript to a text file."""
-    filename = f"{video_id}_transcript.txt"
-    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(transcript)
-    
-    return filepath
-
-def main():
-    print("YouTube Video Transcript Extractor")
-    print("==================================")
-    print("This tool will try multiple methods to get transcripts, including auto-generated captions")
-    
-    while True:
-        youtube_url = input("\nEnter YouTube video URL (or 'q' to quit): ")
-        
-        if youtube_url.lower() == 'q':
-            break
-            
-        transcript = get_best_transcript(youtube_url)
-        
-        print("\n--- TRANSCRIPT ---")
-        print(transcript[:500] + "..." if len(transcript) > 500 else transcript)
-        print("------------------\n")
-        
-        if not transcript.startswith("Error"):
-            save_option = input("Save transcript to file? (y/n): ").lower()
-            if save_option == 'y':
-                video_id = extract_video_id(youtube_url)
-                filepath = save_transcript_to_file(transcript, video_id)
-                print(f"Transcript saved to: {filepath}")
-
-if __name__ == "__main__":
-    main()
+import re
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+from transcript_cache import TranscriptCache
+from transcript_format import to_plain_text
+from search_index import SearchIndex
+from transcript_archive import ArchiveStore, DEFAULT_ARCHIVE_DIR
+from singleflight import SingleFlight
+from metrics import (TRANSCRIPT_STAGE_SECONDS, TRANSCRIPT_RESOLUTIONS, TRANSCRIPT_ERRORS, TRANSCRIPT_SEGMENTS,
+                     TRANSCRIPT_CHARS, CACHE_REQUESTS, error_class)
+
+_transcript_cache = None
+_search_index = None
+_archive_store = None
+
+class NoUsableTranscript(Exception):
+    """Raised when no listed transcript track matches the selection policy."""
+
+def extract_video_id(youtube_url):
+    """Extract the video ID from a YouTube URL."""
+    # Regular expression patterns for different YouTube URL formats
+    patterns = [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',  # Standard and shortened URLs
+        r'(?:embed\/)([0-9A-Za-z_-]{11})',   # Embed URLs
+        r'(?:youtu\.be\/)([0-9A-Za-z_-]{11})'  # youtu.be URLs
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, youtube_url)
+        if match:
+            return match.group(1)
+    
+    return None
+
+class TranscriptPolicy:
+    """Preference order used to pick one track out of a video's transcript list.
+
+    Tracks are matched language by language in the order given; for each
+    language a manually created track is preferred over an auto-generated one
+    unless `prefer_manual` is False. With `fallback_any` the first listed track
+    (manual ones first) is used when no preferred language is available.
+    """
+
+    def __init__(self, languages=('en', 'en-US'), prefer_manual=True, allow_generated=True, fallback_any=True):
+        self.languages = tuple(languages)
+        self.prefer_manual = prefer_manual
+        self.allow_generated = allow_generated
+        self.fallback_any = fallback_any
+
+    def select(self, tracks, fallback=None):
+        """Return the preferred track from `tracks`, or None.
+
+        `fallback` overrides `fallback_any` for this call.
+        """
+        if fallback is None:
+            fallback = self.fallback_any
+        tracks = [t for t in tracks if self.allow_generated or not t.is_generated]
+        kinds = (False, True) if self.prefer_manual else (True, False)
+        
+        for language_code in self.languages:
+            for is_generated in kinds:
+                for track in tracks:
+                    if track.language_code == language_code and track.is_generated == is_generated:
+                        return track
+        
+        if fallback and tracks:
+            return sorted(tracks, key=lambda t: t.is_generated)[0]
+        return None
+
+DEFAULT_POLICY = TranscriptPolicy()
+
+class TranscriptResolution:
+    """The track chosen for a video, its segments and what it cost to get them."""
+
+    def __init__(self, video_id, segments, language_code, is_generated, remote_calls=0, from_cache=False):
+        self.video_id = video_id
+        self.segments = segments
+        self.language_code = language_code
+        self.is_generated = is_generated
+        self.remote_calls = remote_calls
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return format_transcript(self.segments)
+
+    def describe(self):
+        """Short human readable summary of the chosen track."""
+        kind = "auto-generated" if self.is_generated else "manual"
+        source = "cache" if self.from_cache else f"{self.remote_calls} remote call(s)"
+        return f"{self.language_code} ({kind}) via {source}"
+
+# Listings are cached briefly so resolving and showing the available
+# languages of the same video costs a single request
+LISTING_TTL_SECONDS = int(os.environ.get("TRANSCRIPT_LISTING_TTL", 600))
+LISTING_CACHE_SIZE = 256
+_listing_cache = OrderedDict()
+_listing_lock = threading.Lock()
+
+# Concurrent resolutions of the same video (e.g. many sessions extracting it at once) share one fetch
+_resolve_flight = SingleFlight("transcript")
+
+def list_transcripts(video_id, use_cache=True):
+    """Return (transcript_list, remote_calls) using the in-memory listing cache.
+
+    With `use_cache=False` the tracks are always listed again; the fresh
+    listing still replaces the cached one.
+    """
+    now = time.monotonic()
+    with _listing_lock:
+        cached = _listing_cache.get(video_id) if use_cache else None
+        if cached is not None and now - cached[0] < LISTING_TTL_SECONDS:
+            _listing_cache.move_to_end(video_id)
+            CACHE_REQUESTS.inc(cache="listing", result="hit")
+            return cached[1], 0
+    
+    CACHE_REQUESTS.inc(cache="listing", result="miss")
+    with TRANSCRIPT_STAGE_SECONDS.time(stage="list"):
+        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+    
+    with _listing_lock:
+        _listing_cache[video_id] = (now, transcript_list)
+        _listing_cache.move_to_end(video_id)
+        while len(_listing_cache) > LISTING_CACHE_SIZE:
+            _listing_cache.popitem(last=False)
+    return transcript_list, 1
+
+def is_valid_video_id(video_id):
+    """Check that a string looks like an 11 character YouTube video ID."""
+    return re.fullmatch(r'[0-9A-Za-z_-]{11}', video_id or '') is not None
+
+def get_available_transcripts(video_id):
+    """Get list of available transcript languages for a video."""
+    try:
+        transcript_list, _ = list_transcripts(video_id)
+        available_languages = []
+        
+        for transcript in transcript_list:
+            language_code = transcript.language_code
+            language_name = transcript.language
+            available_languages.append((language_code, language_name))
+            
+        return available_languages
+    except Exception:
+        return []
+
+def get_transcript_cache():
+    """Return the shared transcript cache, or None if it cannot be opened."""
+    global _transcript_cache
+    if _transcript_cache is None:
+        try:
+            _transcript_cache = TranscriptCache()
+        except sqlite3.Error:
+            return None
+    return _transcript_cache
+
+def get_search_index():
+    """Return the shared full-text search index, or None if it cannot be opened."""
+    global _search_index
+    if _search_index is None:
+        try:
+            _search_index = SearchIndex()
+        except sqlite3.Error:
+            return None
+    return _search_index
+
+def get_archive_store():
+    """Return the shared transcript archive, or None if it is disabled or cannot be created."""
+    global _archive_store
+    if _archive_store is None and DEFAULT_ARCHIVE_DIR:
+        try:
+            _archive_store = ArchiveStore()
+        except OSError:
+            return None
+    return _archive_store
+
+def resolve_transcript(video_id, policy=None, use_cache=True):
+    """Pick and fetch the best transcript track for a video.
+
+    The track list is requested at most once (and reused from the listing
+    cache), the track is chosen in memory from `policy` and then fetched
+    exactly once. Returns a TranscriptResolution; raises the
+    youtube_transcript_api errors, or NoUsableTranscript when the policy
+    matches nothing.
+    
+    Concurrent calls for the same video and policy wait for the first one
+    and share its result (or error) instead of contacting YouTube again.
+    
+    Stage latencies, the path taken and failures are recorded in `metrics`.
+    """
+    policy = policy or DEFAULT_POLICY
+    key = (video_id, use_cache, policy.languages, policy.prefer_manual, policy.allow_generated, policy.fallback_any)
+    try:
+        (resolution, path, match), shared = _resolve_flight.do(key, _resolve_transcript, video_id, policy, use_cache)
+    except Exception as e:
+        TRANSCRIPT_ERRORS.inc(error=error_class(e))
+        raise
+    if shared:
+        path = "shared"
+    
+    kind = "generated" if resolution.is_generated else "manual"
+    TRANSCRIPT_RESOLUTIONS.inc(path=path, match=match, kind=kind)
+    TRANSCRIPT_SEGMENTS.observe(len(resolution.segments))
+    TRANSCRIPT_CHARS.observe(sum(len(segment["text"]) for segment in resolution.segments))
+    return resolution
+
+def _resolve_transcript(video_id, policy, use_cache):
+    """Return (resolution, path taken, "preferred" or "fallback" track)."""
+    # Serve repeat lookups from the local cache without touching the network.
+    # Only preferred languages count here: a cached fallback track might not
+    # be what the policy picks once the full listing is known.
+    cache = get_transcript_cache() if use_cache else None
+    if cache is not None:
+        with TRANSCRIPT_STAGE_SECONDS.time(stage="cache"):
+            entry = cache.get_preferred(video_id, lambda tracks: policy.select(tracks, fallback=False))
+        if entry is not None:
+            resolution = TranscriptResolution(
+                video_id, entry["segments"], entry["language_code"], entry["is_generated"], from_cache=True
+            )
+            return resolution, "cache", "preferred"
+    
+    transcript_list, remote_calls = list_transcripts(video_id)
+    transcript = policy.select(transcript_list)
+    if transcript is None:
+        raise NoUsableTranscript(video_id)
+    match = "preferred" if transcript is policy.select(transcript_list, fallback=False) else "fallback"
+    
+    if cache is not None:
+        with TRANSCRIPT_STAGE_SECONDS.time(stage="cache"):
+            entry = cache.get(video_id, transcript.language_code, transcript.is_generated)
+        if entry is not None:
+            resolution = TranscriptResolution(
+                video_id, entry["segments"], entry["language_code"], entry["is_generated"],
+                remote_calls=remote_calls, from_cache=True
+            )
+            return resolution, "cache_after_listing", match
+    
+    with TRANSCRIPT_STAGE_SECONDS.time(stage="fetch"):
+        segments = transcript.fetch()
+    remote_calls += 1
+    
+    if cache is not None:
+        cache.put(video_id, transcript.language_code, transcript.is_generated, segments)
+    
+    resolution = TranscriptResolution(
+        video_id, segments, transcript.language_code, transcript.is_generated, remote_calls=remote_calls
+    )
+    return resolution, "fetch", match
+
+def get_best_transcript(youtube_url, use_cache=True, policy=None):
+    """Try multiple approaches to get the best available transcript."""
+    resolution = get_best_transcript_resolution(youtube_url, use_cache, policy)
+    if isinstance(resolution, str):
+        return resolution
+    return resolution.text
+
+def get_best_transcript_resolution(youtube_url, use_cache=True, policy=None):
+    """Like get_best_transcript, but return the TranscriptResolution.
+
+    Errors are returned as "Error: ..." strings, as with get_best_transcript.
+    """
+    video_id = extract_video_id(youtube_url)
+    
+    if not video_id:
+        return "Error: Could not extract video ID from the URL."
+    
+    try:
+        return resolve_transcript(video_id, policy, use_cache)
+    except NoUsableTranscript:
+        return "Error: No usable transcripts found for this video."
+    except (TranscriptsDisabled, NoTranscriptFound) as e:
+        return f"Error: No transcripts available. {str(e)}"
+    except Exception as e:
+        return f"Error: {str(e)}"
+
+def format_transcript(transcript_list):
+    """Format transcript for better readability."""
+    # See transcript_format for timestamped formats
+    return to_plain_text(transcript_list)
+
+def transcript_file_path(video_id):
+    """Where save_transcript_to_file writes a video's transcript."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{video_id}_transcript.txt")
+
+def save_transcript_to_file(transcript, video_id, segments=None, language_code=None, is_generated=False):
+    """Save transcript to a text file, archive it with timestamps and add it to the search index."""
+    filepath = transcript_file_path(video_id)
+    
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(transcript)
+    
+    if segments:
+        archive_transcript(video_id, segments, language_code, is_generated)
+    index_transcript(video_id, transcript, segments, language_code)
+    return filepath
+
+def archive_transcript(video_id, segments, language_code=None, is_generated=False):
+    """Store timestamped segments in the compressed transcript archive; returns the path or None."""
+    store = get_archive_store()
+    if store is None:
+        return None
+    try:
+        return store.put(video_id, segments, language_code, is_generated)
+    except OSError:
+        # As with the index, the text file is what the user asked for
+        return None
+
+def index_transcript(video_id, transcript, segments=None, language_code=None):
+    """Add a transcript to the search index, with timestamps when segments are given."""
+    index = get_search_index()
+    if index is None:
+        return False
+    try:
+        if segments:
+            return index.add_transcript(video_id, segments, language_code)
+        return index.add_text(video_id, transcript, language_code)
+    except sqlite3.Error:
+        # The file is saved either way; a broken index must not lose it
+        return False
+
+def main():
+    print("YouTube Video Transcript Extractor")
+    print("==================================")
+    print("This tool will try multiple methods to get transcripts, including auto-generated captions")
+    
+    while True:
+        youtube_url = input("\nEnter YouTube video URL (or 'q' to quit): ")
+        
+        if youtube_url.lower() == 'q':
+            break
+            
+        resolution = get_best_transcript_resolution(youtube_url)
+        transcript = resolution if isinstance(resolution, str) else resolution.text
+        
+        print("\n--- TRANSCRIPT ---")
+        print(transcript[:500] + "..." if len(transcript) > 500 else transcript)
+        print("------------------\n")
+        
+        if not transcript.startswith("Error"):
+            save_option = input("Save transcript to file? (y/n): ").lower()
+            if save_option == 'y':
+                filepath = save_transcript_to_file(
+                    transcript, resolution.video_id, resolution.segments, resolution.language_code,
+                    resolution.is_generated
+                )
+                print(f"Transcript saved to: {filepath}")
+
+if __name__ == "__main__":
+    main()